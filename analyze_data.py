@@ -1,5 +1,5 @@
-import pandas as pd
 import os
+from ingest_cache import IngestCache
 
 def analyze_excel_file(file_path):
     """Excelファイルを分析してデータ構造を確認"""
@@ -8,16 +8,18 @@ def analyze_excel_file(file_path):
         return
     
     try:
-        # Excelファイルの全シートを読み込み
-        excel_file = pd.ExcelFile(file_path)
+        # Excelファイルの全シートを読み込み（変換済みの Parquet があればそちらを使う）
+        cache = IngestCache()
+        file_hash, _ = cache.ensure(file_path)
+        sheet_names = cache.sheet_names(file_path, file_hash)
         print(f"ファイル名: {os.path.basename(file_path)}")
-        print(f"シート数: {len(excel_file.sheet_names)}")
-        print(f"シート名: {excel_file.sheet_names}")
+        print(f"シート数: {len(sheet_names)}")
+        print(f"シート名: {sheet_names}")
         print("-" * 50)
         
         # 各シートの内容を確認
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
+        for sheet_name in sheet_names:
+            df = cache.load_dataframe(file_path, sheet_name=sheet_name, file_hash=file_hash)
             print(f"\nシート名: {sheet_name}")
             print(f"行数: {len(df)}")
             print(f"列数: {len(df.columns)}")
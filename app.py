@@ -1,12 +1,23 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from comment_analyzer import CommentAnalyzer, process_excel_file, DynamoDBHandler
+from comment_analyzer import CommentAnalyzer, process_excel_file, DynamoDBHandler, COMMENT_COLUMNS, COLUMN_PRIORITIES, PROMPT_VERSION, RESPONDENT_PROMPT_VERSION
+from run_journal import RunJournal, file_sha256
+from llm_backends import BACKEND_NAMES, create_backend
+from metrics import format_prometheus
+from ingest_cache import IngestCache
+from scheduler import ColumnScheduler
+from search_index import CommentSearchIndex
+from job_manager import JobManager, JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED
 import os
 import json
 from datetime import datetime
 
+# 詳細分析タブのフィルタ結果として表にする最大件数
+FILTER_DISPLAY_LIMIT = 1000
+
 # ページ設定
 st.set_page_config(
     page_title="講義アンケート コメントピックアップアプリ",
@@ -19,6 +30,181 @@ if 'analysis_results' not in st.session_state:
     st.session_state.analysis_results = None
 if 'summary_report' not in st.session_state:
     st.session_state.summary_report = None
+if 'metrics' not in st.session_state:
+    st.session_state.metrics = None
+if 'search_index' not in st.session_state:
+    st.session_state.search_index = None
+if 'respondent_summary' not in st.session_state:
+    st.session_state.respondent_summary = None
+
+@st.cache_resource
+def get_ingest_cache() -> IngestCache:
+    """全セッションで共有する読み込みキャッシュ（変換済みの Parquet の保存先）"""
+    return IngestCache()
+
+def upload_fingerprint(uploaded_file) -> str:
+    """アップロードされたファイルの内容のハッシュ（同じアップロードでは再実行時も再計算しない）"""
+    fingerprints = st.session_state.setdefault('upload_fingerprints', {})
+    key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, getattr(uploaded_file, 'size', None))
+    if key not in fingerprints:
+        fingerprints[key] = file_sha256(uploaded_file.getvalue())
+    return fingerprints[key]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_preview(file_hash, _uploaded_file, rows=5):
+    """先頭行・形状・列ごとの件数（変換済みの場合のみ）を読み込む（ファイルのハッシュごとに全セッションで共有）"""
+    return get_ingest_cache().preview(_uploaded_file, rows=rows, file_hash=file_hash, background=True)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_column_comments(file_hash, _uploaded_file):
+    """コメント列の (列名, 行番号, コメント) を読み込む（ファイルのハッシュごとに全セッションで共有）"""
+    return list(get_ingest_cache().comment_reader(_uploaded_file, COMMENT_COLUMNS, file_hash=file_hash))
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """全セッションで共有する分析ジョブの管理（結果はセッション状態の外に保持される）"""
+    return JobManager(max_workers=int(os.getenv("ANALYSIS_JOB_WORKERS", "2")))
+
+def load_job_results(job):
+    """完了したジョブの結果をセッションに読み込む（結果本体はジョブが保持し、セッションは参照のみ）"""
+    st.session_state.loaded_job_id = job.id
+    st.session_state.analysis_results = job.results
+    st.session_state.search_index = job.search_index
+    st.session_state.summary_report = job.summary
+    st.session_state.respondent_summary = job.respondent_summary
+    st.session_state.metrics = job.metrics
+
+def render_job_stats(job):
+    """完了したジョブのキャッシュ・パース・レート制限の統計を表示"""
+    cache_stats = job.stats.get('cache')
+    if cache_stats is not None:
+        st.info(f"キャッシュ: ヒット {cache_stats['hits']}件 / ミス {cache_stats['misses']}件（ヒット率 {cache_stats['hit_rate']:.1f}%）")
+    parse_stats = job.stats['parse']
+    if parse_stats['parsed'] > 0:
+        st.info(f"応答パース: 失敗 {parse_stats['parse_failures']}/{parse_stats['parsed']}件（{parse_stats['failure_rate']:.1f}%）、補正 {parse_stats['coerced']}件")
+    limiter_stats = job.stats['rate_limiter']
+    if limiter_stats['rate_limited'] > 0:
+        st.info(f"レート制限を{limiter_stats['rate_limited']}回検出し、リクエストレートを {limiter_stats['current_rpm']:.0f} 回/分 に調整しました")
+
+@st.fragment(run_every=1.0)
+def render_job_status(job_id, summary_area, high_risk_area):
+    """
+    ジョブの進捗を1秒ごとに更新して表示（この部分だけを再実行するため他の操作を妨げない）
+    
+    実行中は途中経過の集計を「分析結果」タブの summary_area に、
+    ここまでの高危険度コメントを「詳細分析」タブの high_risk_area に表示する。
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.warning("分析ジョブが見つかりません（サーバーの再起動などで破棄された可能性があります）")
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+        return
+    
+    st.markdown(f"### 🧾 分析ジョブ `{job.id}`（{job.name}）")
+    if job.finished:
+        summary_area.empty()
+        high_risk_area.empty()
+    if job.status == JOB_COMPLETED:
+        if st.session_state.get('loaded_job_id') != job.id:
+            # 結果を読み込み、結果タブを含む画面全体を更新する
+            load_job_results(job)
+            st.session_state.show_balloons = True
+            st.rerun()
+        st.success(f"🎉 分析が完了しました！総コメント数: {len(job.results)}")
+        render_job_stats(job)
+        if st.session_state.pop('show_balloons', False):
+            st.balloons()
+        return
+    if job.status == JOB_FAILED:
+        st.error(f"分析エラー: {job.error}")
+        return
+    if job.status == JOB_CANCELLED:
+        st.warning(f"分析をキャンセルしました（{job.done}件完了。再度実行すると続きから分析します）")
+        return
+    
+    if job.status == JOB_QUEUED:
+        st.info("⏳ 他の分析の完了を待っています...")
+    event = job.progress
+    st.progress(event.fraction if event is not None else 0.0)
+    if event is not None:
+        eta_str = f" | 残り約{int(event.eta_sec)}秒" if event.eta_sec is not None else ""
+        failed_str = f" | 失敗 {event.failed}件" if event.failed else ""
+        st.text(f"AI分析を実行中... {event.done}/{event.total}件"
+                f"（ポジティブ {event.positive} / ネガティブ {event.negative}）{failed_str}{eta_str}")
+    if job.status == JOB_RUNNING and job.rate_limiter is not None:
+        st.text(f"現在のリクエストレート: {job.rate_limiter.get_stats()['current_rpm']:.0f} 回/分")
+    if job.cancel_requested:
+        st.text("キャンセルしています...")
+    elif st.button("⏹️ 分析をキャンセル"):
+        get_job_manager().cancel(job.id)
+    
+    # ここまでに完了した結果の途中経過
+    summary = job.live_summary()
+    if summary and event is not None:
+        render_live_results(summary_area, high_risk_area, summary, event.done, event.total)
+
+def render_live_results(summary_area, high_risk_area, summary, done, total):
+    """分析途中の集計と、ここまでに見つかった高危険度コメントを表示"""
+    with summary_area.container():
+        st.subheader(f"⏳ 分析中の途中経過（{done}/{total}件）")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("分析済みコメント", summary['total_comments'])
+        with col2:
+            st.metric("ポジティブ率", f"{summary['sentiment_distribution']['positive']['percentage']:.1f}%")
+        with col3:
+            st.metric("高危険度コメント", summary['high_risk_comments'])
+    
+    with high_risk_area.container():
+        st.subheader(f"⏳ ここまでの高危険度コメント（{done}/{total}件分析済み）")
+        for comment in summary['top_high_risk_comments']:
+            st.write(f"• **{comment.get('summary', 'N/A')}** (重要度: {comment.get('importance_score', 0)}) {comment.get('original_comment', '')}")
+
+def render_metrics(snapshot):
+    """分析パイプラインの計測結果（処理段階の所要時間・カウンター）を表示"""
+    st.subheader("⏱️ 処理性能")
+    counters = snapshot['counters']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("LLM呼び出し", f"{counters['llm_requests']:.0f}回", help=f"再試行 {counters['retries']:.0f}回 / エラー {counters['llm_errors']:.0f}回")
+    with col2:
+        st.metric("トークン（入力/出力）", f"{counters['input_tokens']:.0f} / {counters['output_tokens']:.0f}")
+    with col3:
+        lookups = counters['cache_hits'] + counters['cache_misses']
+        hit_rate = counters['cache_hits'] / lookups * 100 if lookups else 0.0
+        st.metric("キャッシュヒット", f"{counters['cache_hits']:.0f}件", f"{hit_rate:.1f}%", delta_color="off")
+    with col4:
+        st.metric("パース失敗", f"{counters['parse_failures']:.0f}件", f"補正 {counters['coerced']:.0f}件", delta_color="off")
+    
+    if snapshot['stages']:
+        stage_labels = {
+            "excel_load": "Excel読み込み", "column_extract": "列の抽出", "prompt_build": "プロンプト生成",
+            "model_call": "モデル呼び出し", "json_parse": "JSONパース", "summary": "サマリー生成"
+        }
+        stage_df = pd.DataFrame([
+            {"処理段階": stage_labels.get(name, name), "回数": values['count'], "合計(秒)": values['total_sec'],
+             "平均(秒)": values['avg_sec'], "最大(秒)": values['max_sec']}
+            for name, values in snapshot['stages'].items()
+        ])
+        st.dataframe(stage_df, use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="💾 計測結果（JSON）",
+            data=json.dumps(snapshot, ensure_ascii=False, indent=2),
+            file_name=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json"
+        )
+    with col2:
+        st.download_button(
+            label="💾 計測結果（Prometheus形式）",
+            data=format_prometheus(snapshot),
+            file_name=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prom",
+            mime="text/plain"
+        )
 
 def main():
     st.title("📊 講義アンケート コメントピックアップアプリ")
@@ -27,15 +213,26 @@ def main():
     # サイドバー
     st.sidebar.title("設定")
     
-    # APIキー設定
-    api_key = st.sidebar.text_input(
-        "Google Gemini APIキー",
-        type="password",
-        help="Google AI StudioからAPIキーを取得してください"
+    # LLMバックエンド選択
+    backend_labels = {"gemini": "Google Gemini", "bedrock": "Amazon Bedrock", "fake": "フェイク（オフライン検証用）"}
+    default_backend = os.getenv("LLM_BACKEND", "gemini")
+    backend_name = st.sidebar.selectbox(
+        "LLMバックエンド",
+        BACKEND_NAMES,
+        index=BACKEND_NAMES.index(default_backend) if default_backend in BACKEND_NAMES else 0,
+        format_func=lambda name: backend_labels[name],
+        help="Bedrock はAWSの認証情報、フェイクはAPIを呼ばずに動作確認する場合に使用します"
     )
     
-    if api_key:
-        os.environ['GOOGLE_API_KEY'] = api_key
+    # APIキー設定
+    api_key = None
+    if backend_name == "gemini":
+        api_key = st.sidebar.text_input(
+            "Google Gemini APIキー",
+            type="password",
+            help="Google AI StudioからAPIキーを取得してください"
+        )
+
     
     # ファイルアップロード
     st.sidebar.markdown("### ファイルアップロード")
@@ -48,6 +245,12 @@ def main():
     # メインコンテンツ
     tab1, tab2, tab3, tab4 = st.tabs(["📤 データアップロード", "📈 分析結果", "🔍 詳細分析", "📊 統計情報"])
     
+    # 分析中の途中経過を表示する領域
+    with tab2:
+        live_summary_area = st.empty()
+    with tab3:
+        live_high_risk_area = st.empty()
+    
     with tab1:
         st.header("データアップロード・分析")
         
@@ -58,18 +261,26 @@ def main():
             # プレビュー表示
             if st.button("📋 データプレビュー"):
                 try:
-                    df = pd.read_excel(uploaded_file)
+                    # 先頭行だけを読み込む（未変換のファイルは Parquet への変換をバックグラウンドで開始する）
+                    file_hash = upload_fingerprint(uploaded_file)
+                    head_df, shape, non_null_counts = load_preview(file_hash, uploaded_file)
+                    if non_null_counts is None:
+                        non_null_counts = get_ingest_cache().column_counts(file_hash)
                     st.subheader("データプレビュー")
-                    st.write(f"データ形状: {df.shape[0]}行 × {df.shape[1]}列")
-                    st.dataframe(df.head())
+                    st.write(f"データ形状: {shape[0] if shape[0] is not None else '?'}行 × {shape[1]}列")
+                    st.dataframe(head_df)
                     
                     # コメント列の確認
-                    comment_columns = [col for col in df.columns if any(keyword in col for keyword in ['コメント', '意見', '感想', '要望', '改善', 'よかった', 'わかりにくかった'])]
+                    comment_columns = [col for col in head_df.columns if any(keyword in col for keyword in ['コメント', '意見', '感想', '要望', '改善', 'よかった', 'わかりにくかった'])]
                     if comment_columns:
                         st.subheader("検出されたコメント列")
                         for col in comment_columns:
-                            non_null_count = df[col].count()
-                            st.write(f"• {col}: {non_null_count}件のコメント")
+                            if non_null_counts is None:
+                                st.write(f"• {col}")
+                            else:
+                                st.write(f"• {col}: {non_null_counts.get(col, 0)}件のコメント")
+                        if non_null_counts is None:
+                            st.caption("コメント件数はファイルの変換が終わり次第表示されます（もう一度プレビューを押してください）")
                     
                 except Exception as e:
                     st.error(f"ファイル読み込みエラー: {e}")
@@ -77,100 +288,113 @@ def main():
             # 分析実行
             st.markdown("### 🤖 AI分析実行")
             
-            if not api_key:
+            if backend_name == "gemini" and not api_key:
                 st.warning("⚠️ Google Gemini APIキーを入力してください")
             else:
-                col1, col2 = st.columns(2)
+                col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
                     max_comments = st.number_input(
                         "最大分析コメント数",
                         min_value=10,
-                        max_value=1000,
-                        value=20,
-                        help="分析するコメント数の上限（APIコスト節約のため）"
+                        max_value=100000,
+                        value=120,
+                        help="全列合計で分析するコメント数の上限（APIコスト節約のため）。優先度の高い列から多く割り当てます"
                     )
                 
                 with col2:
-                    delay_time = st.number_input(
-                        "API呼び出し間隔（秒）",
-                        min_value=0.1,
-                        max_value=5.0,
-                        value=0.50,
-                        step=0.1,
-                        help="APIレート制限対策"
+                    requests_per_minute = st.number_input(
+                        "リクエスト上限（回/分）",
+                        min_value=1,
+                        max_value=2000,
+                        value=120,
+                        help="APIレート制限対策。レート制限を検出すると自動的に速度を落とし、回復後に上限まで戻します"
+                    )
+                
+                with col3:
+                    max_workers = st.number_input(
+                        "同時実行数",
+                        min_value=1,
+                        max_value=16,
+                        value=4,
+                        help="同時に実行するAPI呼び出しの上限（1の場合は逐次実行）"
                     )
                 
+                with col4:
+                    pack_size = st.number_input(
+                        "まとめて分析する件数",
+                        min_value=1,
+                        max_value=20,
+                        value=5,
+                        help="1回のAPI呼び出しで分析するコメント数（リクエスト数とトークン数を削減）"
+                    )
+                
+                dedup = st.checkbox(
+                    "重複・類似コメントをまとめて分析",
+                    value=True,
+                    help="「特になし」などほぼ同一のコメントは代表1件のみ分析し、結果を共有します"
+                )
+                
+                respondent_mode = st.checkbox(
+                    "回答者単位で分析",
+                    value=False,
+                    help="1人の回答者の全回答を1回のAPI呼び出しでまとめて分析し、回答者全体の危険度も判定します"
+                )
+                
+                with st.expander("列ごとの優先度"):
+                    st.caption("予算を優先度に比例して各列に割り当て、優先度の高い列から先に分析します（0の列は分析しません）")
+                    column_priorities = {
+                        col: st.slider(col, min_value=0.0, max_value=5.0, value=COLUMN_PRIORITIES.get(col, 1.0),
+                                       step=0.5, key=f"priority_{i}")
+                        for i, col in enumerate(COMMENT_COLUMNS)
+                    }
+                
+                resume = st.checkbox(
+                    "中断した分析の続きから再開",
+                    value=True,
+                    help="同じファイルの分析が途中で中断された場合、完了済みのコメントは再分析しません"
+                )
+                
                 if st.button("🚀 分析開始", type="primary"):
                     try:
-                        # 進捗バーとステータス
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        status_text.text("ファイルを読み込み中...")
-                        df = pd.read_excel(uploaded_file)
-                        progress_bar.progress(0.1)
-                        
-                        # 一時ファイル保存
-                        temp_file = f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                        df.to_excel(temp_file, index=False)
-                        
-                        status_text.text("AI分析を実行中...")
-                        progress_bar.progress(0.3)
-                        
-                        # 分析実行
-                        analyzer = CommentAnalyzer()
-                        comment_columns = [
-                            '【必須】本日の講義で学んだことを50文字以上で入力してください。',
-                            '（任意）本日の講義で特によかった部分について、具体的にお教えください。',
-                            '（任意）分かりにくかった部分や改善点などがあれば、具体的にお教えください。',
-                            '（任意）講師について、よかった点や不満があった点などについて、具体的にお教えください。',
-                            '（任意）今後開講してほしい講義・分野などがあればお書きください。',
-                            '（任意）ご自由にご意見をお書きください。'
-                        ]
-                        
-                        all_results = []
-                        total_columns = len([col for col in comment_columns if col in df.columns])
-                        processed_columns = 0
-                        
-                        for col in comment_columns:
-                            if col in df.columns:
-                                status_text.text(f"分析中: {col}")
-                                comments = df[col].dropna().head(max_comments).tolist()
-                                
-                                if comments:
-                                    results = analyzer.analyze_comments_batch(comments, delay=delay_time)
-                                    for result in results:
-                                        result['column_name'] = col
-                                    all_results.extend(results)
-                                
-                                processed_columns += 1
-                                progress_bar.progress(min(0.3 + (processed_columns / total_columns) * 0.6, 1.0))
-                        
-                        status_text.text("サマリーレポートを生成中...")
-                        progress_bar.progress(0.9)
+                        # 変換済みの Parquet からコメント列を読み込み、全列共通の予算内で優先度順に選ぶ
+                        file_hash = upload_fingerprint(uploaded_file)
+                        scheduler = ColumnScheduler(max_comments=int(max_comments), priorities=column_priorities)
+                        column_comments = scheduler.schedule(load_column_comments(file_hash, uploaded_file))
+                        if respondent_mode:
+                            # 回答者ごとにまとめるため、選んだコメントを行の順に戻す
+                            column_order = {col: i for i, col in enumerate(COMMENT_COLUMNS)}
+                            column_comments.sort(key=lambda item: (item[1], column_order[item[0]]))
                         
-                        # サマリー生成
-                        summary = analyzer.generate_summary_report(all_results)
+                        # APIキーはプロセスの環境変数に置かず、このジョブのバックエンドにだけ渡す
+                        backend_kwargs = {"api_key": api_key} if backend_name == "gemini" else {}
+                        analyzer = CommentAnalyzer(backend=create_backend(backend_name, **backend_kwargs),
+                                                   requests_per_minute=requests_per_minute)
                         
-                        # セッション状態に保存
-                        st.session_state.analysis_results = all_results
-                        st.session_state.summary_report = summary
+                        # 完了した結果をジャーナルに記録し、ジョブが中断しても続きから再開できるようにする
+                        prompt_version = RESPONDENT_PROMPT_VERSION if respondent_mode else PROMPT_VERSION
+                        journal = RunJournal(RunJournal.make_run_key(file_hash, analyzer.model_name, prompt_version))
+                        if not resume:
+                            journal.clear()
                         
-                        progress_bar.progress(1.0)
-                        status_text.text("✅ 分析完了!")
-                        
-                        # 一時ファイル削除
-                        if os.path.exists(temp_file):
-                            os.remove(temp_file)
-                        
-                        st.success(f"🎉 分析が完了しました！総コメント数: {len(all_results)}")
-                        st.balloons()
+                        # 分析はバックグラウンドのジョブとして実行し、画面の操作や再読み込みで中断されないようにする
+                        job_id = get_job_manager().submit_analysis(
+                            analyzer, column_comments, journal=journal, respondent_mode=respondent_mode,
+                            name=uploaded_file.name, max_workers=int(max_workers), pack_size=int(pack_size), dedup=dedup
+                        )
+                        st.session_state.job_id = job_id
+                        st.query_params["job"] = job_id
                         
                     except Exception as e:
                         st.error(f"分析エラー: {e}")
-                        if 'temp_file' in locals() and os.path.exists(temp_file):
-                            os.remove(temp_file)
+                        if 'journal' in locals():
+                            journal.close()
+        
+        # 実行中・完了したジョブの状態
+        job_id = st.session_state.get('job_id') or st.query_params.get("job")
+        if job_id:
+            st.session_state.job_id = job_id
+            render_job_status(job_id, live_summary_area, live_high_risk_area)
     
     with tab2:
         st.header("分析結果概要")
@@ -208,6 +432,10 @@ def main():
                     f"{positive_rate:.1f}%"
                 )
             
+            triage_skipped = summary.get('triage_skipped')
+            if triage_skipped and triage_skipped['count'] > 0:
+                st.caption(f"💰 ローカル判定でAPI呼び出しを省略: {triage_skipped['count']}件（{triage_skipped['percentage']:.1f}%）")
+            
             # センチメント分析結果
             st.subheader("😊 センチメント分析")
             col1, col2 = st.columns(2)
@@ -256,6 +484,26 @@ def main():
                 ])
                 st.dataframe(category_df, use_container_width=True)
             
+            # 回答者単位の分析（回答者全体の危険度）
+            respondent_summary = st.session_state.respondent_summary
+            if respondent_summary:
+                st.subheader("👥 回答者ごとの危険度")
+                risk_counts = respondent_summary['respondent_risk_distribution']
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("回答者数", respondent_summary['respondents'])
+                with col2:
+                    st.metric("高危険度の回答者", risk_counts.get('high', 0))
+                with col3:
+                    st.metric("中危険度の回答者", risk_counts.get('medium', 0))
+                with col4:
+                    st.metric("低危険度の回答者", risk_counts.get('low', 0))
+                
+                high_risk_rows = respondent_summary['high_risk_rows']
+                if high_risk_rows:
+                    # 行番号はヘッダーを除いた0始まり（Excelの行番号は +2）
+                    st.write("**高危険度の回答者（Excelの行番号）:** " + ", ".join(str(row + 2) for row in high_risk_rows[:FILTER_DISPLAY_LIMIT]))
+            
         else:
             st.info("📤 まず「データアップロード」タブでファイルをアップロードし、分析を実行してください。")
     
@@ -290,6 +538,11 @@ def main():
             # フィルタリング機能
             st.subheader("🔍 フィルタリング・検索")
             
+            search_query = st.text_input(
+                "コメント検索",
+                placeholder="例: 資料 見づらい（空白区切りですべてを含むコメントを検索）"
+            )
+            
             col1, col2, col3 = st.columns(3)
             
             with col1:
@@ -313,25 +566,52 @@ def main():
                     value=1
                 )
             
-            # フィルタ適用
-            filtered_results = st.session_state.analysis_results.copy()
-            
-            if sentiment_filter != "全て":
-                filtered_results = [r for r in filtered_results if r.get('sentiment') == sentiment_filter]
-            
-            if category_filter != "全て":
-                category_value = category_labels[category_filter]
-                filtered_results = [r for r in filtered_results if r.get('category') == category_value]
-            
-            filtered_results = [r for r in filtered_results if r.get('importance_score', 0) >= min_importance]
-            
-            st.write(f"フィルタ結果: {len(filtered_results)}件")
+            # 回答者単位で分析した場合は、回答者全体の危険度でも絞り込める
+            respondent_mode = bool(st.session_state.respondent_summary)
+            respondent_filter = "全て"
+            if respondent_mode:
+                respondent_filter = st.selectbox(
+                    "回答者の危険度",
+                    ["全て", "high", "medium", "low"],
+                    help="回答者の全回答から判定した危険度（その回答者のすべてのコメントが対象）"
+                )
             
-            # 結果表示
-            if filtered_results:
-                results_df = pd.DataFrame(filtered_results)
+            # フィルタ適用（結果の読み込み時に作成したビットマップ索引の AND で絞り込む）
+            store = st.session_state.analysis_results
+            mask = store.index().mask(
+                sentiment=None if sentiment_filter == "全て" else sentiment_filter,
+                category=None if category_filter == "全て" else category_labels[category_filter],
+                min_importance=min_importance,
+                respondent_risk=None if respondent_filter == "全て" else respondent_filter
+            )
+            positions = np.flatnonzero(mask)
+            relevance = None
+            
+            # 検索（n-gram 索引で候補を絞り、関連度の高い順に並べる）
+            if search_query.strip():
+                search_index = st.session_state.search_index
+                if search_index is None or len(search_index) != len(store):
+                    search_index = CommentSearchIndex.from_results(store)
+                    st.session_state.search_index = search_index
+                hits, relevance = search_index.search(search_query)
+                matched = mask[hits]
+                positions, relevance = hits[matched], relevance[matched]
+            
+            st.write(f"フィルタ結果: {len(positions)}件")
+            if len(positions) > FILTER_DISPLAY_LIMIT:
+                st.caption(f"先頭の{FILTER_DISPLAY_LIMIT}件を表示しています。すべての結果は「統計情報・エクスポート」タブから出力できます。")
+            
+            # 結果表示（表示する行だけを取り出して変換する）
+            if len(positions):
+                results_df = store.take(positions[:FILTER_DISPLAY_LIMIT]).to_pandas()
+                display_columns = ['original_comment', 'sentiment', 'category', 'importance_score', 'summary', 'keywords']
+                if respondent_mode:
+                    display_columns = ['row', 'respondent_risk'] + display_columns
+                if relevance is not None:
+                    results_df['relevance'] = relevance[:FILTER_DISPLAY_LIMIT].round(2)
+                    display_columns = ['relevance'] + display_columns
                 st.dataframe(
-                    results_df[['original_comment', 'sentiment', 'category', 'importance_score', 'summary', 'keywords']],
+                    results_df[display_columns],
                     use_container_width=True
                 )
         else:
@@ -348,7 +628,7 @@ def main():
             
             with col1:
                 if st.button("📄 CSV形式でダウンロード"):
-                    results_df = pd.DataFrame(st.session_state.analysis_results)
+                    results_df = st.session_state.analysis_results.to_pandas()
                     csv = results_df.to_csv(index=False, encoding='utf-8')
                     st.download_button(
                         label="💾 CSVファイルをダウンロード",
@@ -360,7 +640,7 @@ def main():
             with col2:
                 if st.button("📊 JSONレポートをダウンロード"):
                     json_data = {
-                        "analysis_results": st.session_state.analysis_results,
+                        "analysis_results": st.session_state.analysis_results.to_records(),
                         "summary_report": st.session_state.summary_report,
                         "generated_at": datetime.now().isoformat()
                     }
@@ -379,7 +659,7 @@ def main():
                 summary = st.session_state.summary_report
                 
                 # 重要度分布
-                importance_scores = [r.get('importance_score', 0) for r in st.session_state.analysis_results]
+                importance_scores = st.session_state.analysis_results.column('importance_score')
                 fig_hist = px.histogram(
                     x=importance_scores,
                     title="重要度スコア分布",
@@ -402,6 +682,10 @@ def main():
                 
                 if negative_rate < 20 and high_risk_rate < 3:
                     st.success("✅ 全体的に良好な評価です。現在の取り組みを継続してください。")
+            
+            # 処理段階ごとの計測結果
+            if st.session_state.metrics:
+                render_metrics(st.session_state.metrics)
         
         else:
             st.info("📤 まず分析を実行してください。")
@@ -0,0 +1,298 @@
+import argparse
+import glob
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from comment_analyzer import CommentAnalyzer, DynamoDBHandler, COMMENT_COLUMNS, PROMPT_VERSION
+from ingest_cache import IngestCache
+from llm_backends import LLMBackend
+from metrics import PipelineMetrics
+from progress import ProgressTracker, ConsoleProgressBar
+from result_sinks import open_sink
+from run_journal import RunJournal, file_sha256, DEFAULT_JOURNAL_DIR
+from summary import SummaryAggregator
+
+DEFAULT_PATTERN = "Day*.xlsx"
+
+
+def find_day_files(source: str) -> List[str]:
+    """
+    ディレクトリまたは glob パターンから Day ファイルの一覧を取得（Day1, Day2, ..., Day10 の順）
+
+    Args:
+        source (str): ディレクトリ（Day*.xlsx を探す）または glob パターン
+
+    Returns:
+        List[str]: ファイルパスのリスト
+    """
+    pattern = os.path.join(source, DEFAULT_PATTERN) if os.path.isdir(source) else source
+    paths = [path for path in glob.glob(pattern) if not os.path.basename(path).startswith("~$")]
+
+    def natural_key(path: str):
+        return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+    return sorted(paths, key=natural_key)
+
+
+def day_key(path: str) -> str:
+    """ファイル名から日付キー（Day1 など）を取得（見つからない場合は拡張子を除いたファイル名）"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    match = re.search(r"day\s*(\d+)", name, re.IGNORECASE)
+    return f"Day{int(match.group(1))}" if match else name
+
+
+def day_keys(paths: List[str]) -> Dict[str, str]:
+    """
+    ファイルごとの日付キー（出力ファイル名・日ごとの集計のキー）を取得
+
+    同じ日付キーになるファイルが複数ある場合（Day1_a.xlsx と day1-b.xlsx など）は、
+    それらのファイルは拡張子を除いたファイル名をキーにする。ファイル名でも重複する場合
+    （別のディレクトリにある同名のファイルなど）は ValueError を送出する。
+
+    Args:
+        paths (List[str]): ファイルパスのリスト
+
+    Returns:
+        Dict[str, str]: ファイルパス → 日付キー
+    """
+    keys = {path: day_key(path) for path in paths}
+    counts = Counter(keys.values())
+    for path, key in keys.items():
+        if counts[key] > 1:
+            keys[path] = os.path.splitext(os.path.basename(path))[0]
+    duplicates = sorted(key for key, count in Counter(keys.values()).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"出力ファイル名が重複するファイルがあります: {', '.join(duplicates)}")
+    return keys
+
+
+def _read_day_comments(path: str) -> Tuple[str, List[Tuple[str, int, str]], Tuple[int, int]]:
+    """別プロセスでファイルを読み込み、コメントとファイルのハッシュを返す（Parquet への変換も各プロセスで行う）"""
+    file_hash = file_sha256(path)
+    reader = IngestCache().comment_reader(path, COMMENT_COLUMNS, file_hash=file_hash)
+    comments = list(reader)
+    return file_hash, comments, reader.shape
+
+
+class _DayRun:
+    """1日分のファイルの分析状態"""
+
+    def __init__(self, path: str, day: str, file_hash: str, comments: List[Tuple[str, int, str]],
+                 model_name: str, journal_dir: str, resume: bool):
+        self.path = path
+        self.day = day
+        self.total = len(comments)
+        self.comments = comments
+        self.results: List[Dict[str, Any]] = []
+        self.journal = RunJournal(RunJournal.make_run_key(file_hash, model_name, PROMPT_VERSION), journal_dir)
+        if not resume:
+            self.journal.clear()
+        self.completed = self.journal.load()
+        self.finished = False
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) >= self.total
+
+
+class BatchRunner:
+    """
+    複数日のアンケートファイルをまとめて分析するバッチ処理
+
+    ファイルの読み込みはプロセスプールで並列に行い、読み込みが終わった日から順に
+    全日共通の1つの分析器（レートリミッター・キャッシュ・同時実行数を共有）に流す。
+    日ごとに結果CSVとサマリーJSONを出力し、必要に応じて DynamoDB に保存する。
+    """
+
+    def __init__(self, output_dir: str = "batch_results", max_workers: int = 4,
+                 requests_per_minute: float = 120.0, pack_size: int = 5, dedup: bool = True,
+                 parse_processes: Optional[int] = None, resume: bool = True,
+                 journal_dir: str = DEFAULT_JOURNAL_DIR, save_to_dynamodb: bool = False,
+                 backend: Optional[LLMBackend] = None, output_formats: Optional[List[str]] = None):
+        """
+        Args:
+            output_dir (str): 日ごとの結果・サマリーの出力先ディレクトリ
+            max_workers (int): 全日で共有するAPI呼び出しの同時実行数
+            requests_per_minute (float): 全日で共有するリクエスト上限（回/分）
+            pack_size (int): 1回のリクエストでまとめて分析するコメント数
+            dedup (bool): 重複・類似コメントをまとめるか（日をまたいで有効）
+            parse_processes (Optional[int]): ファイル読み込みのプロセス数（省略時はCPU数とファイル数の小さい方）
+            resume (bool): 日ごとのジャーナルから再開するか
+            journal_dir (str): ジャーナルを置くディレクトリ
+            save_to_dynamodb (bool): 日ごとの結果を DynamoDB に保存するか
+            backend (Optional[LLMBackend]): 使用するLLMバックエンド
+            output_formats (Optional[List[str]]): 日ごとの結果の出力形式（csv / parquet / jsonl、省略時は csv）
+        """
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.pack_size = pack_size
+        self.dedup = dedup
+        self.parse_processes = parse_processes
+        self.resume = resume
+        self.journal_dir = journal_dir
+        self.output_formats = output_formats or ["csv"]
+        self.metrics = PipelineMetrics()
+        self.analyzer = CommentAnalyzer(backend=backend, requests_per_minute=requests_per_minute, metrics=self.metrics)
+        self.dynamodb = DynamoDBHandler() if save_to_dynamodb else None
+
+    def run(self, paths: List[str]) -> Dict[str, Any]:
+        """
+        ファイルを分析し、日ごとの出力を書き込む
+
+        Args:
+            paths (List[str]): Day ファイルのパス
+
+        Returns:
+            Dict[str, Any]: 日ごとのサマリー（day → サマリーレポート）と全日の合計サマリー
+        """
+        # 日付キーが重複するファイルの出力・集計が上書きし合わないよう、先にキーを確定する
+        days = day_keys(paths)
+        os.makedirs(self.output_dir, exist_ok=True)
+        # 総件数はすべてのファイルを読み込むまで確定しないため、それまでは不明とする
+        # （読み込み済みの件数を総件数にすると、ファイルの合間に完了と表示してしまう）
+        tracker = ProgressTracker(None, [ConsoleProgressBar()])
+        positions: List[Tuple[_DayRun, str, int, int]] = []
+        aggregators: Dict[str, SummaryAggregator] = {}
+        runs: List[_DayRun] = []
+
+        def finish(run: _DayRun):
+            """1日分の分析が完了したら出力する"""
+            if run.finished:
+                return
+            run.finished = True
+            run.journal.close()
+            aggregators[run.day] = self._write_day(run)
+
+        def add_result(run: _DayRun, result: Dict[str, Any]):
+            run.results.append(result)
+            tracker.update(result)
+            if run.done:
+                finish(run)
+
+        def comments() -> Iterator[str]:
+            processes = self.parse_processes or min(len(paths), os.cpu_count() or 1)
+            loaded_total = 0
+            with ProcessPoolExecutor(max_workers=max(1, processes)) as pool:
+                futures = {pool.submit(_read_day_comments, path): path for path in paths}
+                for loaded, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    file_hash, day_comments, shape = future.result()
+                    run = _DayRun(path, days[path], file_hash, day_comments, self.analyzer.model_name,
+                                  self.journal_dir, self.resume)
+                    runs.append(run)
+                    loaded_total += run.total
+                    if loaded == len(futures):
+                        tracker.set_total(loaded_total)
+                    print(f"\n{run.day}: {shape[0]}行から{run.total}件のコメントを読み込みました（{path}）")
+
+                    column_counts: Dict[str, int] = {}
+                    for col, row, comment in run.comments:
+                        index = column_counts.get(col, 0)
+                        column_counts[col] = index + 1
+                        if (col, row) in run.completed:
+                            result = run.completed[(col, row)]
+                            result['index'] = index
+                            add_result(run, result)
+                            continue
+                        positions.append((run, col, row, index))
+                        yield comment
+                    run.comments = None  # 送り出したコメントは保持しない
+                    if run.done:
+                        finish(run)
+
+        results = self.analyzer.iter_analyze(comments(), max_workers=self.max_workers,
+                                             pack_size=self.pack_size, dedup=self.dedup)
+        for result in results:
+            run, col, row, index = positions[result['index']]
+            result['column_name'], result['row'], result['index'] = col, row, index
+            run.journal.append(result)
+            add_result(run, result)
+
+        for run in runs:
+            finish(run)
+        tracker.finish()
+        runs.sort(key=lambda run: paths.index(run.path))
+
+        # 日ごとの集計を統合して全日のサマリーを作る
+        total = SummaryAggregator()
+        for run in runs:
+            total.merge(aggregators[run.day])
+        report = {
+            "days": {run.day: aggregators[run.day].report() for run in runs},
+            "total": total.report(),
+            "metrics": self.metrics.snapshot()
+        }
+        with open(os.path.join(self.output_dir, "batch_summary.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        return report
+
+    def _write_day(self, run: _DayRun) -> SummaryAggregator:
+        """1日分の結果CSV・サマリーJSONを書き込み、必要なら DynamoDB に保存"""
+        column_order = {col: i for i, col in enumerate(COMMENT_COLUMNS)}
+        run.results.sort(key=lambda r: (column_order.get(r['column_name'], len(column_order)), r['index']))
+        aggregator = SummaryAggregator().add_all(run.results)
+
+        result_paths = [os.path.join(self.output_dir, f"{run.day}_analysis_results.{fmt}") for fmt in self.output_formats]
+        for path in result_paths:
+            with open_sink(path) as sink:
+                sink.write_all(run.results)
+        with open(os.path.join(self.output_dir, f"{run.day}_summary.json"), "w", encoding="utf-8") as f:
+            json.dump(aggregator.report(), f, ensure_ascii=False, indent=2, default=str)
+
+        if self.dynamodb is not None:
+            # DynamoDB のソートキーは日ごとに一意である必要があるため、日の中の連番を振り直す
+            self.dynamodb.save_results(run.day, [dict(r, index=i) for i, r in enumerate(run.results)])
+
+        print(f"\n{run.day}: {len(run.results)}件の結果を {', '.join(result_paths)} に保存しました。")
+        return aggregator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数日のアンケートファイルをまとめて分析")
+    parser.add_argument("source", nargs="?", default="data", help="Day*.xlsx を含むディレクトリまたは glob パターン")
+    parser.add_argument("--output-dir", default="batch_results", help="日ごとの結果・サマリーの出力先")
+    parser.add_argument("--max-workers", type=int, default=4, help="全日で共有するAPI呼び出しの同時実行数")
+    parser.add_argument("--rpm", type=float, default=120.0, help="全日で共有するリクエスト上限（回/分）")
+    parser.add_argument("--pack-size", type=int, default=5)
+    parser.add_argument("--no-dedup", action="store_true", help="重複・類似コメントをまとめない")
+    parser.add_argument("--parse-processes", type=int, default=None, help="ファイル読み込みのプロセス数")
+    parser.add_argument("--restart", action="store_true", help="ジャーナルを破棄して最初から分析する")
+    parser.add_argument("--dynamodb", action="store_true", help="日ごとの結果を DynamoDB に保存する")
+    parser.add_argument("--format", nargs="+", default=["csv"], choices=["csv", "parquet", "jsonl"],
+                        help="日ごとの結果の出力形式（複数指定可）")
+    args = parser.parse_args()
+
+    paths = find_day_files(args.source)
+    if not paths:
+        print(f"分析対象のファイルが見つかりません: {args.source}")
+        return
+
+    try:
+        days = day_keys(paths)
+    except ValueError as e:
+        print(e)
+        return
+
+    print(f"{len(paths)}件のファイルを分析します: {', '.join(days[path] for path in paths)}")
+    runner = BatchRunner(
+        output_dir=args.output_dir, max_workers=args.max_workers, requests_per_minute=args.rpm,
+        pack_size=args.pack_size, dedup=not args.no_dedup, parse_processes=args.parse_processes,
+        resume=not args.restart, save_to_dynamodb=args.dynamodb, output_formats=args.format
+    )
+    report = runner.run(paths)
+
+    print("\n=== 分析完了 ===")
+    for day, summary in report["days"].items():
+        if summary:
+            print(f"{day}: {summary['total_comments']}件 | 高重要度 {summary['high_importance_comments']}件"
+                  f" | 高危険度 {summary['high_risk_comments']}件")
+    if report["total"]:
+        print(f"合計: {report['total']['total_comments']}件")
+
+
+if __name__ == "__main__":
+    main()
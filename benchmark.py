@@ -0,0 +1,350 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from comment_analyzer import CommentAnalyzer, COMMENT_COLUMNS, process_excel_file
+from llm_backends import LLMBackend, LLMResponse, FakeBackend
+from rate_limiter import AdaptiveRateLimiter
+from result_store import ResultStore
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# 合成アンケートのコメント素材（実データに近い長さ・表記ゆれ・定型回答の割合を再現する）
+_SUBJECTS = ["講義", "資料", "スライド", "演習", "説明", "質疑応答", "サンプルコード", "配信", "時間配分", "課題"]
+_OPINIONS = ["とても分かりやすかったです", "少し難しかったです", "もう少し詳しく知りたいです", "ちょうど良かったです",
+             "音声が聞き取りにくかったです", "進むのが速すぎました", "実務に役立ちそうです", "具体例が多くて良かったです"]
+_REQUESTS = ["次回も期待しています", "資料を事前に配布してほしいです", "演習時間を増やしてほしいです",
+             "録画を公開してほしいです", "休憩を入れてほしいです", ""]
+_TEMPLATE_ANSWERS = ["特になし", "なし", "特にありません", "ありがとうございました", "よかったです", "-", "👍"]
+
+
+def make_synthetic_comment(rng: random.Random) -> str:
+    """講義アンケートの自由記述を模した合成コメントを1件生成"""
+    if rng.random() < 0.2:
+        return rng.choice(_TEMPLATE_ANSWERS)
+    parts = [f"{rng.choice(_SUBJECTS)}が{rng.choice(_OPINIONS)}。" for _ in range(rng.randint(1, 3))]
+    request = rng.choice(_REQUESTS)
+    if request:
+        parts.append(request + "。")
+    # 同一文面ばかりにならないよう受講生番号のような揺らぎを入れる
+    if rng.random() < 0.5:
+        parts.append(f"（{rng.randint(1, 999)}回目の受講）")
+    return "".join(parts)
+
+
+def make_synthetic_workbook(path: str, rows: int, seed: int = 0, blank_rate: float = 0.3) -> str:
+    """
+    実際の設問列（COMMENT_COLUMNS）を持つ合成アンケートのExcelファイルを作成
+
+    Args:
+        path (str): 出力先のファイルパス
+        rows (int): 回答者数（行数）
+        seed (int): 乱数シード
+        blank_rate (float): 無回答セルの割合
+
+    Returns:
+        str: 作成したファイルパス
+    """
+    rng = random.Random(seed)
+    data = {"回答者ID": list(range(1, rows + 1))}
+    for col in COMMENT_COLUMNS:
+        data[col] = [None if rng.random() < blank_rate else make_synthetic_comment(rng) for _ in range(rows)]
+    pd.DataFrame(data).to_excel(path, index=False)
+    return path
+
+
+class TimedBackend(LLMBackend):
+    """
+    呼び出しごとのレイテンシを記録するバックエンドのラッパー
+
+    まとめて分析した場合は、1回の呼び出しのレイテンシをその呼び出しに含まれる各コメントに割り当てる。
+    """
+
+    def __init__(self, backend: LLMBackend):
+        super().__init__(backend.model_name)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.request_latencies: List[float] = []
+        self.comment_latencies: List[float] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        start = time.perf_counter()
+        response = self.backend.generate(prompt, response_schema)
+        elapsed = time.perf_counter() - start
+        comments = len(re.findall(r'^\d+\. "', prompt, re.MULTILINE)) or 1
+        with self._lock:
+            self.request_latencies.append(elapsed)
+            self.comment_latencies.extend([elapsed] * comments)
+            self.input_tokens += response.input_tokens
+            self.output_tokens += response.output_tokens
+        return response
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    array = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(array, 50)), 6),
+        "p95": round(float(np.percentile(array, 95)), 6),
+        "max": round(float(array.max()), 6)
+    }
+
+
+def run_pipeline_benchmark(file_path: str, backend: TimedBackend, max_workers: int, pack_size: int,
+                           requests_per_minute: float, dedup: bool, work_dir: str) -> Dict[str, Any]:
+    """
+    process_excel_file を実行して計測
+
+    キャッシュとジャーナルは作業ディレクトリ内に作り直し、前回の結果を再利用しないようにする。
+    Excelの読み込みを毎回同じ条件で計測するため、読み込みキャッシュ（Parquet への変換）は使わない。
+    """
+    previous_cache_path = os.environ.get("ANALYSIS_CACHE_PATH")
+    os.environ["ANALYSIS_CACHE_PATH"] = os.path.join(work_dir, f"cache_{time.time_ns()}.sqlite3")
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = process_excel_file(
+                file_path, max_workers=max_workers, requests_per_minute=requests_per_minute,
+                pack_size=pack_size, dedup=dedup, resume=False,
+                journal_dir=os.path.join(work_dir, "journal"), backend=backend, use_ingest_cache=False
+            )
+        wall_time = time.perf_counter() - start
+    finally:
+        if previous_cache_path is None:
+            os.environ.pop("ANALYSIS_CACHE_PATH", None)
+        else:
+            os.environ["ANALYSIS_CACHE_PATH"] = previous_cache_path
+
+    comments = len(results["analysis_results"])
+    return {
+        "comments": comments,
+        "wall_time_sec": round(wall_time, 4),
+        "comments_per_sec": round(comments / wall_time, 2) if wall_time > 0 else 0.0,
+        "parse_failures": results["parse_stats"]["parse_failures"],
+        "triage_skipped": results["summary_report"]["triage_skipped"]["count"],
+        "stages": results["metrics"]["stages"]
+    }
+
+
+def run_batch_benchmark(comments: List[str], backend: TimedBackend, max_workers: int, pack_size: int,
+                        requests_per_minute: float, dedup: bool) -> Dict[str, Any]:
+    """CommentAnalyzer.analyze_comments_batch を実行して計測（キャッシュなし）"""
+    analyzer = CommentAnalyzer(backend=backend, rate_limiter=AdaptiveRateLimiter(requests_per_minute=requests_per_minute),
+                               use_cache=False)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = analyzer.analyze_comments_batch(comments, max_workers=max_workers, pack_size=pack_size, dedup=dedup)
+    wall_time = time.perf_counter() - start
+    return {
+        "comments": len(results),
+        "wall_time_sec": round(wall_time, 4),
+        "comments_per_sec": round(len(results) / wall_time, 2) if wall_time > 0 else 0.0,
+        "parse_failures": analyzer.get_parse_stats()["parse_failures"],
+        "stages": analyzer.metrics.snapshot()["stages"]
+    }
+
+
+def make_synthetic_results(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """process_excel_file の出力と同じ形式の合成分析結果を生成"""
+    rng = random.Random(seed)
+    results = []
+    for i in range(count):
+        comment = make_synthetic_comment(rng)
+        result = FakeBackend._fake_result(comment)
+        result.update({
+            "original_comment": comment,
+            "column_name": COMMENT_COLUMNS[i % len(COMMENT_COLUMNS)],
+            "index": i // len(COMMENT_COLUMNS),
+            "row": i // len(COMMENT_COLUMNS)
+        })
+        results.append(result)
+    return results
+
+
+def _best_time(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_store_benchmark(rows: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    分析結果の保持方法（辞書のリスト / ResultStore）のメモリ使用量と絞り込み速度を比較
+
+    結果は行数 × 設問数の件数を生成し、メモリは tracemalloc で構築時の確保量を計測する。
+    絞り込みはアプリの詳細分析タブと同じ条件（センチメント・カテゴリ・最小重要度）で行い、
+    列の比較（ResultStore.mask）とビットマップ索引（ResultStore.index）の速度も比較する。
+    """
+    count = rows * len(COMMENT_COLUMNS)
+
+    tracemalloc.start()
+    results = make_synthetic_results(count, seed=seed)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = ResultStore.from_results(make_synthetic_results(count, seed=seed))
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def filter_dicts():
+        return [r for r in results
+                if r.get("sentiment") == "negative" and r.get("category") == "content" and r.get("importance_score", 0) >= 7]
+
+    def filter_store():
+        return np.flatnonzero(store.mask(sentiment="negative", category="content", min_importance=7))
+
+    index_start = time.perf_counter()
+    index = store.index()
+    index_build_sec = time.perf_counter() - index_start
+
+    def filter_index():
+        return np.flatnonzero(index.mask(sentiment="negative", category="content", min_importance=7))
+
+    matched = len(filter_dicts())
+    assert matched == len(filter_store()) == len(filter_index())
+    dict_filter_sec = _best_time(filter_dicts)
+    store_filter_sec = _best_time(filter_store)
+    index_filter_sec = _best_time(filter_index)
+    return {
+        "comments": count,
+        "matched": matched,
+        "dict_list_bytes": dict_bytes,
+        "store_bytes": store_bytes,
+        "memory_ratio": round(dict_bytes / store_bytes, 2) if store_bytes else 0.0,
+        "dict_filter_sec": round(dict_filter_sec, 6),
+        "store_filter_sec": round(store_filter_sec, 6),
+        "filter_speedup": round(dict_filter_sec / store_filter_sec, 1) if store_filter_sec > 0 else 0.0,
+        "index_bytes": index.memory_usage(),
+        "index_build_sec": round(index_build_sec, 6),
+        "index_filter_sec": round(index_filter_sec, 6),
+        "index_speedup": round(store_filter_sec / index_filter_sec, 1) if index_filter_sec > 0 else 0.0
+    }
+
+
+def run_benchmarks(sizes: List[int], mode: str = "pipeline", max_workers: int = 8, pack_size: int = 5,
+                   requests_per_minute: float = 1e6, dedup: bool = True, latency: float = 0.05,
+                   latency_sigma: float = 0.5, error_rate: float = 0.0, seed: int = 0,
+                   work_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    指定した行数ごとにベンチマークを実行
+
+    Args:
+        sizes (List[int]): 合成アンケートの行数のリスト
+        mode (str): "pipeline"（process_excel_file）、"batch"（analyze_comments_batch）、
+            "store"（分析結果の保持方法の比較。LLMは呼ばない）
+        max_workers (int): 同時実行数
+        pack_size (int): 1回のリクエストでまとめて分析するコメント数
+        requests_per_minute (float): リクエスト上限（回/分）
+        dedup (bool): 重複・類似コメントをまとめるか
+        latency (float): フェイクバックエンドのレイテンシの中央値（秒）
+        latency_sigma (float): レイテンシの対数正規分布のばらつき
+        error_rate (float): フェイクバックエンドが429を返す確率
+        seed (int): 乱数シード
+        work_dir (Optional[str]): 合成ファイル等の作業ディレクトリ（省略時は一時ディレクトリ）
+
+    Returns:
+        List[Dict[str, Any]]: 行数ごとの計測結果
+    """
+    records = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = work_dir or tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for rows in sizes:
+            if mode == "store":
+                record = dict(mode=mode, rows=rows, **run_store_benchmark(rows, seed=seed))
+                records.append(record)
+                print(f"store rows={rows}: メモリ {record['dict_list_bytes'] / 1e6:.1f}MB → {record['store_bytes'] / 1e6:.1f}MB"
+                      f"（{record['memory_ratio']}倍） | 絞り込み {record['dict_filter_sec'] * 1e3:.2f}ms →"
+                      f" {record['store_filter_sec'] * 1e3:.2f}ms（{record['filter_speedup']}倍） |"
+                      f" 索引 {record['index_filter_sec'] * 1e3:.2f}ms（{record['index_speedup']}倍、"
+                      f"作成 {record['index_build_sec'] * 1e3:.0f}ms・{record['index_bytes'] / 1e6:.1f}MB）")
+                continue
+
+            file_path = os.path.join(work_dir, f"synthetic_{rows}_{seed}.xlsx")
+            generate_start = time.perf_counter()
+            if not os.path.exists(file_path):
+                make_synthetic_workbook(file_path, rows, seed=seed)
+            generate_time = time.perf_counter() - generate_start
+
+            backend = TimedBackend(FakeBackend(latency=latency, latency_sigma=latency_sigma,
+                                               error_rate=error_rate, seed=seed))
+            if mode == "pipeline":
+                record = run_pipeline_benchmark(file_path, backend, max_workers, pack_size,
+                                                requests_per_minute, dedup, work_dir)
+            elif mode == "batch":
+                df = pd.read_excel(file_path)
+                comments = [c for col in COMMENT_COLUMNS for c in df[col].dropna()]
+                record = run_batch_benchmark(comments, backend, max_workers, pack_size, requests_per_minute, dedup)
+            else:
+                raise ValueError(f"不明なモードです: {mode}")
+
+            record.update({
+                "mode": mode,
+                "rows": rows,
+                "max_workers": max_workers,
+                "pack_size": pack_size,
+                "dedup": dedup,
+                "latency": latency,
+                "latency_sigma": latency_sigma,
+                "error_rate": error_rate,
+                "workbook_generation_sec": round(generate_time, 4),
+                "llm_requests": len(backend.request_latencies),
+                "rate_limited": backend.backend.rate_limited_count,
+                "input_tokens": backend.input_tokens,
+                "output_tokens": backend.output_tokens,
+                "request_latency_sec": _percentiles(backend.request_latencies),
+                "comment_latency_sec": _percentiles(backend.comment_latencies)
+            })
+            records.append(record)
+            print(f"{mode} rows={rows}: {record['comments']}件 / {record['wall_time_sec']:.2f}秒"
+                  f"（{record['comments_per_sec']:.1f}件/秒, リクエスト {record['llm_requests']}回）")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="コメント分析パイプラインのスループット計測（フェイクLLMバックエンド使用）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="合成アンケートの行数")
+    parser.add_argument("--mode", choices=["pipeline", "batch", "store"], default="pipeline")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--pack-size", type=int, default=5)
+    parser.add_argument("--rpm", type=float, default=1e6, help="リクエスト上限（回/分）")
+    parser.add_argument("--no-dedup", action="store_true", help="重複・類似コメントをまとめない")
+    parser.add_argument("--latency", type=float, default=0.05, help="レイテンシの中央値（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="レイテンシの対数正規分布のばらつき")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429を返す確率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="合成ファイルを保存・再利用するディレクトリ")
+    parser.add_argument("--output", default="benchmark_results.json", help="結果のJSON出力先")
+    args = parser.parse_args()
+
+    records = run_benchmarks(
+        args.sizes, mode=args.mode, max_workers=args.max_workers, pack_size=args.pack_size,
+        requests_per_minute=args.rpm, dedup=not args.no_dedup, latency=args.latency,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate, seed=args.seed, work_dir=args.work_dir
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": records}, f, ensure_ascii=False, indent=2)
+    print(f"\n計測結果を {args.output} に保存しました。")
+
+
+if __name__ == "__main__":
+    main()
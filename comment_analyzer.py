@@ -1,12 +1,63 @@
-import google.generativeai as genai
 import pandas as pd
 import json
 import os
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator, Union
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from rate_limiter import AdaptiveRateLimiter, is_rate_limit_error
+from result_cache import ResultCache
+from dedup import NearDuplicateIndex
+from triage import TriageClassifier
+from run_journal import RunJournal, file_sha256, DEFAULT_JOURNAL_DIR
+from result_schema import RESULT_SCHEMA, PACKED_RESULT_SCHEMA, RESPONDENT_RESULT_SCHEMA, RISK_LEVELS, coerce_result, coerce_risk_level
+from llm_backends import LLMBackend, LLMResponse, create_backend
+from metrics import (PipelineMetrics, STAGE_EXCEL_LOAD, STAGE_COLUMN_EXTRACT, STAGE_PROMPT_BUILD,
+                     STAGE_MODEL_CALL, STAGE_JSON_PARSE, STAGE_SUMMARY)
+from progress import ProgressTracker, ProgressCallback, ConsoleProgressBar
+from summary import SummaryAggregator, summarize_respondents
+from excel_reader import ExcelCommentReader
+from ingest_cache import IngestCache
+from result_sinks import ResultSink, open_sink
+from scheduler import ColumnScheduler
 
 import boto3
+from boto3.dynamodb.conditions import Key
+
+# プロンプトの内容を変更したら更新する（キャッシュキーに含まれる）
+PROMPT_VERSION = "1"
+# 回答者単位の分析のプロンプトバージョン（キャッシュキー・ジャーナルのキーに含まれる）
+RESPONDENT_PROMPT_VERSION = f"{PROMPT_VERSION}-respondent"
+
+# コメント列（自由記述項目）
+COMMENT_COLUMNS = [
+    '【必須】本日の講義で学んだことを50文字以上で入力してください。',
+    '（任意）本日の講義で特によかった部分について、具体的にお教えください。',
+    '（任意）分かりにくかった部分や改善点などがあれば、具体的にお教えください。',
+    '（任意）講師について、よかった点や不満があった点などについて、具体的にお教えください。',
+    '（任意）今後開講してほしい講義・分野などがあればお書きください。',
+    '（任意）ご自由にご意見をお書きください。'
+]
+
+# コメント列の優先度（予算を設けて分析する場合、改善点・講師への意見を優先する）
+COLUMN_PRIORITIES = {
+    '【必須】本日の講義で学んだことを50文字以上で入力してください。': 1.0,
+    '（任意）本日の講義で特によかった部分について、具体的にお教えください。': 1.0,
+    '（任意）分かりにくかった部分や改善点などがあれば、具体的にお教えください。': 3.0,
+    '（任意）講師について、よかった点や不満があった点などについて、具体的にお教えください。': 2.0,
+    '（任意）今後開講してほしい講義・分野などがあればお書きください。': 1.0,
+    '（任意）ご自由にご意見をお書きください。': 2.0
+}
+
+# 分析項目の説明（単一コメント・複数コメントのプロンプトで共通）
+ANALYSIS_ITEMS = """1. sentiment: ポジティブ（positive）、ネガティブ（negative）、中立（neutral）のいずれか
+2. category: 講義内容（content）、講義資料（materials）、運営（management）、その他（others）のいずれか
+3. importance_score: 1-10の重要度スコア（具体性・緊急性・共通性を考慮）
+4. risk_level: high（重要・緊急）、medium（やや重要）、low（通常）のいずれか
+5. summary: コメントの要約（20文字以内）
+6. keywords: 重要なキーワード（最大5個の配列）"""
 
 # DynamoDBのテーブル名を指定
 
@@ -38,52 +89,102 @@ class DynamoDBHandler:
                 }
                 batch.put_item(Item=item)
     
+    def iter_results_by_day(self, day: str) -> Iterator[Dict[str, Any]]:
+        """
+        指定した day のコメントを1件ずつ返す（1MBを超える結果もページングして全件読み込む）
+        """
+        query_kwargs = {"KeyConditionExpression": Key('day').eq(day)}
+        while True:
+            response = self.table.query(**query_kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
     def load_results_by_day(self, day: str) -> List[Dict[str, Any]]:
-        response = self.table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('day').eq(day)
-        )
-        return response.get('Items', [])
+        return list(self.iter_results_by_day(day))
 
     def load_summary_by_day(self, day: str) -> Dict[str, Any]:
         """
         指定した day の全コメントを読み込み、サマリーレポートを返す。
         """
-        items = self.load_results_by_day(day)
+        aggregator = self.aggregate_by_day(day)
 
-        if not items:
+        if aggregator.total == 0:
             return {
                 "total_comments": 0,
                 "sentiment_distribution": {},
                 "category_distribution": {},
                 "high_importance_comments": 0,
                 "high_risk_comments": 0,
+                "triage_skipped": {"count": 0, "percentage": 0.0},
                 "top_high_risk_comments": []
             }
 
-        # CommentAnalyzerを一時的に使ってサマリー生成
-        analyzer = CommentAnalyzer()
-        summary = analyzer.generate_summary_report(items)
-        return summary
+        return aggregator.report()
+
+    def aggregate_by_day(self, day: str) -> SummaryAggregator:
+        """
+        指定した day のコメントを読み込みながら集計する（複数日の集計器は merge() で統合できる）
+        """
+        return SummaryAggregator().add_all(self.iter_results_by_day(day))
 
 
 
 class CommentAnalyzer:
-    def __init__(self):
-        """コメント分析器の初期化"""
-        load_dotenv()
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEYが設定されていません。.envファイルに設定してください。")
+    def __init__(self, backend: Optional[LLMBackend] = None, rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 requests_per_minute: float = 120.0, max_retries: int = 5,
+                 cache: Optional[ResultCache] = None, use_cache: bool = True,
+                 triage: Optional[TriageClassifier] = None,
+                 use_triage: bool = True, structured_output: bool = True,
+                 metrics: Optional[PipelineMetrics] = None):
+        """
+        コメント分析器の初期化
+        
+        Args:
+            backend (Optional[LLMBackend]): 使用するLLMバックエンド（省略時は LLM_BACKEND 環境変数、既定は Gemini）
+            rate_limiter (Optional[AdaptiveRateLimiter]): 共有するレートリミッター（省略時は新規作成）
+            requests_per_minute (float): レートリミッターを新規作成する場合のリクエスト上限（回/分）
+            max_retries (int): レート制限エラー時の再試行回数
+            cache (Optional[ResultCache]): 共有する結果キャッシュ（省略時は既定のパスで新規作成）
+            use_cache (bool): 結果キャッシュを使用するか
+            triage (Optional[TriageClassifier]): 定型コメントをローカルで判定する分類器（省略時は既定の設定で新規作成）
+            use_triage (bool): ローカル判定を使用するか
+            structured_output (bool): スキーマを指定してJSON形式の応答を要求するか
+            metrics (Optional[PipelineMetrics]): 処理段階の所要時間・カウンターの集計先（省略時は新規作成）
+        """
+        self.backend = backend or create_backend()
+        self.model_name = self.backend.model_name
+
+        # 並列実行時も全スレッドで共有するレートリミッター
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(requests_per_minute=requests_per_minute)
+        self.max_retries = max_retries
+
+        # プロセス・セッション間で共有する分析結果キャッシュ
+        if cache is None and use_cache:
+            cache = ResultCache()
+        self.cache = cache
+
+        # 「なし」などの定型コメントはモデルを呼ばずにローカルで判定
+        if triage is None and use_triage:
+            triage = TriageClassifier()
+        self.triage = triage
+
+        # 応答のパース結果の集計（パース失敗率の報告用）
+        self.structured_output = structured_output
+        self._parse_lock = threading.Lock()
+        self._parse_stats = {"parsed": 0, "parse_failures": 0, "coerced": 0}
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # 処理段階ごとの所要時間・リトライ・トークン数などの計測
+        self.metrics = metrics or PipelineMetrics()
         
-    def analyze_comment(self, comment: str) -> Dict[str, Any]:
+    def analyze_comment(self, comment: str, resolve_locally: bool = True) -> Dict[str, Any]:
         """
         単一のコメントを分析
         
         Args:
             comment (str): 分析対象のコメント
+            resolve_locally (bool): モデル呼び出し前にローカル判定とキャッシュを参照するか（参照済みの場合は False）
             
         Returns:
             Dict[str, Any]: 分析結果
@@ -98,7 +199,13 @@ class CommentAnalyzer:
                 "keywords": []
             }
         
-        prompt = f"""
+        if resolve_locally:
+            resolved = self._resolve_locally(comment)
+            if resolved is not None:
+                return resolved
+        
+        with self.metrics.stage(STAGE_PROMPT_BUILD):
+            prompt = f"""
 以下の講義アンケートのコメントを分析してください。
 JSON形式で回答してください。
 
@@ -106,12 +213,7 @@ JSON形式で回答してください。
 
 以下の項目について分析してください：
 
-1. sentiment: ポジティブ（positive）、ネガティブ（negative）、中立（neutral）のいずれか
-2. category: 講義内容（content）、講義資料（materials）、運営（management）、その他（others）のいずれか
-3. importance_score: 1-10の重要度スコア（具体性・緊急性・共通性を考慮）
-4. risk_level: high（重要・緊急）、medium（やや重要）、low（通常）のいずれか
-5. summary: コメントの要約（20文字以内）
-6. keywords: 重要なキーワード（最大5個の配列）
+{ANALYSIS_ITEMS}
 
 回答例：
 {{
@@ -125,24 +227,21 @@ JSON形式で回答してください。
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            # JSONの抽出（```json```で囲まれている場合の処理）
-            if "```json" in result_text:
-                start = result_text.find("```json") + 7
-                end = result_text.find("```", start)
-                result_text = result_text[start:end].strip()
-            elif "```" in result_text:
-                start = result_text.find("```") + 3
-                end = result_text.find("```", start)
-                result_text = result_text[start:end].strip()
+            response = self._generate_content(prompt, RESULT_SCHEMA)
             
-            result = json.loads(result_text)
-            
-            # 結果が辞書型であることを確認
-            if not isinstance(result, dict):
-                print(f"警告: JSONパース結果が辞書型ではありません: {type(result)}")
+            with self.metrics.stage(STAGE_JSON_PARSE):
+                result_text = self._extract_json_text(response.text)
+                try:
+                    parsed = json.loads(result_text)
+                except json.JSONDecodeError:
+                    self._record_parse(failed=1)
+                    raise
+                
+                # スキーマに合わせて検証・補正（日本語ラベルや文字列のスコアなど）
+                result, coerced = coerce_result(parsed)
+            if result is None:
+                self._record_parse(failed=1)
+                print(f"警告: 応答がスキーマに合致しません: {type(parsed)}")
                 return {
                     "sentiment": "neutral",
                     "category": "others",
@@ -151,11 +250,9 @@ JSON形式で回答してください。
                     "summary": "分析エラー",
                     "keywords": []
                 }
+            self._record_parse(succeeded=1, coerced=int(coerced))
             
-            # 必須フィールドの確認と修正
-            if 'keywords' in result and not isinstance(result['keywords'], list):
-                result['keywords'] = []
-            
+            self._cache_put(comment, result)
             return result
             
         except Exception as e:
@@ -170,59 +267,521 @@ JSON形式で回答してください。
                 "keywords": []
             }
     
-    def analyze_comments_batch(self, comments: List[str], delay: float = 0.5) -> List[Dict[str, Any]]:
+    def analyze_comments_packed(self, comments: List[str], max_pack_retries: int = 1) -> List[Dict[str, Any]]:
         """
-        複数のコメントを一括分析
+        複数のコメントを1回のリクエストでまとめて分析
+        
+        番号付きのコメント一覧を送り、JSON配列として結果を受け取る。
+        配列が壊れていたり件数が足りない場合は、欠けたコメントだけを再送し、
+        それでも欠けたものは1件ずつ analyze_comment で分析する。
         
         Args:
-            comments (List[str]): 分析対象のコメントリスト
-            delay (float): API呼び出し間の遅延（秒）
+            comments (List[str]): 分析対象のコメントリスト（空でないもの）
+            max_pack_retries (int): 欠けたコメントをまとめて再送する回数
             
         Returns:
-            List[Dict[str, Any]]: 分析結果のリスト
+            List[Dict[str, Any]]: 分析結果のリスト（入力順）
         """
-        results = []
-        total = len(comments)
-        start_time = time.time()
+        results: List[Dict[str, Any]] = [None] * len(comments)
+        pending = list(range(len(comments)))
         
-        for i, comment in enumerate(comments):
-            if i > 0:
-                time.sleep(delay)  # API レート制限対策
-                
-            result = self.analyze_comment(comment)
-            result['original_comment'] = comment
-            result['index'] = i
-            results.append(result)
+        for attempt in range(max_pack_retries + 1):
+            if len(pending) <= 1:
+                break
+            parsed = self._request_pack([comments[i] for i in pending])
+            missing = []
+            for number, i in enumerate(pending, 1):
+                if number in parsed:
+                    results[i] = parsed[number]
+                    self._cache_put(comments[i], results[i])
+                else:
+                    missing.append(i)
+            if missing:
+                print(f"警告: まとめて分析した{len(pending)}件中{len(missing)}件の結果が欠けていました")
+            pending = missing
+        
+        # まとめて取得できなかったコメントは個別に分析
+        for i in pending:
+            results[i] = self.analyze_comment(comments[i], resolve_locally=False)
+        
+        return results
+    
+    def _request_pack(self, comments: List[str]) -> Dict[int, Dict[str, Any]]:
+        """
+        番号付きのコメント一覧を1回のリクエストで分析し、番号→分析結果の辞書を返す
+        
+        パースできなかった要素は辞書に含めない。
+        """
+        with self.metrics.stage(STAGE_PROMPT_BUILD):
+            numbered = "\n".join(f'{number}. "{comment}"' for number, comment in enumerate(comments, 1))
+            prompt = f"""
+以下の講義アンケートのコメント（{len(comments)}件）をそれぞれ分析してください。
+JSON配列で回答してください。配列の各要素には、対応するコメントの番号を "id" として含めてください。
+
+コメント:
+{numbered}
+
+各コメントについて以下の項目を分析してください：
+
+{ANALYSIS_ITEMS}
+
+回答例：
+[
+    {{
+        "id": 1,
+        "sentiment": "negative",
+        "category": "content",
+        "importance_score": 8,
+        "risk_level": "high",
+        "summary": "講義内容が難しすぎる",
+        "keywords": ["難しい", "理解困難", "講義内容"]
+    }}
+]
+"""
+        try:
+            response = self._generate_content(prompt, PACKED_RESULT_SCHEMA)
+        except Exception as e:
+            print(f"コメント一括分析エラー: {e}")
+            return {}
+        
+        with self.metrics.stage(STAGE_JSON_PARSE):
+            return self._parse_pack(response.text, len(comments))
+    
+    def _parse_pack(self, text: str, count: int) -> Dict[int, Dict[str, Any]]:
+        """まとめて分析した応答をパースし、番号→分析結果の辞書を返す"""
+        result_text = self._extract_json_text(text)
+        try:
+            items = json.loads(result_text)
+            if isinstance(items, dict):
+                items = [items]
+        except json.JSONDecodeError:
+            # 配列全体が壊れていても、読み取れる要素だけは救済する
+            items = self._salvage_json_objects(result_text)
+        return self._parse_pack_items(items, count)
+    
+    def _parse_pack_items(self, items: Any, count: int) -> Dict[int, Dict[str, Any]]:
+        """id 付きの分析結果の配列を検証・補正し、番号→分析結果の辞書を返す"""
+        parsed = {}
+        coerced_count = 0
+        if not isinstance(items, list):
+            items = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.pop('id'))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 1 <= number <= count or number in parsed:
+                continue
+            result, coerced = coerce_result(item)
+            if result is None:
+                continue
+            coerced_count += int(coerced)
+            parsed[number] = result
+        
+        self._record_parse(succeeded=len(parsed), failed=count - len(parsed), coerced=coerced_count)
+        return parsed
+    
+    def analyze_respondent(self, answers: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        1人の回答者の全回答を1回のリクエストでまとめて分析
+        
+        設問と回答の組を番号付きで送り、回答ごとの分析結果と回答者全体の危険度を受け取る。
+        同じ回答者の他の回答を文脈として分析できる。
+        「特になし」などローカル判定で確定する回答はプロンプトに含めない。
+        欠けた回答は1件ずつ analyze_comment で分析し、回答者全体の危険度が得られなかった場合は
+        回答ごとの危険度の最大値を使う。
+        
+        Args:
+            answers (List[Tuple[str, str]]): (設問の列名, 回答) のリスト
             
-            # 進捗表示
-            progress = (i + 1) / total
-            if (i + 1) % 5 == 0 or i + 1 == total:
-                # プログレスバーの作成
-                bar_length = 30
-                filled_length = int(bar_length * progress)
-                bar = '█' * filled_length + '░' * (bar_length - filled_length)
-                
-                # 推定残り時間の計算
-                elapsed_time = time.time() - start_time
-                if i > 0 and elapsed_time > 0:
-                    avg_time_per_comment = elapsed_time / (i + 1)
-                    remaining_time = avg_time_per_comment * (total - i - 1)
-                    eta_str = f" | 残り時間: {int(remaining_time//60)}分{int(remaining_time%60)}秒"
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: 回答ごとの分析結果（入力順、respondent_risk 付き）と回答者全体の危険度
+        """
+        results: List[Dict[str, Any]] = [None] * len(answers)
+        pending = []
+        for i, (_, comment) in enumerate(answers):
+            if not isinstance(comment, str) or comment.strip() == "":
+                results[i] = self.analyze_comment(comment)
+                continue
+            if self.triage is not None:
+                triaged = self.triage.classify(comment)
+                if triaged is not None:
+                    self.metrics.increment("triage_hits")
+                    results[i] = triaged
+                    continue
+            pending.append(i)
+        
+        respondent_risk = None
+        if pending:
+            cache_text = json.dumps([list(answers[i]) for i in pending], ensure_ascii=False)
+            cached = self._cache_get(cache_text, RESPONDENT_PROMPT_VERSION)
+            if cached is not None:
+                parsed, respondent_risk = {n: r for n, r in enumerate(cached["answers"], 1)}, cached["respondent_risk"]
+            else:
+                parsed, respondent_risk = self._request_respondent([answers[i] for i in pending])
+                if len(parsed) == len(pending) and respondent_risk is not None:
+                    self._cache_put(cache_text, {"answers": [parsed[n] for n in range(1, len(pending) + 1)],
+                                                 "respondent_risk": respondent_risk}, RESPONDENT_PROMPT_VERSION)
+            for number, i in enumerate(pending, 1):
+                if number in parsed:
+                    results[i] = dict(parsed[number])
                 else:
-                    eta_str = ""
+                    results[i] = self.analyze_comment(answers[i][1], resolve_locally=False)
+        
+        if respondent_risk is None:
+            levels = [result.get('risk_level') for result in results]
+            respondent_risk = next((level for level in RISK_LEVELS if level in levels), "low")
+        for result in results:
+            result['respondent_risk'] = respondent_risk
+        return results, respondent_risk
+    
+    def _request_respondent(self, answers: List[Tuple[str, str]]) -> Tuple[Dict[int, Dict[str, Any]], Optional[str]]:
+        """
+        1人の回答者の回答を1回のリクエストで分析し、番号→分析結果の辞書と回答者全体の危険度を返す
+        
+        パースできなかった回答は辞書に含めず、危険度が読み取れない場合は None を返す。
+        """
+        with self.metrics.stage(STAGE_PROMPT_BUILD):
+            numbered = "\n".join(f'設問{number}: {column}\n{number}. "{comment}"'
+                                  for number, (column, comment) in enumerate(answers, 1))
+            prompt = f"""
+以下は講義アンケートの1人の回答者による回答（{len(answers)}件）です。
+同じ回答者の他の回答も踏まえて、各回答を分析してください。
+JSONオブジェクトで回答してください。"answers" には各回答の分析結果の配列を入れ、
+各要素には対応する回答の番号を "id" として含めてください。
+"respondent_risk" には回答者全体としての危険度（high / medium / low）を入れてください。
+複数の回答にまたがる強い不満や、受講継続が危ぶまれる内容、早急な対応が必要な内容があれば high とします。
+
+回答:
+{numbered}
+
+各回答について以下の項目を分析してください：
+
+{ANALYSIS_ITEMS}
+
+回答例：
+{{
+    "answers": [
+        {{
+            "id": 1,
+            "sentiment": "negative",
+            "category": "content",
+            "importance_score": 8,
+            "risk_level": "high",
+            "summary": "講義内容が難しすぎる",
+            "keywords": ["難しい", "理解困難", "講義内容"]
+        }}
+    ],
+    "respondent_risk": "high"
+}}
+"""
+        try:
+            response = self._generate_content(prompt, RESPONDENT_RESULT_SCHEMA)
+        except Exception as e:
+            print(f"回答者単位の分析エラー: {e}")
+            return {}, None
+        
+        with self.metrics.stage(STAGE_JSON_PARSE):
+            result_text = self._extract_json_text(response.text)
+            try:
+                data = json.loads(result_text)
+            except json.JSONDecodeError:
+                data = self._salvage_json_objects(result_text)
+            if isinstance(data, dict) and "answers" in data:
+                return self._parse_pack_items(data["answers"], len(answers)), coerce_risk_level(data.get("respondent_risk"))
+            # 配列だけが返された場合は回答ごとの結果として扱う
+            return self._parse_pack_items(data if isinstance(data, list) else [data], len(answers)), None
+    
+    def _resolve_locally(self, comment: str) -> Optional[Dict[str, Any]]:
+        """ローカル判定またはキャッシュで結果が確定すれば返す（確定しなければ None）"""
+        if not isinstance(comment, str) or comment.strip() == "":
+            return None
+        if self.triage is not None:
+            result = self.triage.classify(comment)
+            if result is not None:
+                self.metrics.increment("triage_hits")
+                return result
+        return self._cache_get(comment)
+
+    def _cache_key(self, comment: str, prompt_version: str = PROMPT_VERSION) -> str:
+        return ResultCache.make_key(comment, prompt_version, self.model_name)
+
+    def _cache_get(self, comment: str, prompt_version: str = PROMPT_VERSION) -> Optional[Dict[str, Any]]:
+        """キャッシュから分析結果を取得（キャッシュ無効時・未登録時は None）"""
+        if self.cache is None:
+            return None
+        result = self.cache.get(self._cache_key(comment, prompt_version))
+        self.metrics.increment("cache_hits" if result is not None else "cache_misses")
+        return result
+
+    def _cache_put(self, comment: str, result: Dict[str, Any], prompt_version: str = PROMPT_VERSION):
+        """分析エラー以外の結果をキャッシュに保存"""
+        if self.cache is None or result.get('summary') == "分析エラー":
+            return
+        self.cache.put(self._cache_key(comment, prompt_version), result)
+    
+    @staticmethod
+    def _extract_json_text(text: str) -> str:
+        """レスポンスからJSON部分を抽出（```json```で囲まれている場合の処理）"""
+        result_text = text.strip()
+        if "```json" in result_text:
+            start = result_text.find("```json") + 7
+            end = result_text.find("```", start)
+            result_text = result_text[start:end].strip()
+        elif "```" in result_text:
+            start = result_text.find("```") + 3
+            end = result_text.find("```", start)
+            result_text = result_text[start:end].strip()
+        return result_text
+    
+    @staticmethod
+    def _salvage_json_objects(text: str) -> List[Any]:
+        """壊れたJSON配列から、単独でパースできるオブジェクトを取り出す"""
+        decoder = json.JSONDecoder()
+        objects = []
+        pos = text.find("{")
+        while pos != -1:
+            try:
+                obj, end = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                pos = text.find("{", pos + 1)
+                continue
+            objects.append(obj)
+            pos = text.find("{", end)
+        return objects
+    
+    def _record_parse(self, succeeded: int = 0, failed: int = 0, coerced: int = 0):
+        with self._parse_lock:
+            self._parse_stats["parsed"] += succeeded + failed
+            self._parse_stats["parse_failures"] += failed
+            self._parse_stats["coerced"] += coerced
+        self.metrics.increment("parsed", succeeded + failed)
+        self.metrics.increment("parse_failures", failed)
+        self.metrics.increment("coerced", coerced)
+
+    def get_parse_stats(self) -> Dict[str, Any]:
+        """
+        応答のパース結果の集計を返す
+        
+        Returns:
+            Dict[str, Any]: パース対象件数・失敗件数・補正件数と、それぞれの割合（%）
+        """
+        with self._parse_lock:
+            stats = dict(self._parse_stats)
+        parsed = stats["parsed"]
+        stats["failure_rate"] = stats["parse_failures"] / parsed * 100 if parsed else 0.0
+        stats["coerced_rate"] = stats["coerced"] / parsed * 100 if parsed else 0.0
+        return stats
+
+    def _generate_content(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """
+        レートリミッターを通してバックエンドを呼び出す
+        
+        構造化出力が有効でスキーマが指定された場合は、JSON形式の応答を要求する。
+        レート制限エラー時はリミッターのレートを下げて再試行し、
+        再試行回数を超えた場合は例外をそのまま送出する。
+        """
+        if not self.structured_output:
+            response_schema = None
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            self.metrics.increment("llm_requests")
+            try:
+                with self.metrics.stage(STAGE_MODEL_CALL):
+                    response = self.backend.generate(prompt, response_schema)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    self.metrics.increment("llm_errors")
+                    raise
+                print(f"レート制限を検出しました（{attempt + 1}回目）。レートを下げて再試行します: {e}")
+                self.metrics.increment("retries")
+                self.rate_limiter.record_rate_limited(getattr(e, 'retry_after', None))
+                continue
+            self.rate_limiter.record_success()
+            self.metrics.increment("input_tokens", response.input_tokens)
+            self.metrics.increment("output_tokens", response.output_tokens)
+            return response
+
+    def iter_analyze(self, comments: Iterable[str], max_workers: int = 1, pack_size: int = 1,
+                     dedup: bool = False, dedup_threshold: float = 0.9,
+                     stop: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        複数のコメントを分析し、完了した順に結果を返すジェネレータ
+        
+        comments はリストでもイテレータでもよく、必要な分だけ順に読み込む。
+        ローカル判定・キャッシュで確定するコメントは即座に、
+        モデルを呼ぶコメントは応答が返った順に結果を返す。
+        
+        Args:
+            comments (Iterable[str]): 分析対象のコメント
+            max_workers (int): 同時に実行するAPI呼び出しの上限（1の場合は逐次実行）
+            pack_size (int): 1回のリクエストでまとめて分析するコメント数（1の場合は1件ずつ）
+            dedup (bool): ほぼ同一のコメントをまとめ、代表コメントのみ分析するか
+            dedup_threshold (float): 同一とみなす文字 n-gram の Jaccard 係数の下限
+            stop (Optional[threading.Event]): セットされると新しいリクエストを送らず、
+                送信済みのリクエストの結果を返し終えた時点で終了する
+            
+        Yields:
+            Dict[str, Any]: 分析結果（index は入力順の位置、original_comment 付き）
+        """
+        dedup_index = NearDuplicateIndex(threshold=dedup_threshold) if dedup else None
+        rep_results: Dict[int, Dict[str, Any]] = {}
+        waiting: Dict[int, List[Tuple[int, str]]] = {}
+        
+        def finish(i: int, comment: str, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+            """結果を確定し、同じグループで代表の結果を待っているコメントにも展開"""
+            result['original_comment'] = comment
+            result['index'] = i
+            yield result
+            if dedup_index is None:
+                return
+            rep_results[i] = result
+            for member, member_comment in waiting.pop(i, []):
+                yield self._copy_result(result, member, member_comment)
+        
+        def analyze_unit(unit: List[Tuple[int, str]]) -> List[Tuple[int, str, Dict[str, Any]]]:
+            if len(unit) == 1:
+                unit_results = [self.analyze_comment(unit[0][1], resolve_locally=False)]
+            else:
+                unit_results = self.analyze_comments_packed([comment for _, comment in unit])
+            return [(i, comment, result) for (i, comment), result in zip(unit, unit_results)]
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        in_flight = set()
+        pack: List[Tuple[int, str]] = []
+        
+        def collect(block: bool) -> Iterator[Dict[str, Any]]:
+            """完了したリクエストの結果を返す（block=True なら1件以上完了するまで待つ）"""
+            nonlocal in_flight
+            done, in_flight = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                for i, comment, result in future.result():
+                    yield from finish(i, comment, result)
+        
+        try:
+            for i, comment in enumerate(comments):
+                if stop is not None and stop.is_set():
+                    pack = []
+                    break
+                if dedup_index is not None:
+                    rep = dedup_index.add(comment)
+                    if rep != i:
+                        if rep in rep_results:
+                            yield self._copy_result(rep_results[rep], i, comment)
+                        else:
+                            waiting.setdefault(rep, []).append((i, comment))
+                        continue
                 
-                # センチメント統計の計算
-                sentiments = [r['sentiment'] for r in results[:i+1]]
-                pos_count = sentiments.count('positive')
-                neg_count = sentiments.count('negative')
+                # 空のコメント・ローカル判定・キャッシュで確定するものはモデルを呼ばない
+                if not isinstance(comment, str) or comment.strip() == "":
+                    yield from finish(i, comment, self.analyze_comment(comment))
+                    continue
+                resolved = self._resolve_locally(comment)
+                if resolved is not None:
+                    yield from finish(i, comment, resolved)
+                    continue
                 
-                print(f"\r[{bar}] {i + 1}/{total} ({progress*100:.1f}%) | ポジティブ: {pos_count} | ネガティブ: {neg_count}{eta_str}", end="", flush=True)
+                pack.append((i, comment))
+                if len(pack) >= max(1, pack_size):
+                    in_flight.add(executor.submit(analyze_unit, pack))
+                    pack = []
                 
-                if i + 1 == total:
-                    print()  # 最後に改行
+                # 読み込みが先行しすぎないよう、実行中のリクエスト数を制限
+                yield from collect(block=len(in_flight) >= max(1, max_workers) * 2)
+            
+            if pack:
+                in_flight.add(executor.submit(analyze_unit, pack))
+            while in_flight:
+                yield from collect(block=True)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_analyze_respondents(self, respondents: Iterable[List[Tuple[str, str]]], max_workers: int = 1,
+                                 stop: Optional[threading.Event] = None) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        回答者ごとに全回答をまとめて分析し、完了した順に結果を返すジェネレータ
+        
+        Args:
+            respondents (Iterable[List[Tuple[str, str]]]): 回答者ごとの (設問の列名, 回答) のリスト
+            max_workers (int): 同時に実行するAPI呼び出しの上限（1の場合は逐次実行）
+            stop (Optional[threading.Event]): セットされると新しいリクエストを送らず、
+                送信済みのリクエストの結果を返し終えた時点で終了する
+            
+        Yields:
+            Tuple[int, List[Dict[str, Any]]]: 入力順の回答者の位置と、回答ごとの分析結果（original_comment 付き）
+        """
+        def analyze(position: int, answers: List[Tuple[str, str]]) -> Tuple[int, List[Dict[str, Any]]]:
+            results, _ = self.analyze_respondent(answers)
+            for (_, comment), result in zip(answers, results):
+                result['original_comment'] = comment
+            return position, results
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        in_flight = set()
+        
+        def collect(block: bool) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+            nonlocal in_flight
+            done, in_flight = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        
+        try:
+            for position, answers in enumerate(respondents):
+                if stop is not None and stop.is_set():
+                    break
+                in_flight.add(executor.submit(analyze, position, answers))
+                # 読み込みが先行しすぎないよう、実行中のリクエスト数を制限
+                yield from collect(block=len(in_flight) >= max(1, max_workers) * 2)
+            while in_flight:
+                yield from collect(block=True)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _copy_result(result: Dict[str, Any], i: int, comment: str) -> Dict[str, Any]:
+        """代表コメントの分析結果を同じグループのコメント用に複製"""
+        copied = dict(result)
+        copied['keywords'] = list(result.get('keywords', []))
+        copied['original_comment'] = comment
+        copied['index'] = i
+        return copied
+
+    def analyze_comments_batch(self, comments: List[str], delay: Optional[float] = None, max_workers: int = 1,
+                               pack_size: int = 1, dedup: bool = False, dedup_threshold: float = 0.9,
+                               progress_callback: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+        """
+        複数のコメントを一括分析
+        
+        API呼び出しの間隔はレートリミッターが制御する。
+        
+        Args:
+            comments (List[str]): 分析対象のコメントリスト
+            delay (Optional[float]): 後方互換用。指定時はリクエスト上限を 60/delay 回/分 に設定する
+            max_workers (int): 同時に実行するAPI呼び出しの上限（1の場合は逐次実行）
+            pack_size (int): 1回のリクエストでまとめて分析するコメント数（1の場合は1件ずつ）
+            dedup (bool): ほぼ同一のコメントをまとめ、代表コメントのみ分析するか
+            dedup_threshold (float): 同一とみなす文字 n-gram の Jaccard 係数の下限
+            progress_callback (Optional[ProgressCallback]): 1件完了するごとに進捗を受け取る関数（省略時はコンソールに表示）
+            
+        Returns:
+            List[Dict[str, Any]]: 分析結果のリスト（入力順）
+        """
+        if delay:
+            self.rate_limiter.set_budget(60.0 / delay)
+
+        results: List[Dict[str, Any]] = [None] * len(comments)
+        tracker = ProgressTracker(len(comments), [progress_callback or ConsoleProgressBar()])
+
+        completed = self.iter_analyze(comments, max_workers=max_workers, pack_size=pack_size,
+                                      dedup=dedup, dedup_threshold=dedup_threshold)
+        for result in completed:
+            results[result['index']] = result
+            tracker.update(result)
         
         return results
-    
+
     def generate_summary_report(self, analysis_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         分析結果のサマリーレポートを生成
@@ -233,103 +792,328 @@ JSON形式で回答してください。
         Returns:
             Dict[str, Any]: サマリーレポート
         """
-        if not analysis_results:
-            return {}
+        with self.metrics.stage(STAGE_SUMMARY):
+            return SummaryAggregator().add_all(analysis_results).report()
+
+def sort_column_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """完了順の結果を列・行の順に並べ直す（COMMENT_COLUMNS の順、それ以外の列は出現順）"""
+    column_order = {col: i for i, col in enumerate(COMMENT_COLUMNS)}
+    for result in results:
+        column_order.setdefault(result['column_name'], len(column_order))
+    results.sort(key=lambda r: (column_order[r['column_name']], r['index']))
+    return results
+
+def iter_column_comments(analyzer: CommentAnalyzer, column_comments: Iterable[Tuple[str, int, str]],
+                         journal: Optional[RunJournal] = None, progress_callback: Optional[ProgressCallback] = None,
+                         total: Optional[int] = None, **analyze_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    複数の列のコメントをまとめて分析し、完了した順に結果を返すジェネレータ
+    
+    journal を指定すると完了した結果を1件ずつ記録し、
+    記録済みの (列名, 行番号) は分析せずに記録された結果を返す。
+    
+    Args:
+        analyzer (CommentAnalyzer): 使用する分析器
+        column_comments (Iterable[Tuple[str, int, str]]): (列名, 行番号, コメント) の並び
+        journal (Optional[RunJournal]): 途中経過を記録するジャーナル
+        progress_callback (Optional[ProgressCallback]): 1件完了するごとに進捗を受け取る関数
+            （ジャーナルから再利用した結果も1件として数える）
+        total (Optional[int]): 総件数（column_comments が件数を持たない逐次読み込みの場合に指定）
+        **analyze_kwargs: iter_analyze に渡す引数
         
-        total_comments = len(analysis_results)
+    Yields:
+        Dict[str, Any]: 分析結果（index は列ごとの連番、column_name・row 付き）
+    """
+    completed = journal.load() if journal is not None else {}
+    total = len(column_comments) if hasattr(column_comments, '__len__') else total
+    tracker = ProgressTracker(total, [progress_callback])
+    resumed: List[Dict[str, Any]] = []
+    positions: List[Tuple[str, int, int]] = []
+    column_counts: Dict[str, int] = {}
+    
+    def comments() -> Iterator[str]:
+        for col, row, comment in column_comments:
+            index = column_counts.get(col, 0)
+            column_counts[col] = index + 1
+            if (col, row) in completed:
+                result = completed[(col, row)]
+                result['index'] = index
+                resumed.append(result)
+                continue
+            positions.append((col, row, index))
+            yield comment
+    
+    def flush_resumed() -> Iterator[Dict[str, Any]]:
+        for result in resumed:
+            tracker.update(result)
+            yield result
+        resumed.clear()
+    
+    for result in analyzer.iter_analyze(comments(), **analyze_kwargs):
+        yield from flush_resumed()
         
-        # センチメント集計
-        sentiment_counts = {"positive": 0, "negative": 0, "neutral": 0}
-        for result in analysis_results:
-            sentiment_counts[result.get("sentiment", "neutral")] += 1
+        result['column_name'], result['row'], result['index'] = positions[result['index']]
+        if journal is not None:
+            journal.append(result)
+        tracker.update(result)
+        yield result
+    yield from flush_resumed()
+    tracker.finish()
+
+def iter_respondent_comments(analyzer: CommentAnalyzer, column_comments: Iterable[Tuple[str, int, str]],
+                             journal: Optional[RunJournal] = None, progress_callback: Optional[ProgressCallback] = None,
+                             max_workers: int = 1, stop: Optional[threading.Event] = None,
+                             total: Optional[int] = None, **unused_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    同じ行（回答者）のコメントを1回のリクエストでまとめて分析し、完了した順に結果を返すジェネレータ
+    
+    column_comments は行番号の順に並んでいる必要がある（ExcelCommentReader などの読み込み順）。
+    journal を指定すると完了した結果を1件ずつ記録し、行の全回答が記録済みの回答者は分析しない。
+    
+    Args:
+        analyzer (CommentAnalyzer): 使用する分析器
+        column_comments (Iterable[Tuple[str, int, str]]): (列名, 行番号, コメント) の並び（行番号の順）
+        journal (Optional[RunJournal]): 途中経過を記録するジャーナル
+        progress_callback (Optional[ProgressCallback]): 1件完了するごとに進捗を受け取る関数
+        max_workers (int): 同時に実行するAPI呼び出しの上限
+        stop (Optional[threading.Event]): セットされると送信済みのリクエストの結果を記録し終えた時点で終了する
+        total (Optional[int]): 総件数（column_comments が件数を持たない逐次読み込みの場合に指定）
+        **unused_kwargs: iter_column_comments との互換用（pack_size・dedup は使用しない）
+        
+    Yields:
+        Dict[str, Any]: 分析結果（index は列ごとの連番、column_name・row・respondent_risk 付き）
+    """
+    completed = journal.load() if journal is not None else {}
+    total = len(column_comments) if hasattr(column_comments, '__len__') else total
+    tracker = ProgressTracker(total, [progress_callback])
+    resumed: List[Dict[str, Any]] = []
+    positions: List[List[Tuple[str, int, int]]] = []
+    column_counts: Dict[str, int] = {}
+    
+    def respondents() -> Iterator[List[Tuple[str, str]]]:
+        """連続する同じ行のコメントを回答者1人分としてまとめる"""
+        current_row, cells = None, []
         
-        # カテゴリ集計
-        category_counts = {"content": 0, "materials": 0, "management": 0, "others": 0}
+        def flush() -> Iterator[List[Tuple[str, str]]]:
+            if cells and all((col, row) in completed for col, row, _, _ in cells):
+                for col, row, index, _ in cells:
+                    result = completed[(col, row)]
+                    result['index'] = index
+                    resumed.append(result)
+            elif cells:
+                positions.append([(col, row, index) for col, row, index, _ in cells])
+                yield [(col, comment) for col, _, _, comment in cells]
         
-        for result in analysis_results:
-            category = result.get("category", "others")
-            # カテゴリがすでに英語で返されているので、そのまま使用
-            if category in category_counts:
-                category_counts[category] += 1
-            else:
-                category_counts["others"] += 1
-        
-        # 重要度の高いコメント（スコア7以上）
-        high_importance = [r for r in analysis_results if r.get("importance_score", 0) >= 7]
-        
-        # 危険度の高いコメント
-        high_risk = [r for r in analysis_results if r.get("risk_level") == "high"]
-        
-        return {
-            "total_comments": total_comments,
-            "sentiment_distribution": {
-                "positive": {"count": sentiment_counts["positive"], "percentage": sentiment_counts["positive"]/total_comments*100},
-                "negative": {"count": sentiment_counts["negative"], "percentage": sentiment_counts["negative"]/total_comments*100},
-                "neutral": {"count": sentiment_counts["neutral"], "percentage": sentiment_counts["neutral"]/total_comments*100}
-            },
-            "category_distribution": {
-                "content": {"count": category_counts["content"], "percentage": category_counts["content"]/total_comments*100},
-                "materials": {"count": category_counts["materials"], "percentage": category_counts["materials"]/total_comments*100},
-                "management": {"count": category_counts["management"], "percentage": category_counts["management"]/total_comments*100},
-                "others": {"count": category_counts["others"], "percentage": category_counts["others"]/total_comments*100}
-            },
-            "high_importance_comments": len(high_importance),
-            "high_risk_comments": len(high_risk),
-            "top_high_risk_comments": sorted(high_risk, key=lambda x: x.get("importance_score", 0), reverse=True)[:10]
-        }
-
-def process_excel_file(file_path: str, output_path: str = None) -> Dict[str, Any]:
+        for col, row, comment in column_comments:
+            if row != current_row:
+                yield from flush()
+                current_row, cells = row, []
+            index = column_counts.get(col, 0)
+            column_counts[col] = index + 1
+            cells.append((col, row, index, comment))
+        yield from flush()
+    
+    def flush_resumed() -> Iterator[Dict[str, Any]]:
+        for result in resumed:
+            tracker.update(result)
+            yield result
+        resumed.clear()
+    
+    for position, results in analyzer.iter_analyze_respondents(respondents(), max_workers=max_workers, stop=stop):
+        yield from flush_resumed()
+        
+        for (col, row, index), result in zip(positions[position], results):
+            result['column_name'], result['row'], result['index'] = col, row, index
+            if journal is not None:
+                journal.append(result)
+            tracker.update(result)
+            yield result
+    yield from flush_resumed()
+    tracker.finish()
+
+def analyze_column_comments(analyzer: CommentAnalyzer, column_comments: Iterable[Tuple[str, int, str]],
+                            journal: Optional[RunJournal] = None, progress_callback: Optional[ProgressCallback] = None,
+                            sinks: Optional[List[ResultSink]] = None, respondent_mode: bool = False,
+                            **analyze_kwargs) -> List[Dict[str, Any]]:
+    """
+    複数の列のコメントをまとめて分析
+    
+    全列のコメントを1つの iter_analyze で処理するため、
+    列をまたいだ重複排除や並列実行が効く。
+    
+    Args:
+        analyzer (CommentAnalyzer): 使用する分析器
+        column_comments (Iterable[Tuple[str, int, str]]): (列名, 行番号, コメント) の並び（逐次読み込みも可）
+        journal (Optional[RunJournal]): 途中経過を記録するジャーナル（記録済みの行は再分析しない）
+        progress_callback (Optional[ProgressCallback]): 1件完了するごとに進捗を受け取る関数（省略時はコンソールに表示）
+        sinks (Optional[List[ResultSink]]): 結果の出力先（逐次出力の出力先には完了した順に書き込む）
+        respondent_mode (bool): 同じ行（回答者）のコメントを1回のリクエストでまとめて分析するか
+            （column_comments は行番号の順に並んでいる必要がある）
+        **analyze_kwargs: iter_analyze に渡す引数
+        
+    Returns:
+        List[Dict[str, Any]]: 分析結果のリスト（列・行の順、index は列ごとの連番）
+    """
+    sinks = sinks or []
+    streaming_sinks = [sink for sink in sinks if sink.streaming]
+    iterate = iter_respondent_comments if respondent_mode else iter_column_comments
+    results = []
+    for result in iterate(analyzer, column_comments, journal=journal,
+                          progress_callback=progress_callback or ConsoleProgressBar(),
+                          **analyze_kwargs):
+        for sink in streaming_sinks:
+            sink.write(result)
+        results.append(result)
+    
+    sort_column_results(results)
+    
+    for sink in sinks:
+        if not sink.streaming:
+            sink.write_all(results)
+    return results
+
+def _timed_iter(reader: Iterable[Tuple[str, int, str]], metrics: PipelineMetrics) -> Iterator[Tuple[str, int, str]]:
+    """リーダーの読み込みにかかった時間を計測しながらコメントを返す（最初の1件までを Excel 読み込みとする）"""
+    iterator = iter(reader)
+    with metrics.stage(STAGE_EXCEL_LOAD):
+        first = next(iterator, None)
+    if first is None:
+        return
+    yield first
+    
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            item = next(iterator, None)
+            elapsed += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
+    finally:
+        metrics.record_duration(STAGE_COLUMN_EXTRACT, elapsed)
+
+def process_excel_file(file_path: str, output_path: Union[str, List[str], None] = None, max_workers: int = 1,
+                       requests_per_minute: float = 120.0, pack_size: int = 1,
+                       dedup: bool = True, resume: bool = True,
+                       journal_dir: str = DEFAULT_JOURNAL_DIR,
+                       backend: Optional[LLMBackend] = None,
+                       use_ingest_cache: bool = True,
+                       scheduler: Optional[ColumnScheduler] = None,
+                       respondent_mode: bool = False) -> Dict[str, Any]:
     """
     Excelファイルを処理してコメント分析を実行
     
     Args:
         file_path (str): 入力Excelファイルパス
-        output_path (str): 出力CSVファイルパス（省略可）
+        output_path (Union[str, List[str], None]): 出力ファイルパス（省略可、複数指定可）。
+            拡張子で形式を選ぶ（.jsonl は完了した順に追記、.parquet は型付きで保存、.csv は従来の形式）
+        max_workers (int): 同時に実行するAPI呼び出しの上限（1の場合は逐次実行）
+        requests_per_minute (float): API呼び出しのリクエスト上限（回/分）
+        pack_size (int): 1回のリクエストでまとめて分析するコメント数
+        dedup (bool): 列をまたいでほぼ同一のコメントをまとめ、代表コメントのみ分析するか
+        resume (bool): ジャーナルに記録した途中経過から再開するか（False の場合は記録を破棄して最初から）
+        journal_dir (str): ジャーナルを置くディレクトリ
+        backend (Optional[LLMBackend]): 使用するLLMバックエンド（省略時は LLM_BACKEND 環境変数、既定は Gemini）
+        use_ingest_cache (bool): Excelを一度 Parquet に変換して保存し、2回目以降はExcelを解析せずに読み込むか
+        scheduler (Optional[ColumnScheduler]): 全列共通の予算と列ごとの優先度で分析するコメントを選ぶスケジューラ
+            （省略時はすべてのコメントを分析）
+        respondent_mode (bool): 1人の回答者（1行）の全回答を1回のリクエストでまとめて分析し、
+            回答者全体の危険度（respondent_risk）も判定するか（pack_size・dedup は使用しない）
         
     Returns:
         Dict[str, Any]: 処理結果
     """
-    # Excelファイル読み込み
-    df = pd.read_excel(file_path)
-    
-    # コメント列を特定（自由記述項目）
-    comment_columns = [
-        '【必須】本日の講義で学んだことを50文字以上で入力してください。',
-        '（任意）本日の講義で特によかった部分について、具体的にお教えください。',
-        '（任意）分かりにくかった部分や改善点などがあれば、具体的にお教えください。',
-        '（任意）講師について、よかった点や不満があった点などについて、具体的にお教えください。',
-        '（任意）今後開講してほしい講義・分野などがあればお書きください。',
-        '（任意）ご自由にご意見をお書きください。'
-    ]
-    
-    analyzer = CommentAnalyzer()
-    all_results = []
-    
-    for col in comment_columns:
-        if col in df.columns:
-            print(f"\n{col} の分析を開始...")
-            comments = df[col].dropna().tolist()
-            
-            if comments:
-                results = analyzer.analyze_comments_batch(comments)
-                for result in results:
-                    result['column_name'] = col
-                all_results.extend(results)
+    metrics = PipelineMetrics()
+    file_hash = file_sha256(file_path)
+    
+    if use_ingest_cache:
+        # 変換済みなら Parquet からコメント列だけを読み込む（未変換ならここで一度だけ変換する）
+        with metrics.stage(STAGE_EXCEL_LOAD):
+            reader = IngestCache().comment_reader(file_path, COMMENT_COLUMNS, file_hash=file_hash)
+    else:
+        # コメント列（自由記述項目）だけを1行ずつ読み込み、読み込みと並行して分析する
+        reader = ExcelCommentReader(file_path, COMMENT_COLUMNS)
+    
+    analyzer = CommentAnalyzer(backend=backend, requests_per_minute=requests_per_minute, metrics=metrics)
+    
+    # 完了した結果をジャーナルに記録し、中断しても続きから再開できるようにする
+    prompt_version = RESPONDENT_PROMPT_VERSION if respondent_mode else PROMPT_VERSION
+    journal = RunJournal(RunJournal.make_run_key(file_hash, analyzer.model_name, prompt_version), journal_dir)
+    if not resume:
+        journal.clear()
+    resumed_count = len(journal.load())
+    if resumed_count:
+        print(f"前回の実行で完了した{resumed_count}件を再利用して再開します（{journal.path}）")
+    
+    output_paths = [output_path] if isinstance(output_path, str) else list(output_path or [])
+    sinks = [open_sink(path) for path in output_paths]
+    
+    column_comments = _timed_iter(reader, metrics)
+    if scheduler is not None:
+        column_comments = scheduler.schedule(column_comments)
+        print(f"予算内で{len(column_comments)}件を分析します（推定 {scheduler.scheduled_tokens} トークン）")
+        if respondent_mode:
+            # 回答者ごとにまとめるため、選んだコメントを行の順に戻す
+            column_order = {col: i for i, col in enumerate(COMMENT_COLUMNS)}
+            column_comments.sort(key=lambda item: (item[1], column_order.get(item[0], len(column_order))))
+    
+    print(f"\n{file_path} のコメントの分析を開始...")
+    try:
+        # 逐次読み込みでは件数が分からないため、Parquet から読む場合は列ごとの非欠損件数を総件数とする
+        all_results = analyze_column_comments(
+            analyzer, column_comments, journal=journal, sinks=sinks, respondent_mode=respondent_mode,
+            max_workers=max_workers, pack_size=pack_size, dedup=dedup, total=getattr(reader, 'total', None)
+        )
+    except BaseException:
+        # 失敗した実行の途中結果で既存の出力ファイルを置き換えない
+        for sink in sinks:
+            sink.abort()
+        raise
+    else:
+        for sink in sinks:
+            sink.commit()
+    finally:
+        journal.close()
+    
+    for col, count in reader.comment_counts.items():
+        if scheduler is not None:
+            print(f"{col}: {scheduler.scheduled_counts.get(col, 0)}/{count}件")
+        else:
+            print(f"{col}: {count}件")
     
     # サマリーレポート生成
     summary = analyzer.generate_summary_report(all_results)
     
-    # CSV出力
-    if output_path:
-        results_df = pd.DataFrame(all_results)
-        results_df.to_csv(output_path, index=False, encoding='utf-8')
-        print(f"\n結果を {output_path} に保存しました。")
+    for path in output_paths:
+        print(f"\n結果を {path} に保存しました。")
+    
+    if analyzer.cache is not None:
+        cache_stats = analyzer.cache.get_stats()
+        print(f"キャッシュ: ヒット {cache_stats['hits']}件 / ミス {cache_stats['misses']}件（ヒット率 {cache_stats['hit_rate']:.1f}%）")
+    
+    parse_stats = analyzer.get_parse_stats()
+    print(f"応答パース: 失敗 {parse_stats['parse_failures']}/{parse_stats['parsed']}件（{parse_stats['failure_rate']:.1f}%）"
+          f" | 補正 {parse_stats['coerced']}件")
+    
+    counters = metrics.snapshot()["counters"]
+    print(f"LLM呼び出し: {counters['llm_requests']}回（再試行 {counters['retries']}回）"
+          f" | トークン: 入力 {counters['input_tokens']} / 出力 {counters['output_tokens']}")
     
-    return {
+    processed = {
         "analysis_results": all_results,
         "summary_report": summary,
-        "original_data_shape": df.shape
+        "parse_stats": parse_stats,
+        "metrics": metrics.snapshot(),
+        "original_data_shape": reader.shape
     }
+    if respondent_mode:
+        respondent_summary = summarize_respondents(all_results)
+        risk_counts = respondent_summary["respondent_risk_distribution"]
+        print(f"回答者: {respondent_summary['respondents']}人 | 高危険度 {risk_counts['high']}人"
+              f" / 中 {risk_counts['medium']}人 / 低 {risk_counts['low']}人")
+        processed["respondent_summary"] = respondent_summary
+    return processed
 
 if __name__ == "__main__":
     # テスト実行
@@ -342,6 +1126,8 @@ if __name__ == "__main__":
         print(f"総コメント数: {results['summary_report']['total_comments']}")
         print(f"高重要度コメント: {results['summary_report']['high_importance_comments']}")
         print(f"高危険度コメント: {results['summary_report']['high_risk_comments']}")
+        triage_skipped = results['summary_report']['triage_skipped']
+        print(f"ローカル判定でAPI呼び出しを省略: {triage_skipped['count']}件（{triage_skipped['percentage']:.1f}%）")
         
     except Exception as e:
         print(f"エラー: {e}")
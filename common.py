@@ -1,9 +1,13 @@
 # common.py
-import json
-import boto3
+from functools import lru_cache
 
-# Bedrock クライアント初期化
-bedrock = boto3.client("bedrock-runtime", region_name="us-east-1")
+from llm_backends import BedrockBackend
+
+
+@lru_cache(maxsize=None)
+def _get_backend(model_id, max_tokens, temperature, top_p):
+    # Bedrock クライアントは設定ごとに1つだけ生成して使い回す
+    return BedrockBackend(model_id=model_id, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
 
 def invoke_model(prompt, model_id="us.amazon.nova-lite-v1:0", max_tokens=512, temperature=0.7, top_p=0.9):
     """
@@ -17,21 +21,4 @@ def invoke_model(prompt, model_id="us.amazon.nova-lite-v1:0", max_tokens=512, te
 
     :return: モデルの応答（文字列）
     """
-    request_payload = {
-        "messages": [{"role": "user", "content": [{"text": prompt}]}],
-        "inferenceConfig": {
-            "maxTokens": max_tokens,
-            "temperature": temperature,
-            "topP": top_p
-        }
-    }
-
-    response = bedrock.invoke_model(
-        modelId=model_id,
-        contentType="application/json",
-        body=json.dumps(request_payload)
-    )
-
-    response_body = json.loads(response["body"].read())
-    model_output = response_body["output"]["message"]["content"][0]["text"]
-    return model_output
+    return _get_backend(model_id, max_tokens, temperature, top_p).generate(prompt).text
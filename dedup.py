@@ -0,0 +1,133 @@
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Set
+
+import numpy as np
+
+# MinHash のハッシュ関数に使うメルセンヌ素数（積が int64 に収まる大きさ）
+_PRIME = (1 << 31) - 1
+
+
+def normalize_for_dedup(text: str) -> str:
+    """重複判定用にコメントを正規化（NFKC・小文字化・空白と句読点の除去）"""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", "", text)
+    return "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
+
+
+def char_ngrams(text: str, n: int = 3) -> Set[str]:
+    """文字 n-gram の集合（n 文字未満の場合は文字列全体を1要素とする）"""
+    if len(text) < n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NearDuplicateIndex:
+    """
+    ほぼ同一のコメントをグループ化するインデックス
+
+    正規化後に完全一致するものはそのまま同じグループとし、
+    それ以外は文字 n-gram の MinHash + LSH で候補を絞り込んで
+    Jaccard 係数が閾値以上の代表コメントのグループに加える。
+    コメントは1件ずつ追加でき、逐次的に処理できる。
+    """
+
+    def __init__(self, threshold: float = 0.9, ngram: int = 3, num_perm: int = 64,
+                 bands: int = 8, seed: int = 1):
+        """
+        Args:
+            threshold (float): 同一グループとみなす Jaccard 係数の下限
+            ngram (int): 文字 n-gram の長さ
+            num_perm (int): MinHash のハッシュ関数の数
+            bands (int): LSH のバンド数（num_perm を割り切れること）。候補になる類似度の目安は
+                (1/bands)^(bands/num_perm) で、閾値より低すぎると定型的なコメントで候補が増えて遅くなる
+            seed (int): ハッシュ関数生成用の乱数シード
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm は bands で割り切れる必要があります")
+        self.threshold = threshold
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+
+        self._count = 0
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._rep_shingles: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _signature(self, shingles: Set[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) & _PRIME for s in shingles),
+                             dtype=np.int64, count=len(shingles))
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def add(self, text: str) -> int:
+        """
+        コメントを追加し、所属グループの代表コメントの位置を返す
+
+        Args:
+            text (str): 追加するコメント
+
+        Returns:
+            int: 代表コメントの追加順の位置（自身が代表の場合は自身の位置）
+        """
+        position = self._count
+        self._count += 1
+
+        normalized = normalize_for_dedup(text)
+        if not normalized:
+            # 句読点のみ・文字列以外のコメントは正規化すると区別できないため、まとめずに単独のグループとする
+            return position
+        if normalized in self._exact:
+            return self._exact[normalized]
+
+        shingles = char_ngrams(normalized, self.ngram)
+        signature = self._signature(shingles)
+        band_keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                     for band in range(self.bands)]
+
+        # LSH で候補となる代表コメントを集め、最も類似度が高いものを選ぶ
+        best_rep, best_score = None, self.threshold
+        seen = set()
+        for key in band_keys:
+            for rep in self._buckets.get(key, ()):
+                if rep in seen:
+                    continue
+                seen.add(rep)
+                rep_shingles = self._rep_shingles[rep]
+                score = len(shingles & rep_shingles) / len(shingles | rep_shingles)
+                if score >= best_score:
+                    best_rep, best_score = rep, score
+
+        if best_rep is None:
+            best_rep = position
+            self._rep_shingles[position] = shingles
+            for key in band_keys:
+                self._buckets.setdefault(key, []).append(position)
+
+        self._exact[normalized] = best_rep
+        return best_rep
+
+
+def group_near_duplicates(texts: List[str], threshold: float = 0.9) -> List[int]:
+    """
+    コメントリストの各要素について、所属グループの代表コメントのインデックスを返す
+
+    Args:
+        texts (List[str]): コメントリスト
+        threshold (float): 同一グループとみなす Jaccard 係数の下限
+
+    Returns:
+        List[int]: 代表コメントのインデックス（代表自身は自分のインデックス）
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    return [index.add(text) for text in texts]
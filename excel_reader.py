@@ -0,0 +1,159 @@
+import zipfile
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Union, BinaryIO
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+
+def _to_comment(value: Any) -> Optional[str]:
+    """セルの値をコメント文字列に変換（空セルは None）"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    return value
+
+
+class ExcelCommentReader:
+    """
+    アンケートのExcelファイルからコメント列だけを逐次読み込むリーダー
+
+    openpyxl の読み取り専用モードで1行ずつ読み、ヘッダー行で一度だけ
+    コメント列の位置を解決して (列名, 行番号, コメント) を順に返す。
+    ファイル全体を DataFrame に読み込まないため、メモリ使用量が行数に比例せず、
+    読み込みの途中から分析を開始できる。
+    行番号はヘッダーを除いた0始まりの番号（pd.read_excel の index と同じ）。
+    """
+
+    def __init__(self, source: Union[str, BinaryIO], columns: List[str], sheet_name: Optional[str] = None,
+                 max_comments_per_column: Optional[int] = None):
+        """
+        Args:
+            source (Union[str, BinaryIO]): ファイルパスまたはファイルオブジェクト
+            columns (List[str]): 読み込むコメント列の列名
+            sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+            max_comments_per_column (Optional[int]): 列ごとに読み込むコメント数の上限
+        """
+        self.source = source
+        self.columns = columns
+        self.sheet_name = sheet_name
+        self.max_comments_per_column = max_comments_per_column
+        self.header: List[Any] = []
+        self.found_columns: List[str] = []
+        self.rows_read = 0
+        self.comment_counts: Dict[str, int] = {}
+
+    def __iter__(self) -> Iterator[Tuple[str, int, str]]:
+        if hasattr(self.source, "seek"):
+            self.source.seek(0)
+        try:
+            workbook = load_workbook(self.source, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile):
+            # .xls など openpyxl で読めない形式は pandas で読み込む
+            yield from self._iter_with_pandas()
+            return
+
+        try:
+            sheet = workbook[self.sheet_name] if self.sheet_name else workbook.worksheets[0]
+            self.header = list(next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ()))
+            positions = self._resolve_positions(self.header)
+            if not positions:
+                return
+
+            # コメント列より右の列は読み込まない
+            last_column = max(position for _, position in positions) + 1
+            for row, values in enumerate(sheet.iter_rows(min_row=2, max_col=last_column, values_only=True)):
+                self.rows_read += 1
+                for col, position in positions:
+                    comment = _to_comment(values[position]) if position < len(values) else None
+                    if comment is not None and self._accept(col):
+                        yield col, row, comment
+                if self._all_columns_full():
+                    return
+        finally:
+            workbook.close()
+
+    def _iter_with_pandas(self) -> Iterator[Tuple[str, int, str]]:
+        import pandas as pd
+
+        if hasattr(self.source, "seek"):
+            self.source.seek(0)
+        df = pd.read_excel(self.source, sheet_name=self.sheet_name or 0)
+        self.header = list(df.columns)
+        positions = self._resolve_positions(self.header)
+        self.rows_read = len(df)
+        for row, values in enumerate(df.itertuples(index=False, name=None)):
+            for col, position in positions:
+                comment = _to_comment(values[position])
+                if comment is not None and self._accept(col):
+                    yield col, row, comment
+
+    def _resolve_positions(self, header: List[Any]) -> List[Tuple[str, int]]:
+        """ヘッダー行からコメント列の位置を解決（同名の列が複数ある場合は最初の列）"""
+        index_of: Dict[Any, int] = {}
+        for position, name in enumerate(header):
+            index_of.setdefault(name, position)
+        positions = [(col, index_of[col]) for col in self.columns if col in index_of]
+        self.found_columns = [col for col, _ in positions]
+        self.comment_counts = {col: 0 for col in self.found_columns}
+        return positions
+
+    def _accept(self, col: str) -> bool:
+        if self.max_comments_per_column is not None and self.comment_counts[col] >= self.max_comments_per_column:
+            return False
+        self.comment_counts[col] += 1
+        return True
+
+    def _all_columns_full(self) -> bool:
+        if self.max_comments_per_column is None:
+            return False
+        return all(count >= self.max_comments_per_column for count in self.comment_counts.values())
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """読み込んだデータ行数とヘッダーの列数"""
+        return self.rows_read, len(self.header)
+
+
+def read_excel_head(source: Union[str, BinaryIO], rows: int = 5,
+                    sheet_name: Optional[str] = None) -> Tuple["pd.DataFrame", Tuple[Optional[int], int]]:
+    """
+    Excelファイルの先頭の数行だけを読み込む（プレビュー用）
+
+    openpyxl の読み取り専用モードでヘッダーと先頭 rows 行だけを読み、
+    シート全体の行数・列数はシートに記録された範囲（dimension）から求める。
+
+    Args:
+        source (Union[str, BinaryIO]): ファイルパスまたはファイルオブジェクト
+        rows (int): 読み込むデータ行数
+        sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+
+    Returns:
+        Tuple[pd.DataFrame, Tuple[Optional[int], int]]: 先頭行と、(データ行数, 列数)（行数が記録されていない場合は None）
+    """
+    import pandas as pd
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        # .xls など openpyxl で読めない形式は pandas で読み込む
+        if hasattr(source, "seek"):
+            source.seek(0)
+        df = pd.read_excel(source, sheet_name=sheet_name or 0, nrows=rows)
+        return df, (None, len(df.columns))
+
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        values = list(sheet.iter_rows(min_row=1, max_row=rows + 1, values_only=True))
+        max_row = sheet.max_row
+    finally:
+        workbook.close()
+    if not values:
+        return pd.DataFrame(), (0, 0)
+    header = [str(name) for name in values[0]]
+    head_df = pd.DataFrame([list(row) for row in values[1:]], columns=header)
+    return head_df, (max_row - 1 if max_row is not None else None, len(header))
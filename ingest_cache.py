@@ -0,0 +1,405 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Union, BinaryIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from excel_reader import read_excel_head
+from run_journal import file_sha256
+
+DEFAULT_INGEST_CACHE_DIR = os.path.join(".cache", "ingest")
+# コメント列を読み込む単位（行数）
+_READ_BATCH_SIZE = 4096
+
+
+def _sanitize(df: pd.DataFrame) -> pd.DataFrame:
+    """Parquet に書き込めるよう列名を文字列にし、型が混在する列は文字列に揃える"""
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col]
+            if not values.map(lambda v: v is None or isinstance(v, str) or v != v).all():
+                df[col] = values.map(lambda v: None if v is None or v != v else str(v))
+    return df
+
+
+def _column_names(header: List[Any]) -> List[str]:
+    """ヘッダー行を列名にする（pd.read_excel と同じく、空欄は Unnamed: i、重複は name.1 のように区別する）"""
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def _read_sheets(source: BinaryIO) -> Dict[str, pd.DataFrame]:
+    """
+    全シートを DataFrame として読み込む
+
+    pd.read_excel は "NA" や "None" などの文字列やエラー値（#N/A）を欠損にするため、
+    ExcelCommentReader と同じく openpyxl の読み取り専用モードでセルの値をそのまま読み込む。
+    openpyxl で読めない形式（.xls）は pandas で読み込み、空のセルだけを欠損とする。
+    """
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        source.seek(0)
+        return pd.read_excel(source, sheet_name=None, keep_default_na=False, na_values=[""])
+
+    sheets: Dict[str, pd.DataFrame] = {}
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            data = [list(row) for row in rows]
+            # 書式だけが残った末尾の空行は除く（pd.read_excel と同じ行数にする）
+            while data and all(value is None for value in data[-1]):
+                data.pop()
+            width = len(header)
+            data = [(row + [None] * (width - len(row)))[:width] for row in data]
+            sheets[sheet.title] = pd.DataFrame(data, columns=_column_names(header))
+    finally:
+        workbook.close()
+    return sheets
+
+
+def _non_null_counts(parquet_file: pq.ParquetFile) -> Dict[str, int]:
+    """
+    列ごとの非欠損件数
+
+    Parquet の統計情報に欠損件数があればデータを読まずに計算する。全行が空の列は null 型で
+    統計情報を持たないため欠損のみとし、統計情報のないその他の列はその行グループの列だけを読んで数える。
+    """
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    non_null: Dict[str, int] = {name: 0 for name in schema.names}
+    for group in range(metadata.num_row_groups):
+        row_group = metadata.row_group(group)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            name = column.path_in_schema
+            if name not in non_null or pa.types.is_null(schema.field(name).type):
+                continue
+            stats = column.statistics
+            if stats is not None and stats.has_null_count:
+                non_null[name] += row_group.num_rows - stats.null_count
+            else:
+                values = parquet_file.read_row_group(group, columns=[name]).column(name)
+                non_null[name] += pc.count(values).as_py()
+    return non_null
+
+
+class IngestCache:
+    """
+    アンケートのExcelファイルを Parquet に変換して保存するキャッシュ
+
+    ファイル内容のハッシュをキーに、全シートを一度だけ Parquet に変換する。
+    2回目以降はExcelを解析せず、Parquet をメモリマップして必要な列・行だけを読み込む。
+    コメントの読み込みは未変換ならその場で変換する（Excelの解析は1回だけ）。
+    アプリのプレビューのみ、先頭行だけを読んで変換をバックグラウンドで行える（background=True）。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir (Optional[str]): 保存先ディレクトリ（省略時は環境変数 INGEST_CACHE_DIR、なければ .cache/ingest）
+        """
+        self.cache_dir = cache_dir or os.getenv("INGEST_CACHE_DIR", DEFAULT_INGEST_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._converting: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, file_hash)
+
+    def _manifest(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._entry_dir(file_hash), "manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def is_converted(self, file_hash: str) -> bool:
+        return self._manifest(file_hash) is not None
+
+    def ensure(self, source: Union[str, bytes, BinaryIO], file_hash: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        ファイルが未変換なら Parquet に変換する（バックグラウンドで変換中なら完了を待つ）
+
+        Args:
+            source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクト
+            file_hash (Optional[str]): 計算済みのファイルハッシュ（省略時は計算する）
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: ファイルハッシュと、シート名・行数・列数を記録したマニフェスト
+        """
+        file_hash = file_hash or file_sha256(source)
+        manifest = self._manifest(file_hash)
+        if manifest is not None:
+            return file_hash, manifest
+
+        with self._lock:
+            converting = self._converting.get(file_hash)
+        if converting is not None and converting is not threading.current_thread():
+            converting.join()
+            manifest = self._manifest(file_hash)
+            if manifest is not None:
+                return file_hash, manifest
+        return file_hash, self._convert(source, file_hash)
+
+    def convert_in_background(self, source: Union[str, bytes, BinaryIO],
+                              file_hash: Optional[str] = None) -> Optional[threading.Thread]:
+        """
+        未変換のファイルの変換をバックグラウンドで開始する（変換済み・変換中なら何もしない）
+
+        Args:
+            source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクト
+            file_hash (Optional[str]): 計算済みのファイルハッシュ
+
+        Returns:
+            Optional[threading.Thread]: 変換中のスレッド（変換済みの場合は None）
+        """
+        file_hash = file_hash or file_sha256(source)
+        if self.is_converted(file_hash):
+            return None
+        if not isinstance(source, (str, bytes)):
+            # 呼び出し元が同じファイルオブジェクトを読み続けられるよう、内容をコピーして渡す
+            source.seek(0)
+            source = source.read()
+        with self._lock:
+            thread = self._converting.get(file_hash)
+            if thread is None or not thread.is_alive():
+                # 変換の途中でプロセスが終了しないよう、デーモンスレッドにはしない
+                thread = threading.Thread(target=self._convert_in_thread, args=(source, file_hash),
+                                          name=f"ingest-{file_hash[:8]}")
+                self._converting[file_hash] = thread
+                thread.start()
+        return thread
+
+    def _convert_in_thread(self, source: Union[str, bytes], file_hash: str):
+        try:
+            self._convert(source, file_hash)
+        except Exception as e:
+            print(f"Parquet への変換に失敗しました（{file_hash[:8]}）: {e}")
+        finally:
+            with self._lock:
+                self._converting.pop(file_hash, None)
+
+    def _convert(self, source: Union[str, bytes, BinaryIO], file_hash: str) -> Dict[str, Any]:
+        """全シートを Parquet に変換してマニフェストを返す"""
+        opened = isinstance(source, str)
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        elif opened:
+            source = open(source, "rb")
+        else:
+            source.seek(0)
+        try:
+            sheets = _read_sheets(source)
+        finally:
+            if opened:
+                source.close()
+
+        # 書き込み途中のファイルを読まないよう、一時ディレクトリに書いてから置き換える
+        work_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        manifest = {"sheets": []}
+        try:
+            for i, (sheet_name, df) in enumerate(sheets.items()):
+                table = pa.Table.from_pandas(_sanitize(df), preserve_index=False)
+                pq.write_table(table, os.path.join(work_dir, f"sheet_{i}.parquet"))
+                manifest["sheets"].append({"name": str(sheet_name), "rows": len(df), "columns": len(df.columns)})
+            with open(os.path.join(work_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            try:
+                os.replace(work_dir, self._entry_dir(file_hash))
+            except OSError:
+                # 別のプロセスが先に変換を終えていればそちらを使う
+                shutil.rmtree(work_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        return manifest
+
+    def _sheet_path(self, source: Union[str, bytes, BinaryIO], sheet_name: Optional[str],
+                    file_hash: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        file_hash, manifest = self.ensure(source, file_hash)
+        position = 0
+        if sheet_name is not None:
+            names = [sheet["name"] for sheet in manifest["sheets"]]
+            if sheet_name not in names:
+                raise ValueError(f"シートが見つかりません: {sheet_name}")
+            position = names.index(sheet_name)
+        return os.path.join(self._entry_dir(file_hash), f"sheet_{position}.parquet"), manifest["sheets"][position]
+
+    def sheet_names(self, source: Union[str, bytes, BinaryIO], file_hash: Optional[str] = None) -> List[str]:
+        return [sheet["name"] for sheet in self.ensure(source, file_hash)[1]["sheets"]]
+
+    def load_table(self, source: Union[str, bytes, BinaryIO], columns: Optional[List[str]] = None,
+                   sheet_name: Optional[str] = None, file_hash: Optional[str] = None) -> pa.Table:
+        """
+        シートを Arrow の Table として読み込む（メモリマップ、指定した列のみ）
+
+        Args:
+            source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクト
+            columns (Optional[List[str]]): 読み込む列（存在しない列は無視、省略時は全列）
+            sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+            file_hash (Optional[str]): 計算済みのファイルハッシュ
+
+        Returns:
+            pa.Table: 読み込んだデータ
+        """
+        path, _ = self._sheet_path(source, sheet_name, file_hash)
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [col for col in columns if col in available]
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    def load_dataframe(self, source: Union[str, bytes, BinaryIO], columns: Optional[List[str]] = None,
+                       sheet_name: Optional[str] = None, file_hash: Optional[str] = None) -> pd.DataFrame:
+        """シートを DataFrame として読み込む（pd.read_excel の代わりに使用）"""
+        return self.load_table(source, columns, sheet_name, file_hash).to_pandas()
+
+    def preview(self, source: Union[str, bytes, BinaryIO], rows: int = 5, sheet_name: Optional[str] = None,
+                file_hash: Optional[str] = None,
+                background: bool = False) -> Tuple[pd.DataFrame, Tuple[Optional[int], int], Optional[Dict[str, int]]]:
+        """
+        先頭の数行と、シート全体の形状・列ごとの非欠損件数を返す（全行は読み込まない）
+
+        変換済みなら Parquet から読み込む。未変換ならExcelの先頭の数行だけを読み、非欠損件数は None とする。
+
+        Args:
+            source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクト
+            rows (int): 読み込む行数
+            sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+            file_hash (Optional[str]): 計算済みのファイルハッシュ
+            background (bool): 未変換なら変換をバックグラウンドで開始するか
+                （変換後は column_counts で非欠損件数を取得できる。スレッドが残るため常駐するアプリでのみ使用する）
+
+        Returns:
+            Tuple[pd.DataFrame, Tuple[Optional[int], int], Optional[Dict[str, int]]]:
+                先頭行、(行数, 列数)、列名→非欠損件数
+        """
+        file_hash = file_hash or file_sha256(source)
+        if not self.is_converted(file_hash):
+            head_df, shape = read_excel_head(io.BytesIO(source) if isinstance(source, bytes) else source,
+                                             rows=rows, sheet_name=sheet_name)
+            if background:
+                self.convert_in_background(source, file_hash)
+            return head_df, shape, None
+
+        path, sheet = self._sheet_path(source, sheet_name, file_hash)
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        head = next(parquet_file.iter_batches(batch_size=rows), None)
+        head_df = head.to_pandas() if head is not None else parquet_file.schema_arrow.empty_table().to_pandas()
+        return head_df, (sheet["rows"], sheet["columns"]), _non_null_counts(parquet_file)
+
+    def column_counts(self, file_hash: str, sheet_name: Optional[str] = None) -> Optional[Dict[str, int]]:
+        """
+        列ごとの非欠損件数（未変換・変換中の場合は None）
+
+        Args:
+            file_hash (str): ファイルハッシュ
+            sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+        """
+        if not self.is_converted(file_hash):
+            return None
+        path, _ = self._sheet_path(None, sheet_name, file_hash)
+        return _non_null_counts(pq.ParquetFile(path, memory_map=True))
+
+    def comment_reader(self, source: Union[str, bytes, BinaryIO], columns: List[str],
+                       max_comments_per_column: Optional[int] = None, sheet_name: Optional[str] = None,
+                       file_hash: Optional[str] = None) -> "CachedCommentReader":
+        """
+        コメント列を読み込むリーダーを作成
+
+        未変換ならこの場で Parquet に変換し（バックグラウンドで変換中なら完了を待つ）、
+        変換結果から読み込む。同じファイルをExcelの逐次読み込みと変換で二重に解析しない。
+
+        Args:
+            source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクト
+            columns (List[str]): コメント列の列名
+            max_comments_per_column (Optional[int]): 列ごとのコメント数の上限
+            sheet_name (Optional[str]): シート名（省略時は先頭のシート）
+            file_hash (Optional[str]): 計算済みのファイルハッシュ
+
+        Returns:
+            CachedCommentReader: (列名, 行番号, コメント) を返すリーダー
+        """
+        path, sheet = self._sheet_path(source, sheet_name, file_hash)
+        return CachedCommentReader(path, columns, (sheet["rows"], sheet["columns"]), max_comments_per_column)
+
+    def clear(self):
+        """変換済みのファイルをすべて削除"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+class CachedCommentReader:
+    """
+    変換済みの Parquet からコメント列を読み込むリーダー
+
+    ExcelCommentReader と同じ (列名, 行番号, コメント) を同じ順序・同じ行番号で返し、
+    comment_counts / found_columns / shape も同じ意味で提供する。
+    コメント列だけをメモリマップで読み込むため、Excelの解析は行わない。
+    """
+
+    def __init__(self, path: str, columns: List[str], shape: Tuple[int, int],
+                 max_comments_per_column: Optional[int] = None):
+        self.path = path
+        self.columns = columns
+        self.max_comments_per_column = max_comments_per_column
+        self.found_columns: List[str] = []
+        self.comment_counts: Dict[str, int] = {}
+        self._shape = shape
+
+    def __iter__(self) -> Iterator[Tuple[str, int, str]]:
+        available = set(pq.read_schema(self.path).names)
+        self.found_columns = [col for col in self.columns if col in available]
+        self.comment_counts = {col: 0 for col in self.found_columns}
+        if not self.found_columns:
+            return
+        # 列全体を Python のリストに変換せず、メモリマップから一定行数ずつ読み込む
+        parquet_file = pq.ParquetFile(self.path, memory_map=True)
+        limit = self.max_comments_per_column
+        offset = 0
+        for batch in parquet_file.iter_batches(batch_size=_READ_BATCH_SIZE, columns=self.found_columns):
+            values = [(col, batch.column(col).to_pylist()) for col in self.found_columns]
+            for i in range(batch.num_rows):
+                for col, column in values:
+                    value = column[i]
+                    if value is None or (isinstance(value, float) and value != value):
+                        continue
+                    if limit is not None and self.comment_counts[col] >= limit:
+                        continue
+                    self.comment_counts[col] += 1
+                    yield col, offset + i, value if isinstance(value, str) else str(value)
+                if limit is not None and all(count >= limit for count in self.comment_counts.values()):
+                    return
+            offset += batch.num_rows
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """シートのデータ行数と列数"""
+        return self._shape
+
+    @property
+    def total(self) -> int:
+        """読み込むコメントの総件数（列ごとの非欠損件数を上限 max_comments_per_column で抑えた合計）"""
+        non_null = _non_null_counts(pq.ParquetFile(self.path, memory_map=True))
+        limit = self.max_comments_per_column
+        return sum(non_null[col] if limit is None else min(non_null[col], limit)
+                   for col in self.columns if col in non_null)
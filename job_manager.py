@@ -0,0 +1,232 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from comment_analyzer import CommentAnalyzer, iter_column_comments, iter_respondent_comments, sort_column_results
+from progress import ProgressEvent
+from rate_limiter import AdaptiveRateLimiter
+from result_store import ResultStore
+from run_journal import RunJournal
+from search_index import CommentSearchIndex
+from summary import SummaryAggregator, summarize_respondents
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+
+class AnalysisJob:
+    """
+    バックグラウンドで実行する分析ジョブの状態
+
+    進捗・途中集計・検索の索引はワーカースレッドが結果の到着ごとに更新し、画面側は任意のタイミングで読み取る。
+    """
+
+    def __init__(self, job_id: str, name: str, total: Optional[int]):
+        self.id = job_id
+        self.name = name
+        self.total = total
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Optional[ProgressEvent] = None
+        self.results: Optional[ResultStore] = None
+        self.search_index = CommentSearchIndex()
+        self.summary: Dict[str, Any] = {}
+        self.respondent_summary: Optional[Dict[str, Any]] = None
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.stats: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.rate_limiter: Optional[AdaptiveRateLimiter] = None
+        self._aggregator = SummaryAggregator()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> int:
+        """完了した件数"""
+        return self.progress.done if self.progress is not None else 0
+
+    def live_summary(self) -> Dict[str, Any]:
+        """ここまでに完了した結果のサマリーレポート（0件の場合は空の辞書）"""
+        with self._lock:
+            return self._aggregator.report()
+
+    def _add(self, result: Dict[str, Any]):
+        with self._lock:
+            self._aggregator.add(result)
+        self.search_index.add(result)
+
+    def _on_progress(self, event: ProgressEvent):
+        self.progress = event
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ジョブの状態（一覧表示・API応答用）"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress.to_dict() if self.progress is not None else None,
+            "error": self.error
+        }
+
+
+class JobManager:
+    """
+    分析ジョブをバックグラウンドのワーカープールで実行する管理クラス
+
+    ジョブはIDで参照し、状態・進捗の取得とキャンセルができる。
+    結果はジョブに保持されるため、画面の再実行やブラウザの再読み込みの影響を受けない。
+    同時に実行するジョブ数を max_workers で制限し、それ以上は順番待ちになる。
+    完了したジョブは新しいものから max_finished_jobs 件まで保持する。
+    """
+
+    def __init__(self, max_workers: int = 2, max_finished_jobs: int = 20):
+        """
+        Args:
+            max_workers (int): 同時に実行するジョブ数
+            max_finished_jobs (int): 保持する完了済みジョブ数（古いものから破棄）
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="analysis-job")
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit_analysis(self, analyzer: CommentAnalyzer, column_comments: Iterable[Tuple[str, int, str]],
+                        journal: Optional[RunJournal] = None, respondent_mode: bool = False,
+                        name: str = "", **analyze_kwargs) -> str:
+        """
+        コメント分析のジョブを登録
+
+        Args:
+            analyzer (CommentAnalyzer): 使用する分析器
+            column_comments (Iterable[Tuple[str, int, str]]): (列名, 行番号, コメント) の並び
+            journal (Optional[RunJournal]): 途中経過を記録するジャーナル（ジョブ終了時に閉じる）
+            respondent_mode (bool): 同じ行（回答者）のコメントをまとめて分析するか
+            name (str): ジョブの表示名
+            **analyze_kwargs: iter_column_comments に渡す引数（max_workers・pack_size・dedup など）
+
+        Returns:
+            str: ジョブID
+        """
+        total = len(column_comments) if hasattr(column_comments, '__len__') else None
+        job = AnalysisJob(uuid.uuid4().hex[:12], name, total)
+        job.rate_limiter = analyzer.rate_limiter
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, analyzer, column_comments, journal, respondent_mode, analyze_kwargs)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[AnalysisJob]:
+        """登録順のジョブ一覧"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        ジョブのキャンセルを要求（新しいリクエストは送らず、送信済みのリクエストの結果を記録してから停止する）
+
+        Returns:
+            bool: キャンセルを要求できたか（存在しない・終了済みのジョブは False）
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel.set()
+        return True
+
+    def shutdown(self, wait: bool = False):
+        for job in self.jobs():
+            job._cancel.set()
+        self._executor.shutdown(wait=wait)
+
+    def _prune(self):
+        """完了済みのジョブが上限を超えたら古いものから破棄"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: AnalysisJob, analyzer: CommentAnalyzer, column_comments: Iterable[Tuple[str, int, str]],
+             journal: Optional[RunJournal], respondent_mode: bool, analyze_kwargs: Dict[str, Any]):
+        if job.cancel_requested:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            if journal is not None:
+                journal.close()
+            return
+
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        iterate = iter_respondent_comments if respondent_mode else iter_column_comments
+        # キャンセル時は新しいリクエストを送らず、送信済みのリクエストの結果を受け取ってジャーナルに記録してから止める
+        results = iterate(analyzer, column_comments, journal=journal, progress_callback=job._on_progress,
+                          stop=job._cancel, **analyze_kwargs)
+        collected: List[Dict[str, Any]] = []
+        status = JOB_FAILED
+        try:
+            try:
+                for result in results:
+                    job._add(result)
+                    collected.append(result)
+                # 完了した分はジャーナルに記録済みのため、キャンセル後の再実行時は続きから分析できる
+                status = JOB_CANCELLED if job.cancel_requested else JOB_COMPLETED
+            except Exception as e:
+                job.error = str(e)
+            finally:
+                results.close()
+                if journal is not None:
+                    journal.close()
+            # 検索の索引は完了順に作成しているため、並べ替え後の位置に番号を付け替える
+            arrival = {id(result): i for i, result in enumerate(collected)}
+            sort_column_results(collected)
+            new_positions = [0] * len(collected)
+            for position, result in enumerate(collected):
+                new_positions[arrival[id(result)]] = position
+            job.search_index.remap(new_positions)
+            job.results = ResultStore.from_results(collected)
+            # 詳細分析タブの絞り込み用の索引もワーカー側で作成しておく
+            job.results.index()
+            job.summary = job.live_summary()
+            if respondent_mode:
+                job.respondent_summary = summarize_respondents(collected)
+            job.metrics = analyzer.metrics.snapshot()
+            job.stats = {
+                "parse": analyzer.get_parse_stats(),
+                "rate_limiter": analyzer.rate_limiter.get_stats(),
+                "cache": analyzer.cache.get_stats() if analyzer.cache is not None else None
+            }
+        except Exception as e:
+            # 後処理に失敗してもジョブが実行中のまま残らないよう、失敗として終了させる
+            status = JOB_FAILED
+            job.error = job.error or f"結果の集計に失敗しました: {e}"
+        finally:
+            job.finished_at = time.time()
+            # 結果を設定してから状態を更新する（画面側は状態を見て結果を読み込む）
+            job.status = status
+            with self._lock:
+                self._prune()
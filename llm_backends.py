@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+from rate_limiter import RateLimitError
+
+DEFAULT_GEMINI_MODEL = 'gemini-2.0-flash'
+DEFAULT_BEDROCK_MODEL = "us.amazon.nova-lite-v1:0"
+BACKEND_NAMES = ["gemini", "bedrock", "fake"]
+# google.generativeai の genai.configure はプロセス全体の設定のため、設定とクライアントの作成をまとめて行う
+_GEMINI_CONFIGURE_LOCK = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（日本語は1トークンあたりおよそ2文字として計算）"""
+    return max(1, len(text) // 2)
+
+
+class LLMResponse:
+    """バックエンド共通の応答"""
+
+    def __init__(self, text: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMBackend:
+    """
+    LLMバックエンドの共通インターフェース
+
+    generate() はプロンプトを受け取り LLMResponse を返す。
+    レート制限時は rate_limiter.is_rate_limit_error で判定できる例外を送出すること。
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """
+        プロンプトを送信して応答を取得
+
+        Args:
+            prompt (str): 送信するプロンプト
+            response_schema (Optional[Dict[str, Any]]): JSON形式の応答を要求する場合のスキーマ
+                （対応していないバックエンドでは無視される）
+
+        Returns:
+            LLMResponse: 応答テキストと入出力トークン数
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini（google.generativeai）
+
+    APIキーは作成時にこのインスタンス専用のクライアントに結び付けるため、
+    後から別のキーで genai.configure が呼ばれても（他のユーザーのジョブなど）影響を受けない。
+    """
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = DEFAULT_GEMINI_MODEL, api_key: Optional[str] = None):
+        super().__init__(model_name)
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = api_key or os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEYが設定されていません。.envファイルに設定してください。")
+
+        with _GEMINI_CONFIGURE_LOCK:
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(model_name)
+            # 最初の呼び出し時に既定のクライアントを取得する代わりに、このキーのクライアントをここで固定する
+            self.model._client = genai_client.get_default_generative_client()
+
+    def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        kwargs = {}
+        if response_schema is not None:
+            kwargs['generation_config'] = {
+                "response_mime_type": "application/json",
+                "response_schema": response_schema
+            }
+        response = self.model.generate_content(prompt, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0
+        )
+
+
+class BedrockBackend(LLMBackend):
+    """Amazon Bedrock（Nova Lite などの Messages 形式のモデル）"""
+
+    name = "bedrock"
+
+    def __init__(self, model_id: str = DEFAULT_BEDROCK_MODEL, region: Optional[str] = None,
+                 max_tokens: int = 2048, temperature: float = 0.7, top_p: float = 0.9):
+        super().__init__(model_id)
+        import boto3
+
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.client = boto3.client("bedrock-runtime", region_name=region or os.getenv("BEDROCK_REGION", "us-east-1"))
+
+    def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        request_payload = {
+            "messages": [{"role": "user", "content": [{"text": prompt}]}],
+            "inferenceConfig": {
+                "maxTokens": self.max_tokens,
+                "temperature": self.temperature,
+                "topP": self.top_p
+            }
+        }
+
+        response = self.client.invoke_model(
+            modelId=self.model_name,
+            contentType="application/json",
+            body=json.dumps(request_payload)
+        )
+
+        response_body = json.loads(response["body"].read())
+        usage = response_body.get("usage", {})
+        return LLMResponse(
+            response_body["output"]["message"]["content"][0]["text"],
+            input_tokens=usage.get("inputTokens", 0),
+            output_tokens=usage.get("outputTokens", 0)
+        )
+
+
+class FakeBackend(LLMBackend):
+    """
+    APIを呼ばないローカルのフェイクバックエンド
+
+    プロンプトのハッシュから決定的な分析結果を返し、レイテンシ・エラー率・
+    スループット上限（超過時は429）を再現する。並列処理やレートリミッターの
+    動作確認、オフラインでのスループット計測に使用する。
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, latency_sigma: float = 0.0,
+                 rate_limit_rpm: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 error_rate: float = 0.0, seed: int = 0, model_name: str = "fake"):
+        """
+        Args:
+            latency (float): 1回の呼び出しにかかる時間の中央値（秒）
+            latency_sigma (float): レイテンシの対数正規分布のばらつき（0の場合は一定）
+            rate_limit_rpm (Optional[float]): 直近60秒間の呼び出し数がこれを超えると429を返す
+            max_concurrency (Optional[int]): 同時実行数がこれを超えると429を返す
+            error_rate (float): ランダムに429を返す確率（0〜1）
+            seed (int): 乱数シード
+            model_name (str): モデル名（キャッシュキーなどに使用）
+        """
+        super().__init__(model_name)
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.rate_limit_rpm = rate_limit_rpm
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._in_flight = 0
+        self.call_count = 0
+        self.rate_limited_count = 0
+
+    def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] > 60.0:
+                self._calls.popleft()
+            over_rate = self.rate_limit_rpm is not None and len(self._calls) >= self.rate_limit_rpm
+            over_concurrency = self.max_concurrency is not None and self._in_flight >= self.max_concurrency
+            injected = self._random.random() < self.error_rate
+            if over_rate or over_concurrency or injected:
+                self.rate_limited_count += 1
+                raise RateLimitError()
+            self._calls.append(now)
+            self._in_flight += 1
+            self.call_count += 1
+            latency = self.latency
+            if self.latency_sigma > 0:
+                latency = self._random.lognormvariate(0.0, self.latency_sigma) * self.latency
+
+        try:
+            if latency > 0:
+                time.sleep(latency)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        # 番号付きのコメント一覧（まとめて分析）の場合はJSON配列で返す
+        numbered = re.findall(r'^(\d+)\. "(.*)"$', prompt, re.MULTILINE)
+        if numbered:
+            items = [dict(id=int(number), **self._fake_result(comment)) for number, comment in numbered]
+            if '"respondent_risk"' in prompt:
+                # 回答者単位の分析では回答ごとの結果と回答者全体の危険度を返す
+                levels = [item["risk_level"] for item in items]
+                risk = next(level for level in ("high", "medium", "low") if level in levels)
+                text = json.dumps({"answers": items, "respondent_risk": risk}, ensure_ascii=False)
+            else:
+                text = json.dumps(items, ensure_ascii=False)
+        else:
+            text = json.dumps(self._fake_result(prompt), ensure_ascii=False)
+        return LLMResponse(text, input_tokens=estimate_tokens(prompt), output_tokens=estimate_tokens(text))
+
+    @staticmethod
+    def _fake_result(text: str) -> dict:
+        """テキストのハッシュから決定的な分析結果を生成"""
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        score = digest[2] % 10 + 1
+        return {
+            "sentiment": ["positive", "negative", "neutral"][digest[0] % 3],
+            "category": ["content", "materials", "management", "others"][digest[1] % 4],
+            "importance_score": score,
+            "risk_level": "high" if score >= 8 else "medium" if score >= 5 else "low",
+            "summary": "フェイク分析結果",
+            "keywords": ["フェイク"]
+        }
+
+
+def create_backend(name: Optional[str] = None, **kwargs) -> LLMBackend:
+    """
+    名前からバックエンドを生成
+
+    name を省略した場合は環境変数 LLM_BACKEND（既定は gemini）を使用する。
+    フェイクバックエンドの設定は FAKE_LLM_LATENCY / FAKE_LLM_LATENCY_SIGMA /
+    FAKE_LLM_ERROR_RATE / FAKE_LLM_RPM 環境変数でも指定できる。
+
+    Args:
+        name (Optional[str]): "gemini" / "bedrock" / "fake"
+        **kwargs: 各バックエンドのコンストラクタに渡す引数
+
+    Returns:
+        LLMBackend: 生成したバックエンド
+    """
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend(**kwargs)
+    if name == "bedrock":
+        return BedrockBackend(**kwargs)
+    if name == "fake":
+        rpm = os.getenv("FAKE_LLM_RPM")
+        settings = {
+            "latency": float(os.getenv("FAKE_LLM_LATENCY", "0")),
+            "latency_sigma": float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0")),
+            "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            "rate_limit_rpm": float(rpm) if rpm else None
+        }
+        settings.update(kwargs)
+        return FakeBackend(**settings)
+    raise ValueError(f"不明なLLMバックエンドです: {name}（{', '.join(BACKEND_NAMES)} のいずれかを指定してください）")
+
+
+if __name__ == "__main__":
+    # 429を注入しながらレートリミッターの挙動を確認
+    from comment_analyzer import CommentAnalyzer
+    from rate_limiter import AdaptiveRateLimiter
+
+    backend = FakeBackend(latency=0.05, rate_limit_rpm=200, error_rate=0.05)
+    limiter = AdaptiveRateLimiter(requests_per_minute=600)
+    analyzer = CommentAnalyzer(backend=backend, rate_limiter=limiter, use_cache=False)
+
+    comments = [f"テストコメント{i}" for i in range(100)]
+    results = analyzer.analyze_comments_batch(comments, max_workers=8)
+
+    errors = sum(1 for r in results if r["summary"] == "分析エラー")
+    print(f"呼び出し回数: {backend.call_count} | 429発生: {backend.rate_limited_count} | 分析エラー: {errors}")
+    print(f"リミッター: {limiter.get_stats()}")
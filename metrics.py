@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+
+# 計測する処理段階
+STAGE_EXCEL_LOAD = "excel_load"
+STAGE_COLUMN_EXTRACT = "column_extract"
+STAGE_PROMPT_BUILD = "prompt_build"
+STAGE_MODEL_CALL = "model_call"
+STAGE_JSON_PARSE = "json_parse"
+STAGE_SUMMARY = "summary"
+
+# 集計するカウンター（説明は Prometheus 形式の HELP に使用）
+COUNTER_HELP = {
+    "llm_requests": "LLMへのリクエスト数（再試行を含む）",
+    "retries": "レート制限による再試行回数",
+    "llm_errors": "レート制限以外のLLM呼び出しエラー数",
+    "parsed": "パース対象の応答件数（コメント単位）",
+    "parse_failures": "パースまたはスキーマ検証に失敗した件数",
+    "coerced": "スキーマに合わせて補正した件数",
+    "cache_hits": "結果キャッシュのヒット数",
+    "cache_misses": "結果キャッシュのミス数",
+    "triage_hits": "ローカル判定で確定したコメント数",
+    "input_tokens": "入力トークン数",
+    "output_tokens": "出力トークン数",
+}
+
+
+class PipelineMetrics:
+    """
+    分析パイプラインの処理段階ごとの所要時間とカウンターを集計する
+
+    複数スレッドから共有して使用でき、スナップショットを JSON または
+    Prometheus のテキスト形式で出力できる。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._counters: Dict[str, float] = {name: 0 for name in COUNTER_HELP}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with ブロックの所要時間を処理段階 name に加算（例外時も記録）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_duration(name, time.perf_counter() - start)
+
+    def record_duration(self, name: str, seconds: float):
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "total_sec": 0.0, "max_sec": 0.0})
+            stage["count"] += 1
+            stage["total_sec"] += seconds
+            stage["max_sec"] = max(stage["max_sec"], seconds)
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        現時点の集計結果を返す
+
+        Returns:
+            Dict[str, Any]: 経過時間、処理段階ごとの回数・合計/平均/最大時間、カウンター
+        """
+        with self._lock:
+            stages = {
+                name: {
+                    "count": int(stage["count"]),
+                    "total_sec": round(stage["total_sec"], 6),
+                    "avg_sec": round(stage["total_sec"] / stage["count"], 6) if stage["count"] else 0.0,
+                    "max_sec": round(stage["max_sec"], 6)
+                }
+                for name, stage in self._stages.items()
+            }
+            counters = dict(self._counters)
+        return {
+            "uptime_sec": round(time.time() - self._started_at, 3),
+            "stages": stages,
+            "counters": counters
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, **kwargs)
+
+    def to_prometheus(self, prefix: str = "comment_analysis") -> str:
+        """スナップショットを Prometheus のテキスト形式（exposition format）で出力"""
+        return format_prometheus(self.snapshot(), prefix)
+
+    def reset(self):
+        with self._lock:
+            self._started_at = time.time()
+            self._stages.clear()
+            self._counters = {name: 0 for name in COUNTER_HELP}
+
+
+def format_prometheus(snapshot: Dict[str, Any], prefix: str = "comment_analysis") -> str:
+    """
+    PipelineMetrics.snapshot() の結果を Prometheus のテキスト形式に変換
+
+    Args:
+        snapshot (Dict[str, Any]): メトリクスのスナップショット
+        prefix (str): メトリクス名の接頭辞
+
+    Returns:
+        str: Prometheus のテキスト形式
+    """
+    lines = []
+    stage_metrics = [
+        ("stage_calls_total", "counter", "処理段階の実行回数", "count"),
+        ("stage_seconds_total", "counter", "処理段階の合計所要時間（秒）", "total_sec"),
+        ("stage_seconds_max", "gauge", "処理段階の最大所要時間（秒）", "max_sec"),
+    ]
+    for suffix, metric_type, help_text, key in stage_metrics:
+        name = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for stage, values in snapshot["stages"].items():
+            lines.append(f'{name}{{stage="{stage}"}} {values[key]}')
+
+    for counter, value in snapshot["counters"].items():
+        name = f"{prefix}_{counter}_total"
+        lines.append(f"# HELP {name} {COUNTER_HELP.get(counter, counter)}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+
+    name = f"{prefix}_uptime_seconds"
+    lines.append(f"# HELP {name} 計測開始からの経過時間（秒）")
+    lines.append(f"# TYPE {name} gauge")
+    lines.append(f"{name} {snapshot['uptime_sec']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,163 @@
+import sys
+import time
+import threading
+from typing import Dict, Any, Optional, Callable, List
+
+
+class ProgressEvent:
+    """分析の進捗（完了1件ごとに通知される）"""
+
+    def __init__(self, done: int, total: Optional[int], failed: int, sentiments: Dict[str, int],
+                 elapsed_sec: float, eta_sec: Optional[float]):
+        self.done = done
+        self.total = total
+        self.failed = failed
+        self.sentiments = sentiments
+        self.elapsed_sec = elapsed_sec
+        self.eta_sec = eta_sec
+
+    @property
+    def positive(self) -> int:
+        return self.sentiments.get("positive", 0)
+
+    @property
+    def negative(self) -> int:
+        return self.sentiments.get("negative", 0)
+
+    @property
+    def fraction(self) -> float:
+        """進捗率（0〜1、総件数が不明な場合は 0）"""
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.total is not None and self.done >= self.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "done": self.done,
+            "total": self.total,
+            "failed": self.failed,
+            "sentiments": dict(self.sentiments),
+            "elapsed_sec": self.elapsed_sec,
+            "eta_sec": self.eta_sec
+        }
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+class ProgressTracker:
+    """
+    完了した分析結果を1件ずつ受け取り、件数・センチメント別件数・残り時間を集計する
+
+    集計は加算のみで行い、結果リスト全体を数え直さない。
+    """
+
+    def __init__(self, total: Optional[int] = None, callbacks: Optional[List[ProgressCallback]] = None):
+        """
+        Args:
+            total (Optional[int]): 総件数（不明な場合は None、残り時間は計算しない）
+            callbacks (Optional[List[ProgressCallback]]): 1件完了するごとに呼ばれる関数
+        """
+        self.total = total
+        self.callbacks = [callback for callback in (callbacks or []) if callback is not None]
+        self.done = 0
+        self.failed = 0
+        self.sentiments = {"positive": 0, "negative": 0, "neutral": 0}
+        self._start_time = time.time()
+        self._lock = threading.Lock()
+
+    def update(self, result: Dict[str, Any]) -> ProgressEvent:
+        """
+        完了した分析結果を1件加算し、進捗を通知
+
+        Args:
+            result (Dict[str, Any]): 完了した分析結果
+
+        Returns:
+            ProgressEvent: 加算後の進捗
+        """
+        with self._lock:
+            self.done += 1
+            if result.get("summary") == "分析エラー":
+                self.failed += 1
+            sentiment = result.get("sentiment", "neutral")
+            self.sentiments[sentiment] = self.sentiments.get(sentiment, 0) + 1
+            event = self._make_event()
+        for callback in self.callbacks:
+            callback(event)
+        return event
+
+    def set_total(self, total: int) -> Optional[ProgressEvent]:
+        """
+        総件数を設定（読み込みが終わって総件数が確定した時点で呼ぶ）
+
+        Returns:
+            Optional[ProgressEvent]: 設定時点ですでに完了していた場合に通知した最終状態（それ以外は None）
+        """
+        with self._lock:
+            self.total = total
+            if self.done < total:
+                return None
+            event = self._make_event()
+        for callback in self.callbacks:
+            callback(event)
+        return event
+
+    def finish(self) -> Optional[ProgressEvent]:
+        """
+        入力が終わったことを通知（総件数が不明だった場合は完了件数を総件数として最終状態を通知する）
+
+        Returns:
+            Optional[ProgressEvent]: 通知した最終状態（総件数が既知の場合は通知せず None）
+        """
+        with self._lock:
+            if self.total is not None:
+                return None
+            self.total = self.done
+            event = self._make_event()
+        for callback in self.callbacks:
+            callback(event)
+        return event
+
+    def _make_event(self) -> ProgressEvent:
+        elapsed = time.time() - self._start_time
+        eta = None
+        if self.total is not None and self.done > 1 and elapsed > 0:
+            eta = elapsed / self.done * max(0, self.total - self.done)
+        return ProgressEvent(self.done, self.total, self.failed, dict(self.sentiments), elapsed, eta)
+
+
+class ConsoleProgressBar:
+    """
+    進捗をコンソールにプログレスバーとして表示するコールバック
+
+    毎件呼ばれても出力は min_interval 秒に1回に抑え、完了時は必ず表示する。
+    """
+
+    def __init__(self, bar_length: int = 30, min_interval: float = 0.1, stream=None):
+        self.bar_length = bar_length
+        self.min_interval = min_interval
+        self.stream = stream
+        self._last_print = 0.0
+
+    def __call__(self, event: ProgressEvent):
+        now = time.time()
+        if not event.finished and now - self._last_print < self.min_interval:
+            return
+        self._last_print = now
+
+        stream = self.stream or sys.stdout
+        filled_length = int(self.bar_length * event.fraction)
+        bar = '█' * filled_length + '░' * (self.bar_length - filled_length)
+        total = event.total if event.total is not None else "?"
+        eta_str = ""
+        if event.eta_sec is not None:
+            eta_str = f" | 残り時間: {int(event.eta_sec // 60)}分{int(event.eta_sec % 60)}秒"
+        failed_str = f" | 失敗: {event.failed}" if event.failed else ""
+
+        print(f"\r[{bar}] {event.done}/{total} ({event.fraction * 100:.1f}%) | ポジティブ: {event.positive}"
+              f" | ネガティブ: {event.negative}{failed_str}{eta_str}", end="", flush=True, file=stream)
+        if event.finished:
+            print(file=stream)  # 最後に改行
@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+class RateLimitError(Exception):
+    """レート制限（HTTP 429）を表す例外"""
+    code = 429
+
+    def __init__(self, message: str = "429 Resource has been exhausted", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# レート制限を表す例外のクラス名（google.api_core.exceptions の ResourceExhausted / TooManyRequests）
+_RATE_LIMIT_ERROR_TYPES = {"ResourceExhausted", "TooManyRequests"}
+# Bedrock（botocore の ClientError）のレート制限のエラーコード
+_THROTTLING_ERROR_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException"}
+
+
+def _status_code(value: Any) -> Optional[int]:
+    """HTTP ステータスコードらしい値を整数に変換（変換できない場合は None）"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    例外がレート制限（429 / ResourceExhausted / Bedrock の ThrottlingException）によるものか判定
+
+    例外の型とステータスコード・エラーコードで判定し、メッセージの文字列は見ない
+    （コメント本文などに "429" が含まれる別のエラーをレート制限と誤認しないため）。
+
+    Args:
+        error (Exception): generate_content などが送出した例外
+
+    Returns:
+        bool: レート制限エラーであれば True
+    """
+    if isinstance(error, RateLimitError):
+        return True
+    if any(cls.__name__ in _RATE_LIMIT_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    for attribute in ("code", "status_code"):
+        if _status_code(getattr(error, attribute, None)) == 429:
+            return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        if response.get("Error", {}).get("Code") in _THROTTLING_ERROR_CODES:
+            return True
+        if _status_code(response.get("ResponseMetadata", {}).get("HTTPStatusCode")) == 429:
+            return True
+    return False
+
+
+class AdaptiveRateLimiter:
+    """
+    トークンバケット方式のレートリミッター
+
+    リクエスト上限（回/分）を予算とし、成功時は加算的にレートを上げ、
+    レート制限エラー時は乗算的にレートを下げる（AIMD）。
+    複数スレッドから共有して使用できる。
+    """
+
+    def __init__(self, requests_per_minute: float = 60.0, min_rpm: float = 1.0,
+                 increase_step: float = 1.0, decrease_factor: float = 0.5,
+                 burst: float = 1.0, base_backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        Args:
+            requests_per_minute (float): リクエスト上限（回/分）。レートはこの値を超えない
+            min_rpm (float): バックオフ時の下限レート（回/分）
+            increase_step (float): 成功1回あたりのレート増加量（回/分）
+            decrease_factor (float): レート制限エラー時にレートへ掛ける係数
+            burst (float): バケットの容量（連続して即時発行できる回数）
+            base_backoff (float): レート制限エラー時の初回待機時間（秒）
+            max_backoff (float): 待機時間の上限（秒）
+        """
+        self.max_rpm = float(requests_per_minute)
+        self.min_rpm = min(float(min_rpm), self.max_rpm)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._rate = self.max_rpm
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_limits = 0
+        self._successes = 0
+        self._rate_limited = 0
+
+    @property
+    def current_rate(self) -> float:
+        """現在の許容レート（回/分）"""
+        return self._rate
+
+    def set_budget(self, requests_per_minute: float):
+        """リクエスト上限（回/分）を変更し、現在のレートもその値に合わせる"""
+        with self._lock:
+            self.max_rpm = float(requests_per_minute)
+            self.min_rpm = min(self.min_rpm, self.max_rpm)
+            self._rate = self.max_rpm
+
+    def _refill(self, now: float):
+        if now <= self._last_refill:
+            return
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate / 60.0)
+        self._last_refill = now
+
+    def acquire(self):
+        """リクエスト1回分のトークンを取得できるまで待機"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait_time = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait_time = (1 - self._tokens) * 60.0 / self._rate
+            time.sleep(wait_time)
+
+    def record_success(self):
+        """成功したリクエストを記録し、レートを加算的に上げる"""
+        with self._lock:
+            self._successes += 1
+            self._consecutive_limits = 0
+            self._rate = min(self.max_rpm, self._rate + self.increase_step)
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """
+        レート制限エラーを記録し、レートを乗算的に下げて一定時間発行を止める
+
+        Args:
+            retry_after (Optional[float]): サーバーが指定した待機時間（秒）
+        """
+        with self._lock:
+            self._rate_limited += 1
+            self._consecutive_limits += 1
+            self._rate = max(self.min_rpm, self._rate * self.decrease_factor)
+            if retry_after is None:
+                retry_after = min(self.max_backoff, self.base_backoff * 2 ** (self._consecutive_limits - 1))
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            # 待機明けに溜まったトークンで一斉に再送しないよう空にする
+            self._tokens = 0
+            self._last_refill = max(now, self._blocked_until)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """現在のレートと成功・レート制限の回数を返す"""
+        with self._lock:
+            return {
+                "current_rpm": self._rate,
+                "max_rpm": self.max_rpm,
+                "successes": self._successes,
+                "rate_limited": self._rate_limited
+            }
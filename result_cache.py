@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "analysis_cache.sqlite3")
+
+
+def normalize_comment(comment: str) -> str:
+    """キャッシュキー用にコメントを正規化（NFKC・空白の統一）"""
+    text = unicodedata.normalize("NFKC", comment)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class ResultCache:
+    """
+    コメント分析結果の永続キャッシュ（SQLite）
+
+    キーは正規化したコメント・プロンプトバージョン・モデル名のハッシュ。
+    WALモードのSQLiteを使うため、複数プロセス・複数セッションから共有できる。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 100000,
+                 max_age_days: float = 30.0, evict_interval: int = 500):
+        """
+        Args:
+            path (Optional[str]): キャッシュファイルのパス（省略時は ANALYSIS_CACHE_PATH 環境変数または .cache/）
+            max_entries (int): 保持する最大件数（超えた分は最終参照が古い順に削除）
+            max_age_days (float): 保持期間（日）。これより古いエントリは削除
+            evict_interval (int): 何回の書き込みごとに削除処理を行うか
+        """
+        self.path = path or os.getenv("ANALYSIS_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.evict_interval = evict_interval
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._puts = 0
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed_at ON results (accessed_at)")
+        conn.commit()
+        self.evict()
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとの接続を返す（sqlite3の接続はスレッド間で共有しない）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(comment: str, prompt_version: str, model_name: str) -> str:
+        """コメント・プロンプトバージョン・モデル名からキャッシュキーを生成"""
+        payload = "\x00".join([normalize_comment(comment), prompt_version, model_name])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュから分析結果を取得（存在しなければ None）"""
+        conn = self._connection()
+        row = conn.execute("SELECT result, created_at FROM results WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age_seconds:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        with self._lock:
+            self._hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """分析結果をキャッシュに保存"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(result, ensure_ascii=False), now, now)
+        )
+        conn.commit()
+        with self._lock:
+            self._puts += 1
+            should_evict = self._puts % self.evict_interval == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        期限切れと上限超過のエントリを削除
+
+        Returns:
+            int: 削除した件数
+        """
+        conn = self._connection()
+        cutoff = time.time() - self.max_age_seconds
+        removed = conn.execute("DELETE FROM results WHERE created_at < ?", (cutoff,)).rowcount
+        removed += conn.execute("""
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,)).rowcount
+        conn.commit()
+        return removed
+
+    def clear(self):
+        """キャッシュを全削除"""
+        conn = self._connection()
+        conn.execute("DELETE FROM results")
+        conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット・ミス数と現在の件数を返す"""
+        entries = self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups * 100 if lookups else 0.0,
+                "entries": entries
+            }
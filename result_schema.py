@@ -0,0 +1,154 @@
+import re
+import unicodedata
+from typing import Dict, Any, Optional, Tuple
+
+SENTIMENTS = ["positive", "negative", "neutral"]
+CATEGORIES = ["content", "materials", "management", "others"]
+RISK_LEVELS = ["high", "medium", "low"]
+MAX_KEYWORDS = 5
+
+# 分析結果1件のスキーマ（Gemini の response_schema 形式）
+RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sentiment": {"type": "string", "enum": SENTIMENTS},
+        "category": {"type": "string", "enum": CATEGORIES},
+        "importance_score": {"type": "integer"},
+        "risk_level": {"type": "string", "enum": RISK_LEVELS},
+        "summary": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}, "max_items": MAX_KEYWORDS}
+    },
+    "required": ["sentiment", "category", "importance_score", "risk_level", "summary", "keywords"]
+}
+
+# 複数コメントをまとめて分析する場合のスキーマ（id 付きの配列）
+PACKED_RESULT_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": dict(id={"type": "integer"}, **RESULT_SCHEMA["properties"]),
+        "required": ["id"] + RESULT_SCHEMA["required"]
+    }
+}
+
+# 1人の回答者の全回答をまとめて分析する場合のスキーマ（回答ごとの結果と回答者全体の危険度）
+RESPONDENT_RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answers": PACKED_RESULT_SCHEMA,
+        "respondent_risk": {"type": "string", "enum": RISK_LEVELS}
+    },
+    "required": ["answers", "respondent_risk"]
+}
+
+# 日本語ラベルや表記ゆれから列挙値への対応
+_SENTIMENT_ALIASES = {
+    "ポジティブ": "positive", "肯定": "positive", "肯定的": "positive", "良い": "positive", "pos": "positive",
+    "ネガティブ": "negative", "否定": "negative", "否定的": "negative", "悪い": "negative", "neg": "negative",
+    "中立": "neutral", "ニュートラル": "neutral", "どちらでもない": "neutral", "neu": "neutral"
+}
+_CATEGORY_ALIASES = {
+    "講義内容": "content", "内容": "content", "講義": "content",
+    "講義資料": "materials", "資料": "materials", "教材": "materials", "material": "materials",
+    "運営": "management", "管理": "management",
+    "その他": "others", "other": "others", "そのほか": "others"
+}
+_RISK_ALIASES = {
+    "高": "high", "高い": "high", "重要": "high", "緊急": "high", "重要・緊急": "high",
+    "中": "medium", "中程度": "medium", "やや重要": "medium", "mid": "medium", "middle": "medium",
+    "低": "low", "低い": "low", "通常": "low"
+}
+
+
+def _normalize_label(value: Any) -> str:
+    if not isinstance(value, str):
+        return ""
+    text = unicodedata.normalize("NFKC", value).strip().lower()
+    # 「ポジティブ（positive）」のような併記は括弧内を優先
+    match = re.search(r"[(]([a-z]+)[)]", text)
+    if match:
+        return match.group(1)
+    return text
+
+
+def _coerce_enum(value: Any, allowed: list, aliases: Dict[str, str]) -> Optional[str]:
+    label = _normalize_label(value)
+    if label in allowed:
+        return label
+    return aliases.get(label)
+
+
+def _coerce_score(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        score = int(round(value))
+    elif isinstance(value, str):
+        # 「8」「８」「8/10」「8点」などの先頭の数値を採用
+        match = re.search(r"\d+(\.\d+)?", unicodedata.normalize("NFKC", value))
+        if not match:
+            return None
+        score = int(round(float(match.group())))
+    else:
+        return None
+    return max(1, min(10, score))
+
+
+def _coerce_keywords(value: Any) -> Optional[list]:
+    if isinstance(value, str):
+        value = [k for k in re.split(r"[、,，/\s]+", value) if k]
+    if not isinstance(value, list):
+        return None
+    return [str(k) for k in value if k not in (None, "")][:MAX_KEYWORDS]
+
+
+def coerce_result(data: Any) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    モデルの応答をスキーマに合わせて検証・補正
+
+    日本語ラベル（「ポジティブ」「講義資料」など）、文字列のスコア、
+    文字列のキーワードなど軽微なずれは再リクエストせずに補正する。
+
+    Args:
+        data (Any): JSONとしてパースした応答
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], bool]: 補正後の分析結果（補正できない場合は None）と、補正を行ったか
+    """
+    if not isinstance(data, dict):
+        return None, False
+
+    coerced = False
+    result = dict(data)
+    fields = [
+        ("sentiment", lambda v: _coerce_enum(v, SENTIMENTS, _SENTIMENT_ALIASES), "neutral"),
+        ("category", lambda v: _coerce_enum(v, CATEGORIES, _CATEGORY_ALIASES), "others"),
+        ("importance_score", _coerce_score, 1),
+        ("risk_level", lambda v: _coerce_enum(v, RISK_LEVELS, _RISK_ALIASES), "low"),
+        ("keywords", _coerce_keywords, []),
+    ]
+
+    missing = 0
+    for key, coerce, default in fields:
+        value = coerce(data.get(key))
+        if value is None:
+            missing += 1
+            value = default
+        if value != data.get(key):
+            coerced = True
+        result[key] = value
+
+    summary = data.get("summary")
+    if not isinstance(summary, str):
+        result["summary"] = "" if summary is None else str(summary)
+        coerced = True
+
+    # 主要な項目がほとんど読み取れない応答は補正せず失敗とする
+    if missing >= 3:
+        return None, False
+    return result, coerced
+
+
+def coerce_risk_level(value: Any) -> Optional[str]:
+    """危険度の値を列挙値に補正（読み取れない場合は None）"""
+    return _coerce_enum(value, RISK_LEVELS, _RISK_ALIASES)
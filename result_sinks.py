@@ -0,0 +1,233 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Any, Iterable
+
+import pandas as pd
+
+from result_store import ResultStore
+
+DEFAULT_PARQUET_BATCH_SIZE = 1000
+
+
+class ResultSink:
+    """
+    分析結果の出力先の基底クラス
+
+    streaming が True の出力先には、分析が完了した順に1件ずつ結果が渡される。
+    False の出力先には、すべての分析が終わってから並べ替え済みの結果がまとめて渡される。
+    書き込みは一時ファイル（パス + ".tmp"）に行い、commit() で出力ファイルを置き換える。
+    分析が失敗した場合は abort() で一時ファイルを削除し、既存の出力ファイルは変更しない。
+    """
+
+    streaming = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._finished = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, result: Dict[str, Any]):
+        """分析結果を1件書き込む"""
+        raise NotImplementedError
+
+    def write_all(self, results: Iterable[Dict[str, Any]]):
+        for result in results:
+            self.write(result)
+
+    def commit(self):
+        """書き込みを完了し、一時ファイルで出力ファイルを置き換える"""
+        if self._finished:
+            return
+        self._finished = True
+        self._write_tmp()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """書き込みを破棄して一時ファイルを削除する（既存の出力ファイルは変更しない）"""
+        if self._finished:
+            return
+        self._finished = True
+        self._discard()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def close(self):
+        """書き込みを完了する（commit() と同じ）"""
+        self.commit()
+
+    def _write_tmp(self):
+        """一時ファイルへの書き込みを完了する"""
+
+    def _discard(self):
+        """書き込み途中の状態を破棄する（開いているファイルを閉じる）"""
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class JsonlSink(ResultSink):
+    """
+    1件ごとに JSON Lines として追記する出力先
+
+    1行書き込むごとにフラッシュするため、実行中にプロセスが終了しても書き込み済みの結果は一時ファイルに残る。
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        """
+        Args:
+            path (str): 出力ファイルのパス
+            append (bool): 既存のファイルに追記するか（False の場合は上書き）
+        """
+        super().__init__(path)
+        if append and os.path.exists(path):
+            shutil.copyfile(path, self._tmp_path)
+        self._file = open(self._tmp_path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, result: Dict[str, Any]):
+        self._file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def _write_tmp(self):
+        self._file.close()
+
+    def _discard(self):
+        self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    Parquet ファイルに書き込む出力先
+
+    batch_size 件ごとに1つの行グループとして書き込み、メモリに保持する結果を一定に保つ。
+    sentiment / category などの列挙値は dictionary 型、keywords は list<string> 型で保存するため、
+    読み込み時に型を推定し直す必要がない。
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_PARQUET_BATCH_SIZE):
+        """
+        Args:
+            path (str): 出力ファイルのパス
+            batch_size (int): 1つの行グループにまとめる件数
+        """
+        super().__init__(path)
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._writer = None
+
+    def write(self, result: Dict[str, Any]):
+        self._buffer.append(result)
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow.parquet as pq
+
+        if not self._buffer and self._writer is not None:
+            return
+        table = ResultStore.from_results(self._buffer).to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp_path, table.schema)
+        self._writer.write_table(table)
+        self._buffer = []
+
+    def _write_tmp(self):
+        self._flush()
+        self._writer.close()
+
+    def _discard(self):
+        self._buffer = []
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CsvSink(ResultSink):
+    """
+    CSV ファイルに書き込む出力先（従来の出力形式）
+
+    列は結果のキーから決まるため、すべての結果が揃ってから並べ替え済みの結果をまとめて書き込む。
+    write_all で結果を受け取らずに完了した場合も、既存のファイルを上書きしない。
+    """
+
+    streaming = False
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._results: List[Dict[str, Any]] = []
+        self._received = False
+
+    def write(self, result: Dict[str, Any]):
+        self._results.append(result)
+        self.count += 1
+
+    def write_all(self, results: Iterable[Dict[str, Any]]):
+        super().write_all(results)
+        self._received = True
+
+    def commit(self):
+        if not self._received:
+            self.abort()
+            return
+        super().commit()
+
+    def _write_tmp(self):
+        results, self._results = self._results, None
+        pd.DataFrame(results).to_csv(self._tmp_path, index=False, encoding='utf-8')
+
+    def _discard(self):
+        self._results = None
+
+
+SINK_TYPES = {
+    ".jsonl": JsonlSink,
+    ".parquet": ParquetSink,
+    ".csv": CsvSink,
+}
+
+
+def open_sink(path: str, **kwargs) -> ResultSink:
+    """
+    拡張子に応じた出力先を作成（.jsonl / .parquet / .csv）
+
+    Args:
+        path (str): 出力ファイルのパス
+        **kwargs: 出力先のクラスに渡す引数
+
+    Returns:
+        ResultSink: 出力先
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINK_TYPES:
+        raise ValueError(f"未対応の出力形式です: {path}（{', '.join(SINK_TYPES)} のいずれかを指定してください）")
+    return SINK_TYPES[extension](path, **kwargs)
+
+
+def read_results(path: str) -> pd.DataFrame:
+    """
+    出力先に書き込んだ結果を DataFrame として読み込む（Parquet は型を保ったまま読み込む）
+
+    Args:
+        path (str): 出力ファイルのパス
+
+    Returns:
+        pd.DataFrame: 分析結果
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True).to_pandas()
+    if extension == ".jsonl":
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
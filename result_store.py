@@ -0,0 +1,362 @@
+import math
+import sys
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from result_schema import SENTIMENTS, CATEGORIES, RISK_LEVELS
+
+_INITIAL_CAPACITY = 1024
+
+# 列挙値の列（初期カテゴリ。想定外の値も追加で受け付ける）
+_CATEGORICAL_FIELDS = {
+    "sentiment": SENTIMENTS,
+    "category": CATEGORIES,
+    "risk_level": RISK_LEVELS,
+    "analysis_source": ["llm", "triage"],
+    "column_name": [],
+    "respondent_risk": RISK_LEVELS,
+}
+# 数値の列（dtype と欠損時の値）
+_NUMERIC_FIELDS = {
+    "importance_score": (np.int8, 0),
+    "index": (np.int32, -1),
+    "row": (np.int32, -1),
+    "triage_confidence": (np.float32, np.nan),
+}
+# 自由記述の列
+_OBJECT_FIELDS = ["summary", "original_comment", "keywords"]
+# 絞り込み用のビットマップ索引を作成するカテゴリ列
+_INDEXED_FIELDS = ["sentiment", "category", "risk_level", "column_name", "respondent_risk"]
+# 1バイト中の立っているビット数（ビットマップの件数計算用）
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+FIELDS = list(_CATEGORICAL_FIELDS) + list(_NUMERIC_FIELDS) + _OBJECT_FIELDS
+
+
+class _Categories:
+    """カテゴリ値と整数コードの対応（同じ文字列は1つのオブジェクトを共有する）"""
+
+    def __init__(self, initial: Iterable[str]):
+        self.values: List[Optional[str]] = [None]
+        self.codes: Dict[Optional[str], int] = {None: 0}
+        for value in initial:
+            self.code(value)
+
+    def code(self, value: Any) -> int:
+        if value is not None and not isinstance(value, str):
+            value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class ResultStore:
+    """
+    分析結果を型付きの列で保持するコンテナ
+
+    sentiment / category / risk_level などの列挙値は int8 のカテゴリコード、
+    importance_score は int8、column_name はインターン済み文字列のコードで保持し、
+    辞書のリストより少ないメモリで高速に絞り込める。
+    1件ずつの追加（償却 O(1)）、辞書としての取り出し、pandas / Arrow への変換に対応する。
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._categories = {field: _Categories(initial) for field, initial in _CATEGORICAL_FIELDS.items()}
+        self._columns: Dict[str, np.ndarray] = {}
+        for field in _CATEGORICAL_FIELDS:
+            self._columns[field] = np.zeros(self._capacity, dtype=np.int16 if field == "column_name" else np.int8)
+        for field, (dtype, missing) in _NUMERIC_FIELDS.items():
+            self._columns[field] = np.full(self._capacity, missing, dtype=dtype)
+        for field in _OBJECT_FIELDS:
+            self._columns[field] = np.empty(self._capacity, dtype=object)
+        # 上記以外のキーは行番号ごとに保持する（通常は空）
+        self._extras: Dict[int, Dict[str, Any]] = {}
+        self._index: Optional["ResultIndex"] = None
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]]) -> "ResultStore":
+        results = list(results) if not hasattr(results, "__len__") else results
+        store = cls(capacity=max(_INITIAL_CAPACITY, len(results)))
+        store.extend(results)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        self._capacity = max(1, self._capacity * 2)
+        for field, column in self._columns.items():
+            if field in _NUMERIC_FIELDS:
+                grown = np.full(self._capacity, _NUMERIC_FIELDS[field][1], dtype=column.dtype)
+            elif column.dtype == object:
+                grown = np.empty(self._capacity, dtype=object)
+            else:
+                grown = np.zeros(self._capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[field] = grown
+
+    def append(self, result: Dict[str, Any]):
+        """分析結果を1件追加"""
+        if self._size == self._capacity:
+            self._grow()
+        i = self._size
+        for field, categories in self._categories.items():
+            self._columns[field][i] = categories.code(result.get(field))
+        for field, (_, missing) in _NUMERIC_FIELDS.items():
+            value = result.get(field)
+            try:
+                self._columns[field][i] = missing if value is None else value
+            except (TypeError, ValueError, OverflowError):
+                self._columns[field][i] = missing
+        for field in _OBJECT_FIELDS:
+            self._columns[field][i] = result.get(field)
+        extras = {key: value for key, value in result.items() if key not in _FIELD_SET}
+        if extras:
+            self._extras[i] = extras
+        self._size += 1
+
+    def extend(self, results: Iterable[Dict[str, Any]]):
+        for result in results:
+            self.append(result)
+
+    def column(self, field: str) -> np.ndarray:
+        """列の値（カテゴリ列はコード）の配列（コピーではなくビュー）"""
+        return self._columns[field][:self._size]
+
+    def categories(self, field: str) -> List[Optional[str]]:
+        """カテゴリ列のコード→値の対応（コード0は欠損）"""
+        return list(self._categories[field].values)
+
+    def codes_for(self, field: str, values: Iterable[str]) -> np.ndarray:
+        """カテゴリ値のリストを、この列に登録済みのコードの配列に変換（未登録の値は無視）"""
+        codes = self._categories[field].codes
+        return np.array([codes[v] for v in values if v in codes], dtype=self._columns[field].dtype)
+
+    def mask(self, sentiment: Optional[str] = None, category: Optional[str] = None,
+             risk_level: Optional[str] = None, column_name: Optional[str] = None,
+             min_importance: Optional[int] = None, respondent_risk: Optional[str] = None) -> np.ndarray:
+        """
+        条件に一致する行の真偽値配列を作成（None の条件は無視）
+
+        Returns:
+            np.ndarray: 各行が条件に一致するか（bool）
+        """
+        mask = np.ones(self._size, dtype=bool)
+        for field, value in (("sentiment", sentiment), ("category", category), ("risk_level", risk_level),
+                             ("column_name", column_name), ("respondent_risk", respondent_risk)):
+            if value is None:
+                continue
+            code = self._categories[field].codes.get(value)
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            mask &= self.column(field) == code
+        if min_importance is not None:
+            mask &= self.column("importance_score") >= min_importance
+        return mask
+
+    def index(self) -> "ResultIndex":
+        """
+        絞り込み用のビットマップ索引（初回に作成し、行が追加されるまで再利用する）
+        """
+        if self._index is None or self._index.size != self._size:
+            self._index = ResultIndex(self)
+        return self._index
+
+    def take(self, positions: Any) -> "ResultStore":
+        """
+        指定した行（位置の配列または真偽値配列）を取り出した新しいストアを返す
+        """
+        positions = np.asarray(positions)
+        positions = np.flatnonzero(positions) if positions.dtype == bool else positions.astype(np.intp)
+        subset = ResultStore(capacity=1)
+        subset._categories = self._categories  # カテゴリ表は共有する（追加時のみ拡張される）
+        for field in self._columns:
+            subset._columns[field] = self.column(field)[positions].copy()
+        subset._size = len(positions)
+        subset._capacity = len(positions)
+        subset._extras = {j: self._extras[int(i)] for j, i in enumerate(positions) if int(i) in self._extras}
+        return subset
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._record(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self._record(i)
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        for field, categories in self._categories.items():
+            value = categories.values[self._columns[field][i]]
+            if value is not None:
+                record[field] = value
+        for field, (_, missing) in _NUMERIC_FIELDS.items():
+            value = self._columns[field][i].item()
+            if isinstance(value, float):
+                if math.isnan(value):
+                    continue
+                value = round(value, 6)
+            elif value == missing and field != "importance_score":
+                continue
+            record[field] = value
+        for field in _OBJECT_FIELDS:
+            value = self._columns[field][i]
+            if value is not None:
+                record[field] = value
+        record.update(self._extras.get(i, {}))
+        return record
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """辞書のリストに変換（JSON出力などの互換用）"""
+        return list(self)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """pandas の DataFrame に変換（カテゴリ列は Categorical）"""
+        data = {}
+        for field, categories in self._categories.items():
+            data[field] = pd.Categorical.from_codes(self.column(field).astype(np.int32) - 1, categories.values[1:])
+        for field in _NUMERIC_FIELDS:
+            data[field] = self.column(field)
+        for field in _OBJECT_FIELDS:
+            data[field] = self.column(field)
+        df = pd.DataFrame(data)
+        if self._extras:
+            extras = pd.DataFrame.from_dict(self._extras, orient="index").reindex(range(self._size))
+            df = pd.concat([df, extras], axis=1)
+        return df
+
+    def to_arrow(self):
+        """pyarrow の Table に変換（カテゴリ列は dictionary 型）"""
+        import pyarrow as pa
+
+        arrays = {}
+        for field, categories in self._categories.items():
+            codes = self.column(field).astype(np.int32) - 1
+            arrays[field] = pa.DictionaryArray.from_arrays(
+                pa.array(codes, mask=codes < 0, type=pa.int32()),
+                pa.array(categories.values[1:], type=pa.string())
+            )
+        for field, (_, missing) in _NUMERIC_FIELDS.items():
+            values = self.column(field)
+            null_mask = np.isnan(values) if values.dtype.kind == "f" else values == missing
+            if field == "importance_score":
+                null_mask = None
+            arrays[field] = pa.array(values, mask=null_mask)
+        arrays["summary"] = pa.array(self.column("summary").tolist(), type=pa.string())
+        arrays["original_comment"] = pa.array(self.column("original_comment").tolist(), type=pa.string())
+        arrays["keywords"] = pa.array(
+            [None if k is None else [str(v) for v in k] for k in self.column("keywords")],
+            type=pa.list_(pa.string())
+        )
+        return pa.table(arrays)
+
+    def memory_usage(self) -> int:
+        """保持しているデータのおおよそのバイト数（自由記述の文字列本体を含む）"""
+        total = 0
+        for field, column in self._columns.items():
+            values = column[:self._size]
+            total += values.nbytes
+            if column.dtype == object:
+                seen = set()
+                for value in values:
+                    if value is not None and id(value) not in seen:
+                        seen.add(id(value))
+                        total += sys.getsizeof(value)
+                        if isinstance(value, list):
+                            total += sum(sys.getsizeof(v) for v in value)
+        for categories in self._categories.values():
+            total += sum(sys.getsizeof(v) for v in categories.values if v is not None)
+        return total
+
+
+class ResultIndex:
+    """
+    ResultStore の絞り込み用ビットマップ索引
+
+    カテゴリ列（sentiment / category / risk_level / column_name / respondent_risk）は値ごとに、importance_score は「k 以上」ごとに、該当する行を1行1ビットに
+    詰めたビットマップを作成時に一度だけ計算する。条件の変更はビットマップの AND だけで処理するため、
+    列の値を毎回比較するより走査するデータ量が 1/8 以下になり、10万件を超える結果でも即座に絞り込める。
+    作成後にストアへ追加された行は含まれない（ResultStore.index() は行数が変わると作り直す）。
+    """
+
+    def __init__(self, store: ResultStore):
+        self.size = len(store)
+        self._categories = store._categories
+        self._bitmaps: Dict[str, Dict[int, np.ndarray]] = {}
+        for field in _INDEXED_FIELDS:
+            codes = store.column(field)
+            self._bitmaps[field] = {int(code): np.packbits(codes == code) for code in np.unique(codes)}
+        scores = store.column("importance_score")
+        self._min_score = int(scores.min()) if self.size else 0
+        self._max_score = int(scores.max()) if self.size else 0
+        self._importance = {k: np.packbits(scores >= k) for k in range(self._min_score + 1, self._max_score + 1)}
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    def bitmap(self, sentiment: Optional[str] = None, category: Optional[str] = None,
+               risk_level: Optional[str] = None, column_name: Optional[str] = None,
+               min_importance: Optional[int] = None, respondent_risk: Optional[str] = None) -> np.ndarray:
+        """
+        条件に一致する行のビットマップ（np.packbits 形式の uint8 配列。None の条件は無視）
+        """
+        bitmaps = []
+        for field, value in (("sentiment", sentiment), ("category", category), ("risk_level", risk_level),
+                             ("column_name", column_name), ("respondent_risk", respondent_risk)):
+            if value is None:
+                continue
+            code = self._categories[field].codes.get(value)
+            bitmap = self._bitmaps[field].get(code)
+            if bitmap is None:
+                return self._none
+            bitmaps.append(bitmap)
+        if min_importance is not None and min_importance > self._min_score:
+            if min_importance > self._max_score:
+                return self._none
+            bitmaps.append(self._importance[int(math.ceil(min_importance))])
+
+        if not bitmaps:
+            return self._all
+        if len(bitmaps) == 1:
+            return bitmaps[0]
+        result = np.bitwise_and(bitmaps[0], bitmaps[1])
+        for bitmap in bitmaps[2:]:
+            np.bitwise_and(result, bitmap, out=result)
+        return result
+
+    def mask(self, **conditions) -> np.ndarray:
+        """
+        条件に一致する行の真偽値配列（ResultStore.mask と同じ結果）
+
+        Args:
+            **conditions: sentiment / category / risk_level / column_name / respondent_risk / min_importance
+
+        Returns:
+            np.ndarray: 各行が条件に一致するか（bool）
+        """
+        return np.unpackbits(self.bitmap(**conditions), count=self.size).view(bool)
+
+    def count(self, **conditions) -> int:
+        """条件に一致する行数（真偽値配列を作らずにビットマップから数える）"""
+        return int(_POPCOUNT[self.bitmap(**conditions)].sum(dtype=np.int64))
+
+    def memory_usage(self) -> int:
+        """索引のバイト数"""
+        total = self._all.nbytes + self._none.nbytes
+        total += sum(b.nbytes for bitmaps in self._bitmaps.values() for b in bitmaps.values())
+        total += sum(b.nbytes for b in self._importance.values())
+        return total
+
+
+_FIELD_SET = set(FIELDS)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Any, Tuple, Union, BinaryIO
+
+DEFAULT_JOURNAL_DIR = ".journal"
+
+
+def file_sha256(source: Union[str, bytes, BinaryIO]) -> str:
+    """
+    ファイルの内容のSHA-256ハッシュを計算
+
+    Args:
+        source (Union[str, bytes, BinaryIO]): ファイルパス・バイト列・ファイルオブジェクトのいずれか
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    else:
+        position = source.tell()
+        source.seek(0)
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            digest.update(chunk)
+        source.seek(position)
+    return digest.hexdigest()
+
+
+class RunJournal:
+    """
+    分析の途中経過を記録するジャーナル（JSON Lines）
+
+    完了した分析結果を1件ずつ追記し、中断後の再実行時には
+    (列名, 行番号) をキーに完了済みの結果を読み戻す。
+    """
+
+    def __init__(self, run_key: str, directory: str = DEFAULT_JOURNAL_DIR):
+        """
+        Args:
+            run_key (str): 実行を識別するキー（入力ファイルのハッシュなど）
+            directory (str): ジャーナルファイルを置くディレクトリ
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{run_key}.jsonl")
+        self._lock = threading.Lock()
+        self._file = None
+
+    @staticmethod
+    def make_run_key(file_hash: str, model_name: str, prompt_version: str) -> str:
+        """入力ファイル・モデル名・プロンプトバージョンから実行キーを生成"""
+        payload = "\x00".join([file_hash, model_name, prompt_version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def entry_key(result: Dict[str, Any]) -> Tuple[str, int]:
+        return result["column_name"], int(result["row"])
+
+    def load(self) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """
+        記録済みの分析結果を読み込む（書き込み途中で壊れた行は無視）
+
+        Returns:
+            Dict[Tuple[str, int], Dict[str, Any]]: (列名, 行番号) → 分析結果
+        """
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        # 書き込み途中で切れた最終行は文字の途中で終わることがあるため、デコードできない文字は置き換えて読む
+        with open(self.path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    completed[self.entry_key(result)] = result
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+        return completed
+
+    def append(self, result: Dict[str, Any]):
+        """分析結果を1件追記し、ディスクに書き出す"""
+        line = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                # 前回の書き込みが途中で切れている場合は改行して続ける
+                if self._file.tell() > 0 and not self._ends_with_newline():
+                    self._file.write("\n")
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        """ジャーナルを削除（最初からやり直す場合）"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
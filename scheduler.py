@@ -0,0 +1,81 @@
+from collections import deque
+from typing import Dict, List, Iterable, Optional, Tuple
+
+from llm_backends import estimate_tokens
+
+DEFAULT_PRIORITY = 1.0
+
+
+class ColumnScheduler:
+    """
+    全コメント列を1つの作業キューにまとめるスケジューラ
+
+    列ごとの優先度に比例した割合で列を交互に取り出し（ストライドスケジューリング）、
+    全体のコメント数・推定トークン数の予算に達したところで打ち切る。
+    優先度の高い列ほど先に・多く分析され、どの時点でも複数の列のコメントが並行して処理される。
+    同じ列の中では行の順序を保つ。
+    """
+
+    def __init__(self, max_comments: Optional[int] = None, max_tokens: Optional[int] = None,
+                 priorities: Optional[Dict[str, float]] = None, quotas: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_comments (Optional[int]): 全列で分析するコメント数の上限
+            max_tokens (Optional[int]): 全列で分析するコメントの推定トークン数の上限
+            priorities (Optional[Dict[str, float]]): 列名→優先度（省略した列は 1.0、0以下の列は分析しない）
+            quotas (Optional[Dict[str, int]]): 列名→その列で分析するコメント数の上限
+        """
+        self.max_comments = max_comments
+        self.max_tokens = max_tokens
+        self.priorities = priorities or {}
+        self.quotas = quotas or {}
+        self.available_counts: Dict[str, int] = {}
+        self.scheduled_counts: Dict[str, int] = {}
+        self.scheduled_tokens = 0
+
+    def priority(self, column: str) -> float:
+        return self.priorities.get(column, DEFAULT_PRIORITY)
+
+    def schedule(self, column_comments: Iterable[Tuple[str, int, str]]) -> List[Tuple[str, int, str]]:
+        """
+        (列名, 行番号, コメント) の並びから、分析する順に並べたコメントを選ぶ
+
+        Args:
+            column_comments (Iterable[Tuple[str, int, str]]): 読み込んだコメント
+
+        Returns:
+            List[Tuple[str, int, str]]: 予算内で選んだコメント（分析する順）
+        """
+        queues: Dict[str, deque] = {}
+        for col, row, comment in column_comments:
+            queues.setdefault(col, deque()).append((col, row, comment))
+        self.available_counts = {col: len(queue) for col, queue in queues.items()}
+        self.scheduled_counts = {col: 0 for col in queues}
+        self.scheduled_tokens = 0
+
+        for col, queue in queues.items():
+            quota = self.quotas.get(col)
+            if quota is not None:
+                while len(queue) > quota:
+                    queue.pop()
+        # 列ごとの仮想時刻（取り出すたびに 1/優先度 だけ進む）が最も小さい列から取り出す（同じなら優先度の高い列）
+        passes = {col: 0.0 for col, queue in queues.items() if queue and self.priority(col) > 0}
+        order = {col: i for i, col in enumerate(queues)}
+
+        scheduled: List[Tuple[str, int, str]] = []
+        while passes:
+            if self.max_comments is not None and len(scheduled) >= self.max_comments:
+                break
+            col = min(passes, key=lambda c: (passes[c], -self.priority(c), order[c]))
+            item = queues[col][0]
+            tokens = estimate_tokens(item[2])
+            if self.max_tokens is not None and self.scheduled_tokens + tokens > self.max_tokens:
+                break
+            queues[col].popleft()
+            scheduled.append(item)
+            self.scheduled_counts[col] += 1
+            self.scheduled_tokens += tokens
+            passes[col] += 1.0 / self.priority(col)
+            if not queues[col]:
+                del passes[col]
+        return scheduled
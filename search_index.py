@@ -0,0 +1,208 @@
+import math
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_NGRAM = 2
+# BM25 のパラメータ
+_K1 = 1.2
+_B = 0.75
+# モデルが抽出したキーワードに検索語が一致した場合の加点（完全一致 / 部分一致）
+KEYWORD_EXACT_BOOST = 2.0
+KEYWORD_PARTIAL_BOOST = 1.0
+
+
+def normalize_text(text: Any) -> str:
+    """検索用の正規化（NFKC で全角英数字・半角カナを統一し、英字は小文字にする）"""
+    if text is None:
+        return ""
+    return unicodedata.normalize("NFKC", str(text)).lower()
+
+
+def _empty() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+
+class CommentSearchIndex:
+    """
+    分析結果の日本語全文検索用の転置インデックス
+
+    original_comment は正規化したうえで文字 n-gram（1文字〜ngram 文字）ごとに、
+    keywords はキーワードごとに、含まれる結果の番号（追加順）のリストを保持する。
+    検索語は n-gram の転置リストの積集合で候補を絞り、候補の本文だけを照合して
+    BM25 で順位付けする（キーワードに一致した結果は加点する）。全件を走査しないため、
+    10万件を超える結果でも検索は1秒以内に終わる。
+    結果は1件ずつ追加でき、分析の実行中に完了した順に索引を作成できる。
+    """
+
+    def __init__(self, ngram: int = DEFAULT_NGRAM):
+        """
+        Args:
+            ngram (int): 本文の索引に使う n-gram の最大文字数（2 で文字 bigram、3 で trigram まで）
+        """
+        self.ngram = max(1, ngram)
+        self._texts: List[str] = []
+        self._postings: Dict[str, array] = {}
+        self._keywords: Dict[str, array] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]], ngram: int = DEFAULT_NGRAM) -> "CommentSearchIndex":
+        index = cls(ngram=ngram)
+        index.extend(results)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _grams(self, text: str) -> set:
+        """本文の n-gram（空白をまたぐものは除く）"""
+        grams = set()
+        for segment in text.split():
+            for n in range(1, self.ngram + 1):
+                grams.update(segment[i:i + n] for i in range(len(segment) - n + 1))
+        return grams
+
+    def add(self, result: Dict[str, Any]) -> int:
+        """
+        分析結果を1件追加
+
+        Returns:
+            int: 追加した結果の番号
+        """
+        text = normalize_text(result.get("original_comment"))
+        keywords = result.get("keywords") or []
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        keywords = {normalize_text(keyword).strip() for keyword in keywords} - {""}
+
+        with self._lock:
+            doc = len(self._texts)
+            self._texts.append(text)
+            self._total_length += len(text)
+            for table, terms in ((self._postings, self._grams(text)), (self._keywords, keywords)):
+                for term in terms:
+                    postings = table.get(term)
+                    if postings is None:
+                        postings = table[term] = array("I")
+                    postings.append(doc)
+        return doc
+
+    def extend(self, results: Iterable[Dict[str, Any]]):
+        for result in results:
+            self.add(result)
+
+    def remap(self, new_positions: Sequence[int]):
+        """
+        結果の番号を付け替える
+
+        完了順に追加した索引を、並べ替えた後の ResultStore の位置に合わせるために使う。
+
+        Args:
+            new_positions (Sequence[int]): 追加順 i 番目の結果の新しい番号（0〜件数-1 の並べ替え）
+        """
+        with self._lock:
+            mapping = np.asarray(new_positions, dtype=np.uint32)
+            if len(mapping) != len(self._texts):
+                raise ValueError(f"番号の対応表の件数が索引の件数と一致しません: {len(mapping)} != {len(self._texts)}")
+            texts = [""] * len(self._texts)
+            for old, new in enumerate(mapping.tolist()):
+                texts[new] = self._texts[old]
+            self._texts = texts
+            for table in (self._postings, self._keywords):
+                for term, postings in table.items():
+                    table[term] = array("I", np.sort(mapping[np.array(postings, dtype=np.uint32)]).tobytes())
+
+    def _candidates(self, term: str) -> np.ndarray:
+        """検索語の n-gram をすべて含む結果の番号（件数の少ない転置リストから順に積集合を取る）"""
+        n = min(self.ngram, len(term))
+        postings = []
+        for gram in {term[i:i + n] for i in range(len(term) - n + 1)}:
+            docs = self._postings.get(gram)
+            if docs is None:
+                return np.empty(0, dtype=np.uint32)
+            postings.append(docs)
+        postings.sort(key=len)
+        candidates = np.array(postings[0], dtype=np.uint32)
+        for docs in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, np.array(docs, dtype=np.uint32), assume_unique=True)
+        return candidates
+
+    def _keyword_hits(self, term: str) -> Dict[int, float]:
+        """キーワードに検索語を含む結果と加点（キーワードの種類だけを走査する）"""
+        hits: Dict[int, float] = {}
+        for keyword, docs in self._keywords.items():
+            if term not in keyword:
+                continue
+            boost = KEYWORD_EXACT_BOOST if keyword == term else KEYWORD_PARTIAL_BOOST
+            for doc in docs:
+                if hits.get(doc, 0.0) < boost:
+                    hits[doc] = boost
+        return hits
+
+    def search(self, query: str, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        検索語を含む結果を関連度の高い順に取得
+
+        空白で区切った検索語はすべてを含む結果（AND）に一致する。
+        検索語が本文に現れる回数（BM25）と、キーワードへの一致を関連度とする。
+
+        Args:
+            query (str): 検索語（全角・半角、英字の大文字・小文字は区別しない）
+            limit (Optional[int]): 取得する最大件数
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 結果の番号と関連度（関連度の高い順、同じ場合は番号順）
+        """
+        terms = normalize_text(query).split()
+        if not terms:
+            return _empty()
+
+        with self._lock:
+            doc_count = len(self._texts)
+            if doc_count == 0:
+                return _empty()
+            average_length = max(1.0, self._total_length / doc_count)
+            scores: Optional[Dict[int, float]] = None
+            for term in terms:
+                frequencies = {}
+                for doc in self._candidates(term).tolist():
+                    if scores is not None and doc not in scores:
+                        continue
+                    count = self._texts[doc].count(term)
+                    if count:
+                        frequencies[doc] = count
+                keyword_hits = self._keyword_hits(term)
+                matched = set(frequencies) | set(keyword_hits)
+                if scores is not None:
+                    matched &= scores.keys()
+                if not matched:
+                    return _empty()
+
+                idf = math.log(1.0 + (doc_count - len(matched) + 0.5) / (len(matched) + 0.5))
+                term_scores = {}
+                for doc in matched:
+                    weight = keyword_hits.get(doc, 0.0)
+                    count = frequencies.get(doc)
+                    if count:
+                        norm = 1.0 - _B + _B * len(self._texts[doc]) / average_length
+                        weight += count * (_K1 + 1.0) / (count + _K1 * norm)
+                    term_scores[doc] = idf * weight
+                scores = term_scores if scores is None else {doc: scores[doc] + s for doc, s in term_scores.items()}
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        positions = np.fromiter((doc for doc, _ in ranked), dtype=np.intp, count=len(ranked))
+        relevance = np.fromiter((score for _, score in ranked), dtype=np.float64, count=len(ranked))
+        return positions, relevance
+
+    def memory_usage(self) -> int:
+        """転置リストのおおよそのバイト数（本文の文字列を除く）"""
+        return sum(docs.itemsize * len(docs) for table in (self._postings, self._keywords) for docs in table.values())
@@ -0,0 +1,147 @@
+import heapq
+from typing import Dict, List, Any, Iterable
+
+SENTIMENT_KEYS = ["positive", "negative", "neutral"]
+CATEGORY_KEYS = ["content", "materials", "management", "others"]
+HIGH_IMPORTANCE_THRESHOLD = 7
+DEFAULT_TOP_K = 10
+
+
+def _score(result: Dict[str, Any]) -> int:
+    # DynamoDB から読み込んだ値は Decimal になるため数値に変換する
+    try:
+        return int(result.get("importance_score", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class SummaryAggregator:
+    """
+    分析結果を1件ずつ加算してサマリーレポートを作る集計器
+
+    1件あたり O(1)（高危険度コメントの上位 top_k は件数 top_k のヒープで保持）で更新でき、
+    日別・ワーカー別などの集計器同士を merge() で正確に統合できる。
+    統合結果は、統合元の結果を順に連結して1つの集計器に加算した場合と一致する。
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K):
+        """
+        Args:
+            top_k (int): 保持する高危険度コメントの件数
+        """
+        self.top_k = top_k
+        self.total = 0
+        self.sentiment_counts = {key: 0 for key in SENTIMENT_KEYS}
+        self.category_counts = {key: 0 for key in CATEGORY_KEYS}
+        self.high_importance = 0
+        self.high_risk = 0
+        self.triaged = 0
+        # (重要度, -追加順, 分析結果) の最小ヒープ。同じ重要度では先に追加されたものを優先する
+        self._top_high_risk: List[tuple] = []
+
+    def add(self, result: Dict[str, Any]):
+        """分析結果を1件加算"""
+        position = self.total
+        self.total += 1
+
+        sentiment = result.get("sentiment", "neutral")
+        self.sentiment_counts[sentiment if sentiment in self.sentiment_counts else "neutral"] += 1
+
+        category = result.get("category", "others")
+        self.category_counts[category if category in self.category_counts else "others"] += 1
+
+        score = _score(result)
+        if score >= HIGH_IMPORTANCE_THRESHOLD:
+            self.high_importance += 1
+        if result.get("analysis_source") == "triage":
+            self.triaged += 1
+        if result.get("risk_level") == "high":
+            self.high_risk += 1
+            self._push_high_risk((score, -position, result))
+
+    def add_all(self, results: Iterable[Dict[str, Any]]) -> "SummaryAggregator":
+        for result in results:
+            self.add(result)
+        return self
+
+    def _push_high_risk(self, entry: tuple):
+        if self.top_k <= 0:
+            return
+        if len(self._top_high_risk) < self.top_k:
+            heapq.heappush(self._top_high_risk, entry)
+        elif entry[:2] > self._top_high_risk[0][:2]:
+            heapq.heapreplace(self._top_high_risk, entry)
+
+    def merge(self, other: "SummaryAggregator") -> "SummaryAggregator":
+        """
+        別の集計器の内容を統合する（other の結果は self の結果の後に追加したものとして扱う）
+
+        Args:
+            other (SummaryAggregator): 統合する集計器
+
+        Returns:
+            SummaryAggregator: 統合後の自身
+        """
+        offset = self.total
+        self.total += other.total
+        for key, count in other.sentiment_counts.items():
+            self.sentiment_counts[key] = self.sentiment_counts.get(key, 0) + count
+        for key, count in other.category_counts.items():
+            self.category_counts[key] = self.category_counts.get(key, 0) + count
+        self.high_importance += other.high_importance
+        self.high_risk += other.high_risk
+        self.triaged += other.triaged
+        for score, negative_position, result in other._top_high_risk:
+            self._push_high_risk((score, negative_position - offset, result))
+        return self
+
+    def top_high_risk_comments(self) -> List[Dict[str, Any]]:
+        """高危険度コメントの上位（重要度の降順、同じ重要度は追加順）"""
+        return [result for _, _, result in sorted(self._top_high_risk, key=lambda entry: entry[:2], reverse=True)]
+
+    def report(self) -> Dict[str, Any]:
+        """
+        サマリーレポートを生成（結果が0件の場合は空の辞書）
+
+        Returns:
+            Dict[str, Any]: generate_summary_report と同じ形式のサマリーレポート
+        """
+        if self.total == 0:
+            return {}
+
+        def distribution(counts: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+            return {key: {"count": count, "percentage": count / self.total * 100} for key, count in counts.items()}
+
+        return {
+            "total_comments": self.total,
+            "sentiment_distribution": distribution(self.sentiment_counts),
+            "category_distribution": distribution(self.category_counts),
+            "high_importance_comments": self.high_importance,
+            "high_risk_comments": self.high_risk,
+            "triage_skipped": {"count": self.triaged, "percentage": self.triaged / self.total * 100},
+            "top_high_risk_comments": self.top_high_risk_comments()
+        }
+
+
+def summarize_respondents(results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    回答者単位の分析結果から、回答者数と回答者全体の危険度の分布を集計
+
+    Args:
+        results (Iterable[Dict[str, Any]]): row・respondent_risk 付きの分析結果
+
+    Returns:
+        Dict[str, Any]: 回答者数、危険度ごとの回答者数、高危険度の回答者の行番号
+    """
+    risks: Dict[Any, str] = {}
+    for result in results:
+        if "respondent_risk" in result:
+            risks.setdefault(result.get("row"), result["respondent_risk"])
+    counts = {level: 0 for level in ("high", "medium", "low")}
+    for risk in risks.values():
+        counts[risk] = counts.get(risk, 0) + 1
+    return {
+        "respondents": len(risks),
+        "respondent_risk_distribution": counts,
+        "high_risk_rows": sorted(row for row, risk in risks.items() if risk == "high")
+    }
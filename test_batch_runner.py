@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from openpyxl import Workbook
+
+from batch_runner import BatchRunner, day_keys
+from comment_analyzer import COMMENT_COLUMNS
+from llm_backends import FakeBackend
+
+
+def make_day_file(path: str, comments: int):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(COMMENT_COLUMNS[:2])
+    for i in range(comments):
+        sheet.append([f"{os.path.basename(path)} で学んだこと {i} " * 5, f"{os.path.basename(path)} のよかった点 {i}"])
+    workbook.save(path)
+
+
+class BatchRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ, {
+            "INGEST_CACHE_DIR": os.path.join(self.work_dir, "ingest"),
+            "ANALYSIS_CACHE_PATH": os.path.join(self.work_dir, "analysis_cache.sqlite3")
+        })
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run_batch(self, paths):
+        runner = BatchRunner(output_dir=os.path.join(self.work_dir, "out"), max_workers=1,
+                             requests_per_minute=1e7, pack_size=1, dedup=False, parse_processes=1,
+                             journal_dir=os.path.join(self.work_dir, "journal"), backend=FakeBackend())
+        with redirect_stdout(io.StringIO()):
+            return runner.run(paths)
+
+    def test_progress_finishes_only_after_all_files(self):
+        paths = [os.path.join(self.work_dir, f"Day{day}.xlsx") for day in (1, 2, 3)]
+        for path, comments in zip(paths, (2, 5, 3)):
+            make_day_file(path, comments)
+        self.run_batch(paths)
+        events = []
+
+        # 再実行ではジャーナルの結果がファイルの読み込みと同時に加算されるため、ファイルの合間に件数が総件数に追いつく
+        with mock.patch("batch_runner.ConsoleProgressBar", return_value=events.append):
+            report = self.run_batch(paths)
+
+        self.assertEqual(report["total"]["total_comments"], 20)
+        # 総件数はすべてのファイルを読み込んだ時点で確定し、完了の表示は最後の1回だけ
+        self.assertEqual([event.finished for event in events], [False] * (len(events) - 1) + [True])
+        self.assertEqual((events[-1].done, events[-1].total), (20, 20))
+
+
+    def test_same_day_number_uses_file_names(self):
+        paths = [os.path.join(self.work_dir, name) for name in ("Day1_a.xlsx", "day1-b.xlsx", "Day2.xlsx")]
+        for path, comments in zip(paths, (2, 3, 1)):
+            make_day_file(path, comments)
+
+        self.assertEqual(list(day_keys(paths).values()), ["Day1_a", "day1-b", "Day2"])
+        report = self.run_batch(paths)
+
+        self.assertEqual({day: summary["total_comments"] for day, summary in report["days"].items()},
+                         {"Day1_a": 4, "day1-b": 6, "Day2": 2})
+        outputs = sorted(os.listdir(os.path.join(self.work_dir, "out")))
+        self.assertIn("Day1_a_analysis_results.csv", outputs)
+        self.assertIn("day1-b_analysis_results.csv", outputs)
+
+    def test_duplicate_file_names_are_rejected(self):
+        paths = [os.path.join(self.work_dir, "a", "Day1.xlsx"), os.path.join(self.work_dir, "b", "Day1.xlsx")]
+
+        with self.assertRaises(ValueError):
+            day_keys(paths)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from dedup import NearDuplicateIndex, group_near_duplicates, normalize_for_dedup
+
+LONG_COMMENT = "講義のスライドの文字が小さくて後ろの席からはほとんど読めませんでした。次回から大きくしてほしいです"
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+
+    def test_exact_duplicates_after_normalization(self):
+        # 全角・半角、英字の大文字・小文字、空白・句読点の違いは同じコメントとして扱う
+        texts = ["特になし", "特になし。", " 特に なし ", "ＡＩの話が面白かった", "aiの話が面白かった!"]
+
+        self.assertEqual(group_near_duplicates(texts), [0, 0, 0, 3, 3])
+
+    def test_near_duplicates_share_a_representative(self):
+        texts = [LONG_COMMENT, LONG_COMMENT.replace("ほしいです", "ほしい"), LONG_COMMENT + "よろしくお願いします"]
+
+        groups = group_near_duplicates(texts)
+
+        self.assertEqual(groups[:2], [0, 0])
+        self.assertEqual(groups[2], 2)  # 追記で類似度が閾値を下回るものは別のグループ
+
+    def test_distinct_comments_are_not_grouped(self):
+        texts = ["講義のペースがちょうどよかった", "演習の時間がもっとほしい", "資料を事前に配布してほしい",
+                 "講師の説明がわかりやすかった", "特になし"]
+
+        self.assertEqual(group_near_duplicates(texts), list(range(len(texts))))
+
+    def test_empty_and_punctuation_only_inputs_stay_separate(self):
+        texts = ["", "！？", "。。。", None, 3.0, "...", "特になし", "特になし"]
+
+        self.assertEqual([normalize_for_dedup(text) for text in texts[:6]], [""] * 6)
+        # 正規化すると空になる入力は互いにまとめず、他のコメントの代表にもならない
+        self.assertEqual(group_near_duplicates(texts), [0, 1, 2, 3, 4, 5, 6, 6])
+
+    def test_positions_count_every_added_comment(self):
+        index = NearDuplicateIndex()
+
+        self.assertEqual([index.add(text) for text in ["よかった", "", "よかった", "？"]], [0, 1, 0, 3])
+        self.assertEqual(len(index), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from openpyxl import Workbook
+
+from comment_analyzer import COMMENT_COLUMNS, process_excel_file
+import ingest_cache
+from ingest_cache import CachedCommentReader, IngestCache
+from llm_backends import FakeBackend
+
+COLUMNS = COMMENT_COLUMNS[1:4]
+
+
+def make_gappy_workbook(path: str):
+    """コメントが3件だけのアンケート（1列目のコメント列はすべて空、他の列も空欄が多い）"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["学籍番号"] + COLUMNS)
+    for number in range(1, 11):
+        sheet.append([number, None, None, None])
+    sheet["C2"] = "資料が見やすい"
+    sheet["C4"] = "文字が小さい"
+    sheet["D9"] = "部屋が寒い"
+    workbook.save(path)
+
+
+class IngestCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "gaps.xlsx")
+        make_gappy_workbook(self.path)
+        self.cache = IngestCache(os.path.join(self.work_dir, "cache"))
+        self.file_hash, _ = self.cache.ensure(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_empty_column_has_no_comments(self):
+        reader = self.cache.comment_reader(self.path, COLUMNS, file_hash=self.file_hash)
+
+        self.assertEqual(list(reader), [
+            (COLUMNS[1], 0, "資料が見やすい"),
+            (COLUMNS[1], 2, "文字が小さい"),
+            (COLUMNS[2], 7, "部屋が寒い")
+        ])
+        self.assertEqual(reader.comment_counts, {COLUMNS[0]: 0, COLUMNS[1]: 2, COLUMNS[2]: 1})
+        self.assertEqual(reader.total, 3)
+
+    def test_total_is_limited_per_column(self):
+        reader = self.cache.comment_reader(self.path, COLUMNS, max_comments_per_column=1, file_hash=self.file_hash)
+
+        self.assertEqual(reader.total, 2)
+        self.assertEqual(len(list(reader)), reader.total)
+
+    def test_cached_run_finishes_progress_bar(self):
+        # 変換済みのファイルの分析では、コンソールのプログレスバーが総件数に達して改行で終わる
+        environ = {"INGEST_CACHE_DIR": self.cache.cache_dir,
+                   "ANALYSIS_CACHE_PATH": os.path.join(self.work_dir, "analysis_cache.sqlite3")}
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, environ), redirect_stdout(output):
+            result = process_excel_file(self.path, journal_dir=os.path.join(self.work_dir, "journal"),
+                                        backend=FakeBackend(), requests_per_minute=1e7)
+
+        self.assertEqual(len(result["analysis_results"]), 3)
+        bar_line, newline, _ = output.getvalue().rpartition("\r")[2].partition("\n")
+        self.assertRegex(bar_line, r"^\[█+\] 3/3 \(100\.0%\) \| ポジティブ: \d+ \| ネガティブ: \d+( \| 残り時間: \d+分\d+秒)?$")
+        self.assertEqual(newline, "\n")
+
+
+    def test_column_counts_and_preview_skip_empty_column(self):
+        expected = {"学籍番号": 10, COLUMNS[0]: 0, COLUMNS[1]: 2, COLUMNS[2]: 1}
+
+        self.assertEqual(self.cache.column_counts(self.file_hash), expected)
+        head_df, shape, counts = self.cache.preview(self.path, rows=3, file_hash=self.file_hash)
+        self.assertEqual(len(head_df), 3)
+        self.assertEqual(shape, (10, 4))
+        self.assertEqual(counts, expected)
+
+
+class UncachedIngestTest(unittest.TestCase):
+    """未変換のファイルはExcelを1回だけ解析し、明示しない限りスレッドを残さない"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "gaps.xlsx")
+        make_gappy_workbook(self.path)
+        self.cache = IngestCache(os.path.join(self.work_dir, "cache"))
+        self.file_hash = ingest_cache.file_sha256(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_comment_reader_converts_once_in_place(self):
+        threads = threading.active_count()
+        with mock.patch("ingest_cache._read_sheets", wraps=ingest_cache._read_sheets) as read_sheets:
+            reader = self.cache.comment_reader(self.path, COLUMNS, file_hash=self.file_hash)
+            comments = list(reader)
+
+        self.assertIsInstance(reader, CachedCommentReader)
+        self.assertEqual(len(comments), 3)
+        self.assertEqual(read_sheets.call_count, 1)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_preview_converts_in_background_only_when_requested(self):
+        head_df, shape, counts = self.cache.preview(self.path, rows=3, file_hash=self.file_hash)
+        self.assertEqual((len(head_df), shape, counts), (3, (10, 4), None))
+        self.assertFalse(self.cache.is_converted(self.file_hash))
+
+        self.cache.preview(self.path, rows=3, file_hash=self.file_hash, background=True)
+        thread = self.cache.convert_in_background(self.path, self.file_hash)
+        if thread is not None:
+            thread.join()
+        self.assertEqual(self.cache.column_counts(self.file_hash)[COLUMNS[0]], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
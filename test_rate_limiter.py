@@ -0,0 +1,71 @@
+import unittest
+
+from comment_analyzer import CommentAnalyzer
+from llm_backends import FakeBackend
+from rate_limiter import AdaptiveRateLimiter, RateLimitError, is_rate_limit_error
+
+MAX_RPM = 6000.0
+MAX_RETRIES = 2
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    """フェイクバックエンドの429でレートが下がり、成功が続くと上限まで戻ることを確認する"""
+
+    def setUp(self):
+        # 待機時間を短くして、バックオフ後の再試行がすぐに行われるようにする
+        self.limiter = AdaptiveRateLimiter(requests_per_minute=MAX_RPM, increase_step=1000.0,
+                                           base_backoff=0.01, max_backoff=0.05)
+        self.backend = FakeBackend(error_rate=1.0)
+        self.analyzer = CommentAnalyzer(backend=self.backend, rate_limiter=self.limiter,
+                                        max_retries=MAX_RETRIES, use_cache=False)
+
+    def test_backs_off_on_rate_limit(self):
+        result = self.analyzer.analyze_comment("講義の進み方が速すぎて理解できない", resolve_locally=False)
+
+        self.assertEqual(result["summary"], "分析エラー")
+        self.assertEqual(self.backend.rate_limited_count, MAX_RETRIES + 1)
+        # 再試行前の429ごとにレートが半分になる（最後の429は再試行しないため記録しない）
+        self.assertEqual(self.limiter.get_stats()["rate_limited"], MAX_RETRIES)
+        self.assertEqual(self.limiter.current_rate, MAX_RPM * 0.5 ** MAX_RETRIES)
+
+    def test_recovers_after_successes(self):
+        self.analyzer.analyze_comment("講義の進み方が速すぎて理解できない", resolve_locally=False)
+        backed_off = self.limiter.current_rate
+        self.assertLess(backed_off, MAX_RPM)
+
+        self.backend.error_rate = 0.0
+        rates = []
+        for i in range(5):
+            result = self.analyzer.analyze_comment(f"スライドの{i}枚目が見づらい", resolve_locally=False)
+            self.assertNotEqual(result["summary"], "分析エラー")
+            rates.append(self.limiter.current_rate)
+
+        # 成功ごとに加算的に上がり、上限を超えない
+        self.assertEqual(rates, [min(MAX_RPM, backed_off + 1000.0 * (i + 1)) for i in range(5)])
+        self.assertEqual(self.limiter.current_rate, MAX_RPM)
+        self.assertEqual(self.limiter.get_stats()["successes"], 5)
+
+
+class IsRateLimitErrorTest(unittest.TestCase):
+    """レート制限の判定は例外の型とステータスコードで行い、メッセージの文字列は見ない"""
+
+    def test_rate_limit_errors(self):
+        class HttpError(Exception):
+            status_code = 429
+
+        class ClientError(Exception):
+            def __init__(self, code):
+                super().__init__("An error occurred")
+                self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": 400}}
+
+        self.assertTrue(is_rate_limit_error(RateLimitError()))
+        self.assertTrue(is_rate_limit_error(HttpError("Too Many Requests")))
+        self.assertTrue(is_rate_limit_error(ClientError("ThrottlingException")))
+
+    def test_messages_containing_429_are_not_rate_limits(self):
+        self.assertFalse(is_rate_limit_error(ValueError("行 429 のコメントを解析できません")))
+        self.assertFalse(is_rate_limit_error(RuntimeError("429 Resource has been exhausted")))
+
+
+if __name__ == "__main__":
+    unittest.main()
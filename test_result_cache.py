@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from comment_analyzer import CommentAnalyzer, PROMPT_VERSION
+from llm_backends import FakeBackend
+from result_cache import ResultCache
+
+RESULT = {"sentiment": "negative", "category": "content", "importance_score": 8, "risk_level": "high",
+          "summary": "講義内容が難しすぎる", "keywords": ["難しい"]}
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+    """time.time の代わりに使う、呼び出しごとに1秒進む時計"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        self.now += 1.0
+        return self.now
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "analysis_cache.sqlite3")
+        self.clock = FakeClock()
+        patcher = mock.patch("result_cache.time.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_hit_and_miss(self):
+        cache = ResultCache(self.path)
+        key = ResultCache.make_key("講義が　難しい ", PROMPT_VERSION, "fake")
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, RESULT)
+        # 全角空白・前後の空白の違いは同じコメントとして扱う
+        self.assertEqual(cache.get(ResultCache.make_key("講義が 難しい", PROMPT_VERSION, "fake")), RESULT)
+        self.assertEqual(ResultCache(self.path).get(key), RESULT)
+
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_connections_are_per_thread(self):
+        cache = ResultCache(self.path)
+        key = ResultCache.make_key("資料が見やすい", PROMPT_VERSION, "fake")
+        cache.put(key, RESULT)
+        found = []
+
+        threads = [threading.Thread(target=lambda: found.append(cache.get(key))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(found, [RESULT] * 4)
+        self.assertEqual(cache.get_stats()["hits"], 4)
+
+    def test_evicts_least_recently_used_over_max_entries(self):
+        cache = ResultCache(self.path, max_entries=3, evict_interval=1)
+        keys = [ResultCache.make_key(f"コメント{i}", PROMPT_VERSION, "fake") for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, RESULT)
+        cache.get(keys[0])  # 最初のエントリを参照して最近使ったものにする
+
+        cache.put(keys[3], RESULT)
+
+        self.assertEqual([cache.get(key) is not None for key in keys], [True, False, True, True])
+        self.assertEqual(cache.get_stats()["entries"], 3)
+
+    def test_expires_entries_older_than_max_age(self):
+        cache = ResultCache(self.path, max_age_days=1)
+        old, new = (ResultCache.make_key(comment, PROMPT_VERSION, "fake") for comment in ("古い", "新しい"))
+        cache.put(old, RESULT)
+        self.clock.now += 2 * DAY
+        cache.put(new, RESULT)
+
+        self.assertIsNone(cache.get(old))
+        self.assertEqual(cache.get(new), RESULT)
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(cache.get_stats()["entries"], 1)
+
+    def test_prompt_version_and_model_change_the_key(self):
+        cache = ResultCache(self.path)
+        cache.put(ResultCache.make_key("講義が難しい", PROMPT_VERSION, "fake"), RESULT)
+
+        self.assertIsNone(cache.get(ResultCache.make_key("講義が難しい", PROMPT_VERSION + "-next", "fake")))
+        self.assertIsNone(cache.get(ResultCache.make_key("講義が難しい", PROMPT_VERSION, "other-model")))
+
+    def test_analyzer_reuses_results_for_the_same_model_only(self):
+        comment = "講義の進み方が速すぎてついていけない"
+        backend = FakeBackend()
+        analyzer = CommentAnalyzer(backend=backend, cache=ResultCache(self.path), requests_per_minute=1e7)
+        first = analyzer.analyze_comment(comment)
+        second = CommentAnalyzer(backend=backend, cache=ResultCache(self.path), requests_per_minute=1e7)
+
+        self.assertEqual(second.analyze_comment(comment), first)
+        self.assertEqual(backend.call_count, 1)
+
+        other = FakeBackend(model_name="fake-2")
+        CommentAnalyzer(backend=other, cache=ResultCache(self.path), requests_per_minute=1e7).analyze_comment(comment)
+        self.assertEqual(other.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from openpyxl import Workbook
+
+from comment_analyzer import COMMENT_COLUMNS, process_excel_file
+from llm_backends import FakeBackend
+from result_sinks import open_sink, read_results
+
+FORMATS = ["jsonl", "parquet", "csv"]
+
+
+def make_result(i: int):
+    return {"sentiment": "negative", "category": "content", "importance_score": 7, "risk_level": "medium",
+            "summary": f"要約{i}", "keywords": ["講義"], "original_comment": f"コメント{i}",
+            "column_name": COMMENT_COLUMNS[1], "row": i, "index": i}
+
+
+class ResultSinkTest(unittest.TestCase):
+    """失敗した実行では既存の出力ファイルを置き換えず、一時ファイルも残さない"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write_existing(self, fmt: str) -> str:
+        path = os.path.join(self.work_dir, f"results.{fmt}")
+        with open_sink(path) as sink:
+            sink.write_all([make_result(i) for i in range(3)])
+        return path
+
+    def test_commit_replaces_output(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                path = self.write_existing(fmt)
+                with open_sink(path) as sink:
+                    sink.write_all([make_result(i) for i in range(5)])
+
+                self.assertEqual(len(read_results(path)), 5)
+                self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+    def test_failure_keeps_existing_output(self):
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                path = self.write_existing(fmt)
+                with self.assertRaises(RuntimeError):
+                    with open_sink(path, **({"batch_size": 1} if fmt == "parquet" else {})) as sink:
+                        sink.write(make_result(10))
+                        sink.write(make_result(11))
+                        raise RuntimeError("分析が途中で失敗しました")
+
+                self.assertEqual(read_results(path)["summary"].tolist(), ["要約0", "要約1", "要約2"])
+                self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+    def test_process_excel_file_failing_mid_run_keeps_outputs(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(COMMENT_COLUMNS[:2])
+        for i in range(5):
+            sheet.append([f"学んだこと{i}" * 10, f"よかった点{i}"])
+        excel_path = os.path.join(self.work_dir, "Day1.xlsx")
+        workbook.save(excel_path)
+        paths = [self.write_existing(fmt) for fmt in FORMATS]
+
+        def analyze_then_fail(analyzer, column_comments, sinks=None, **kwargs):
+            # 2件を出力先に書き込んだところで失敗させる
+            for i, (col, row, comment) in enumerate(column_comments):
+                for sink in sinks:
+                    if sink.streaming:
+                        sink.write(make_result(100 + i))
+                if i == 1:
+                    raise RuntimeError("分析が途中で失敗しました")
+
+        environ = {"INGEST_CACHE_DIR": os.path.join(self.work_dir, "ingest"),
+                   "ANALYSIS_CACHE_PATH": os.path.join(self.work_dir, "analysis_cache.sqlite3")}
+        with mock.patch.dict(os.environ, environ), redirect_stdout(io.StringIO()), \
+                mock.patch("comment_analyzer.analyze_column_comments", analyze_then_fail):
+            with self.assertRaises(RuntimeError):
+                process_excel_file(excel_path, paths, backend=FakeBackend(),
+                                   journal_dir=os.path.join(self.work_dir, "journal"))
+
+        for path in paths:
+            self.assertEqual(len(read_results(path)), 3, path)
+            self.assertFalse(os.path.exists(f"{path}.tmp"), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
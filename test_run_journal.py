@@ -0,0 +1,83 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+from comment_analyzer import CommentAnalyzer, iter_column_comments
+from llm_backends import FakeBackend
+from run_journal import RunJournal
+
+COLUMN = "（任意）分かりにくかった部分や改善点などがあれば、具体的にお教えください。"
+COMMENTS = [(COLUMN, row, f"{row}回目の演習の説明がもう少し詳しいとよかったです") for row in range(6)]
+
+
+def make_result(col: str, row: int):
+    return {"sentiment": "negative", "category": "content", "importance_score": 6, "risk_level": "low",
+            "summary": f"演習{row}の説明不足", "keywords": ["演習"], "column_name": col, "row": row, "index": row}
+
+
+class RunJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.run_key = RunJournal.make_run_key("file-hash", "fake", "1")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def write_partial_journal(self, rows) -> RunJournal:
+        """指定した行まで記録し、最後の1件の書き込み途中で中断したジャーナルを作る"""
+        journal = RunJournal(self.run_key, self.work_dir)
+        for row in rows:
+            journal.append(make_result(COLUMN, row))
+        journal.close()
+        torn = json.dumps(make_result(COLUMN, 5), ensure_ascii=False).encode("utf-8")
+        with open(journal.path, "ab") as f:
+            # 日本語の文字の途中（マルチバイトの途中）で切れた行
+            f.write(torn[:torn.index("演習".encode("utf-8")) + 2])
+        return journal
+
+    def test_load_skips_torn_last_line(self):
+        self.write_partial_journal([0, 1, 3])
+
+        completed = RunJournal(self.run_key, self.work_dir).load()
+
+        self.assertEqual(sorted(completed), [(COLUMN, 0), (COLUMN, 1), (COLUMN, 3)])
+        self.assertEqual(completed[(COLUMN, 3)]["summary"], "演習3の説明不足")
+
+    def test_append_after_torn_line_starts_a_new_line(self):
+        self.write_partial_journal([0])
+
+        journal = RunJournal(self.run_key, self.work_dir)
+        journal.append(make_result(COLUMN, 2))
+        journal.close()
+
+        self.assertEqual(sorted(RunJournal(self.run_key, self.work_dir).load()), [(COLUMN, 0), (COLUMN, 2)])
+
+    def test_resume_skips_completed_rows(self):
+        self.write_partial_journal([0, 1, 3])
+        backend = FakeBackend()
+        analyzer = CommentAnalyzer(backend=backend, use_cache=False, requests_per_minute=1e7)
+        journal = RunJournal(self.run_key, self.work_dir)
+
+        results = list(iter_column_comments(analyzer, COMMENTS, journal=journal, progress_callback=lambda event: None))
+        journal.close()
+
+        # 記録済みの3行は分析せず、残りの3行だけモデルを呼び出す
+        self.assertEqual(backend.call_count, 3)
+        self.assertEqual(sorted(result["row"] for result in results), list(range(6)))
+        self.assertEqual({result["row"]: result["summary"] for result in results if result["row"] in (0, 1, 3)},
+                         {0: "演習0の説明不足", 1: "演習1の説明不足", 3: "演習3の説明不足"})
+        # 再開後に分析した行も記録され、次の再開ではすべて完了済みになる
+        self.assertEqual(sorted(RunJournal(self.run_key, self.work_dir).load()), [(COLUMN, row) for row in range(6)])
+
+    def test_clear_discards_progress(self):
+        journal = self.write_partial_journal([0, 1])
+
+        journal.clear()
+
+        self.assertEqual(RunJournal(self.run_key, self.work_dir).load(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
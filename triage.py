@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from typing import Dict, Any, Optional
+
+from dedup import normalize_for_dedup
+
+# 「特になし」系の回答（正規化後に完全一致で判定）
+NONE_PHRASES = {
+    "なし", "無し", "ない", "無い", "ないです", "無いです", "なしです", "無しです",
+    "特になし", "特に無し", "特にない", "特に無い", "特になしです", "特に無しです", "特にないです",
+    "ありません", "特にありません", "とくになし", "とくにありません", "ございません", "特にございません",
+    "特になにもありません", "特に何もありません", "何もありません", "なにもありません",
+    "問題なし", "問題ありません", "特に問題ありません", "大丈夫です",
+    "以上", "以上です", "none", "nothing", "no", "na", "nil", "nothingspecial"
+}
+
+# 短い定型の肯定的な回答
+POSITIVE_PHRASES = {
+    "ありがとうございました": "感謝",
+    "ありがとうございます": "感謝",
+    "よかった": "良かった", "良かった": "良かった", "よかったです": "良かった", "良かったです": "良かった",
+    "とても良かった": "良かった", "とても良かったです": "良かった", "とてもよかったです": "良かった",
+    "わかりやすかった": "分かりやすかった", "分かりやすかった": "分かりやすかった",
+    "わかりやすかったです": "分かりやすかった", "分かりやすかったです": "分かりやすかった",
+    "とてもわかりやすかったです": "分かりやすかった", "とても分かりやすかったです": "分かりやすかった",
+    "面白かった": "面白かった", "面白かったです": "面白かった", "おもしろかったです": "面白かった",
+    "楽しかった": "楽しかった", "楽しかったです": "楽しかった",
+    "勉強になりました": "勉強になった", "とても勉強になりました": "勉強になった",
+}
+
+POSITIVE_EMOJI = set("😀😃😄😁😆😊🙂😍🥰👍👏🙏✨🎉💯❤♥☺")
+NEGATIVE_EMOJI = set("😢😭😞😟😠😡😩😫😖👎💢")
+
+
+def _is_symbol_only(text: str) -> bool:
+    """記号・絵文字（異体字セレクタ等を含む）のみで構成されているか"""
+    return all(unicodedata.category(ch)[0] in ("S", "M", "C") for ch in text)
+
+
+class TriageClassifier:
+    """
+    LLMを呼ぶまでもない定型コメントをローカルで判定する前段分類器
+
+    「なし」「特にありません」「-」や絵文字のみのコメント、
+    短い定型の感想をルールと辞書で判定し、確信度付きの分析結果を返す。
+    """
+
+    def __init__(self, min_confidence: float = 0.8):
+        """
+        Args:
+            min_confidence (float): この確信度以上の場合のみローカル判定を採用する
+        """
+        self.min_confidence = min_confidence
+
+    def classify(self, comment: str) -> Optional[Dict[str, Any]]:
+        """
+        コメントをローカルで判定
+
+        Args:
+            comment (str): 判定対象のコメント
+
+        Returns:
+            Optional[Dict[str, Any]]: 判定できた場合は分析結果（triage_confidence 付き）、できない場合は None
+        """
+        if not isinstance(comment, str):
+            return None
+
+        raw = re.sub(r"\s+", "", unicodedata.normalize("NFKC", comment))
+        text = normalize_for_dedup(comment)
+        result = None
+
+        if raw and not text:
+            # 「-」「・」「。」など句読点のみ
+            result = self._make_result("neutral", 1, "記載なし", [], 0.99)
+        elif text and _is_symbol_only(text):
+            # 絵文字・記号のみ
+            positive = sum(1 for ch in text if ch in POSITIVE_EMOJI)
+            negative = sum(1 for ch in text if ch in NEGATIVE_EMOJI)
+            if positive and not negative:
+                result = self._make_result("positive", 2, "肯定的な絵文字", [], 0.85)
+            elif negative and not positive:
+                result = self._make_result("negative", 3, "否定的な絵文字", [], 0.8)
+            else:
+                result = self._make_result("neutral", 1, "記号のみ", [], 0.9)
+        elif text in NONE_PHRASES:
+            result = self._make_result("neutral", 1, "特になし", [], 0.95)
+        elif text in POSITIVE_PHRASES:
+            summary = POSITIVE_PHRASES[text]
+            result = self._make_result("positive", 2, summary, [summary], 0.85)
+
+        if result is None or result["triage_confidence"] < self.min_confidence:
+            return None
+        return result
+
+    @staticmethod
+    def _make_result(sentiment: str, importance_score: int, summary: str, keywords: list,
+                     confidence: float) -> Dict[str, Any]:
+        return {
+            "sentiment": sentiment,
+            "category": "others",
+            "importance_score": importance_score,
+            "risk_level": "low",
+            "summary": summary,
+            "keywords": keywords,
+            "analysis_source": "triage",
+            "triage_confidence": confidence
+        }